@@ -0,0 +1,103 @@
+import os
+import time
+from datetime import datetime
+from background import LatestRunner
+from utils import run_later
+
+
+class AutoSaver:
+    """
+    Opt-in saving of a CostCalculator's workbook in the background
+
+    touch() is called after edits.  At most once per interval, and only if
+    there are unsaved edits, the tables are snapshotted and written by
+    write_cc on a worker thread to a temporary file next to the workbook,
+    which then replaces it with an atomic rename (see replace_workbook).
+    A write that raced with new edits is dropped and tried again later.
+    Where threads are unavailable (pyodide) the write runs in place, on the
+    first edit after the interval has passed.
+
+    on_status(text) is called with a short description of each outcome.
+    The tables are replaced under 'lock', the lock held by whatever applies
+    edits to them (e.g. a DataFrameWidget's edit_lock), by default the
+    journal's.
+    """
+
+    def __init__(self, cc, interval=60, on_status=None, lock=None):
+        self.cc = cc
+        self.lock = lock if lock is not None else cc.journal.lock
+        self.interval = interval  # seconds between writes
+        self.on_status = on_status
+        self.enabled = False
+        self.timer = None
+        self.saving = False
+        self.last_write = None  # time.monotonic() of the last write started
+        self.runner = LatestRunner(on_error=self.on_error)
+
+    def start(self):
+        self.enabled = True
+        self.touch()
+
+    def stop(self):
+        self.enabled = False
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def touch(self):
+        ''' note that the tables were edited, a write is scheduled
+            for when the interval since the last one has passed
+        '''
+        if not self.enabled or self.saving or self.timer is not None:
+            return
+        wait = 0
+        if self.last_write is not None:
+            wait = max(self.last_write + self.interval - time.monotonic(), 0)
+        self.timer = run_later(wait, self.save)
+
+    def save(self):
+        ''' write the workbook now if it has unsaved edits
+        '''
+        self.timer = None
+        if not self.enabled or self.saving or self.cc.workbook is None:
+            return
+        if self.last_write is not None and time.monotonic() < self.last_write + self.interval:
+            # run early (no timer thread), the next edit tries again
+            return
+        if not self.cc.has_unsaved_edits():
+            return
+        with self.cc.journal.lock:
+            snap = self.cc.snapshot()
+            edit_count = self.cc.journal.edit_count
+        workbook = self.cc.workbook
+        # hidden, in the same directory so the rename is atomic
+        folder, name = os.path.split(workbook)
+        root, ext = os.path.splitext(name)
+        tmpname = os.path.join(folder, f".{root}.saving{ext}")
+        self.saving = True
+        self.last_write = time.monotonic()
+
+        def work(job):
+            snap.write_cc(tmpname)
+            return tmpname
+
+        def apply(tmpname):
+            self.saving = False
+            with self.lock:
+                replaced = self.cc.workbook == workbook and self.cc.replace_workbook(tmpname, edit_count)
+            if replaced:
+                self.status(f"saved {os.path.basename(workbook)} at {datetime.now():%H:%M:%S}")
+            else:
+                os.remove(tmpname)
+            if self.cc.has_unsaved_edits():
+                self.touch()
+
+        self.runner.submit(work, apply)
+
+    def on_error(self, e):
+        self.saving = False
+        self.status(f"autosave failed: {e}")
+
+    def status(self, text):
+        if self.on_status is not None:
+            self.on_status(text)
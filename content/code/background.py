@@ -0,0 +1,128 @@
+import threading
+
+
+class Job:
+    """
+    Handle passed to work running on a LatestRunner
+
+    work can poll job.cancelled to stop early once a newer request has been
+    submitted, and call job.report(done, total) to drive a progress display.
+    """
+
+    def __init__(self, runner, token):
+        self.runner = runner
+        self.token = token
+
+    @property
+    def cancelled(self):
+        return not self.runner.is_current(self.token)
+
+    def report(self, done, total):
+        if not self.cancelled and self.runner.on_progress:
+            self.runner.on_progress(done, total)
+
+
+class LatestRunner:
+    """
+    Run requests one at a time on a worker thread, latest request wins
+
+    Each submit replaces any request still waiting to run, and the result of
+    a request is only applied if no newer request was submitted while it was
+    running.  work(job) runs on the worker thread and should only touch its
+    own data (e.g. a CostCalculator snapshot); apply(result) receives the
+    result of the current request.  Where threads are unavailable (pyodide)
+    requests run immediately in the calling thread.
+
+    on_busy(busy) is called when the runner starts and stops working,
+    on_progress(done, total) whenever the current job reports progress.
+    """
+
+    def __init__(self, on_busy=None, on_progress=None, on_error=None):
+        self.on_busy = on_busy
+        self.on_progress = on_progress
+        self.on_error = on_error
+        self.generation = 0
+        self.next_job = None
+        self.running = False
+        self.worker = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+
+    def is_current(self, token):
+        return token == self.generation
+
+    def submit(self, work, apply):
+        ''' queue work(job) to run, then apply(result) if it is still current
+            returns the token of the request
+        '''
+        with self.lock:
+            self.generation += 1
+            token = self.generation
+            self.next_job = (Job(self, token), work, apply)
+            if self.worker is None:
+                worker = threading.Thread(target=self._work_loop, daemon=True)
+                try:
+                    worker.start()
+                    self.worker = worker
+                except RuntimeError:
+                    pass
+            else:
+                self.wakeup.notify_all()
+            threaded = self.worker is not None
+
+        if threaded:
+            self._busy(True)
+        else:
+            # no threads, run in place
+            self._run(*self._take())
+        return token
+
+    def _take(self):
+        with self.lock:
+            job, self.next_job = self.next_job, None
+        return job
+
+    def wait(self, timeout=None):
+        ''' block until no request is waiting or running
+            returns False if timeout seconds passed first
+        '''
+        with self.lock:
+            return self.wakeup.wait_for(lambda: self.next_job is None and not self.running, timeout)
+
+    def _work_loop(self):
+        while True:
+            with self.lock:
+                while self.next_job is None:
+                    self.wakeup.wait()
+                request, self.next_job = self.next_job, None
+                self.running = True
+            try:
+                self._run(*request)
+            finally:
+                with self.lock:
+                    self.running = False
+                    self.wakeup.notify_all()
+
+    def _run(self, job, work, apply):
+        if job.cancelled:
+            return
+        self._busy(True)
+        try:
+            result = work(job)
+            if not job.cancelled:
+                apply(result)
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+            else:
+                print(f'background job failed: {e}')
+        finally:
+            # stay busy while a newer request is waiting
+            with self.lock:
+                idle = self.next_job is None
+            if idle:
+                self._busy(False)
+
+    def _busy(self, busy):
+        if self.on_busy:
+            self.on_busy(busy)
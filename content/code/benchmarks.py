@@ -0,0 +1,276 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import pandas as pd
+from costcalulator import CostCalculator
+from synthetic_menu import write_menu_workbook
+
+# synthetic workbooks (see make_menu_tables) and times each benchmark is repeated,
+# the best run is kept: single runs vary by up to 30% here
+TIERS = {
+    'small': (dict(nicknames=50, recipes=40, depth=3, fanout=5, seed=1), 3),
+    'medium': (dict(nicknames=200, recipes=150, depth=5, fanout=8, seed=2), 3),
+    'large': (dict(guide_rows=20000, nicknames=2000, recipes=400, depth=6, fanout=8, seed=3), 3),
+}
+# short benchmarks are repeated until their runs take this long (seconds)
+MIN_TIME = 1.0
+MAX_RUNS = 100
+# allowed slowdown (a fraction) before compare reports a regression, above
+# the spread of the runs, which is allowed when it is larger
+THRESHOLD = 0.4
+DEFAULT_TIERS = ('small', 'medium')
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+class Bench:
+    """
+    The workbook of one tier, loaded once, and the names the benchmarks use
+
+    fresh() is a copy of the loaded calculator with no costs or cached
+    frames, so each run starts cold.
+    """
+
+    def __init__(self, workbook, outdir):
+        self.workbook = workbook
+        self.outdir = outdir
+        self.cc = load(workbook)
+        self.recipes = list(self.cc.costdf.loc[self.cc.costdf['item'] == 'recipe', 'ingredient'])
+        self.nicknames = list(self.cc.uni_g['nickname'].dropna().unique())
+        menus = self.cc.get_children('fullmenu')
+        self.menu_items = [item for menu in menus for item in self.cc.get_children(menu)]
+
+    def fresh(self):
+        cc = self.cc.snapshot()
+        cc.costdf['cost'] = 0.0
+        cc.invalidate()
+        return cc
+
+
+def load(workbook):
+    cc = CostCalculator()
+    cc.log_edits = False
+    cc.read_from_xlsx(workbook)
+    return cc
+
+
+def bench_read_xlsx(bench):
+    return lambda: load(bench.workbook)
+
+
+def bench_item_cost(bench):
+    cc = bench.fresh()
+    return lambda: cc.item_cost('recipe', 'fullmenu')
+
+
+def bench_flatten_recipe(bench):
+    cc = bench.fresh()
+    return lambda: [cc.flatten_recipe(item, '1 ct') for item in bench.menu_items]
+
+
+def bench_findframe(bench):
+    cc = bench.fresh()
+    return lambda: [cc.findframe(name) for name in bench.recipes + bench.nicknames]
+
+
+def bench_find_allergens(bench):
+    cc = bench.fresh()
+    return lambda: [cc.find_allergens(item) for item in bench.menu_items]
+
+
+def bench_write_cc(bench):
+    cc = bench.fresh()
+    return lambda: cc.write_cc(os.path.join(bench.outdir, 'write_cc.xlsx'))
+
+
+def bench_ordered_xlsx(bench):
+    cc = bench.fresh()
+    return lambda: cc.ordered_xlsx(os.path.join(bench.outdir, 'ordered.xlsx'))
+
+# name -> setup(bench) returning the work to time
+BENCHMARKS = {
+    'read_xlsx': bench_read_xlsx,
+    'item_cost': bench_item_cost,
+    'flatten_recipe': bench_flatten_recipe,
+    'findframe': bench_findframe,
+    'find_allergens': bench_find_allergens,
+    'write_cc': bench_write_cc,
+    'ordered_xlsx': bench_ordered_xlsx,
+}
+
+# cold start: statements timed in a new interpreter after their setup
+STARTUP = {
+    'import_utils': ('', 'import utils'),
+    'import_costcalulator': ('', 'import costcalulator'),
+    'import_menu_viewer': ('', 'import menu_viewer'),
+    'import_data_frame_explorer': ('', 'import data_frame_explorer'),
+    'first_quantity': ('import utils', "utils.Q_('1 lb')"),
+    'new_calculator': ('import costcalulator', 'costcalulator.CostCalculator()'),
+}
+STARTUP_REPEAT = 3
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_startup(setup, statement):
+    ''' seconds 'statement' takes in a new python, after 'setup'
+    '''
+    program = '\n'.join(['import time', setup, 'start = time.perf_counter()', statement,
+                         'print(time.perf_counter() - start)'])
+    done = subprocess.run([sys.executable, '-c', program], cwd=CODE_DIR, capture_output=True,
+                          text=True, check=True)
+    return float(done.stdout.split()[-1])
+
+
+def workbook_for(tier, data_dir):
+    ''' the synthetic workbook of 'tier', written on first use
+        (named after its parameters, so changing them writes a new one)
+    '''
+    params, repeat = TIERS[tier]
+    digest = hashlib.md5(repr(sorted(params.items())).encode()).hexdigest()[:8]
+    filename = os.path.join(data_dir, f'bench_{tier}_{digest}.xlsx')
+    if not os.path.exists(filename):
+        os.makedirs(data_dir, exist_ok=True)
+        write_menu_workbook(filename, **params)
+    return filename
+
+
+def run(tiers=DEFAULT_TIERS, names=None, repeat=None, data_dir=None, verbose=True, startup=True):
+    ''' time the benchmarks on each tier, and the STARTUP ones if startup
+        returns {'meta': {...}, 'results': {'tier/benchmark': best seconds},
+                 'spread': {'tier/benchmark': (median - best) / best}}
+        each is run 'repeat' times (by default its tier's) and more, up to
+        MAX_RUNS, until the runs took MIN_TIME
+    '''
+    data_dir = data_dir or os.path.join(tempfile.gettempdir(), 'menuview-bench')
+    names = names or list(BENCHMARKS)
+    results, spread = {}, {}
+
+    def record(key, times):
+        best = min(times)
+        results[key] = best
+        spread[key] = statistics.median(times) / best - 1 if best > 0 else 0.0
+        if verbose:
+            print(f'{key:<36} {best:9.4f} s  (+{spread[key]:.0%}, {len(times)} runs)')
+
+    def more(times, runs):
+        return len(times) < runs or (sum(times) < MIN_TIME and len(times) < MAX_RUNS)
+
+    if startup:
+        for name, (setup, statement) in STARTUP.items():
+            times = []
+            while more(times, repeat or STARTUP_REPEAT):
+                times.append(time_startup(setup, statement))
+            record(f'startup/{name}', times)
+    with tempfile.TemporaryDirectory() as outdir:
+        for tier in tiers:
+            workbook = workbook_for(tier, data_dir)
+            with contextlib.redirect_stdout(io.StringIO()):
+                bench = Bench(workbook, outdir)
+            for name in names:
+                times = []
+                while more(times, repeat or TIERS[tier][1]):
+                    # the calculators print what they can't cost
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        work = BENCHMARKS[name](bench)
+                        start = time.perf_counter()
+                        work()
+                        times.append(time.perf_counter() - start)
+                record(f'{tier}/{name}', times)
+    meta = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+    return {'meta': meta, 'results': results, 'spread': spread}
+
+
+def compare(baseline, current, threshold=THRESHOLD, min_seconds=0.005):
+    ''' benchmarks of 'current' more than 'threshold' (a fraction) slower
+        than in 'baseline', or more than the spread of either's runs if that
+        is larger, ignoring differences under min_seconds
+        returns a frame of every benchmark in both, and the regressed names
+    '''
+    rows = []
+    for key, now in current['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        change = now / before - 1 if before > 0 else 0.0
+        allowed = max(threshold, baseline.get('spread', {}).get(key, 0.0),
+                      current.get('spread', {}).get(key, 0.0))
+        regressed = change > allowed and now - before > min_seconds
+        rows.append({'benchmark': key, 'baseline s': before, 'current s': now,
+                     'change': change, 'allowed': allowed, 'regressed': regressed})
+    frame = pd.DataFrame(rows, columns=['benchmark', 'baseline s', 'current s', 'change', 'allowed', 'regressed'])
+    return frame, list(frame.loc[frame['regressed'], 'benchmark'])
+
+
+def read_results(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def write_results(results, filename):
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='costing benchmarks on synthetic workbooks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help='time the benchmarks')
+    run_parser.add_argument('--tiers', nargs='+', choices=list(TIERS), default=list(DEFAULT_TIERS))
+    run_parser.add_argument('--bench', nargs='+', choices=list(BENCHMARKS), default=None)
+    run_parser.add_argument('--repeat', type=int, default=None)
+    run_parser.add_argument('--no-startup', dest='startup', action='store_false',
+                            help='skip the cold start (import) timings')
+    run_parser.add_argument('--data-dir', default=None, help='where the synthetic workbooks are kept')
+    run_parser.add_argument('--output', default=None, help='write the results to this json file')
+    run_parser.add_argument('--save-baseline', action='store_true', help=f'write the results to {BASELINE}')
+    run_parser.add_argument('--compare', action='store_true', help='compare with the baseline afterwards')
+    run_parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    compare_parser = commands.add_parser('compare', help='fail if results regressed from a baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--baseline', default=BASELINE)
+    compare_parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                                help='allowed slowdown, as a fraction (0.4 is 40%%), or the spread '
+                                     'of the runs if larger')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        results = run(args.tiers, args.bench, args.repeat, args.data_dir, startup=args.startup)
+        if args.output:
+            write_results(results, args.output)
+        if args.save_baseline:
+            write_results(results, BASELINE)
+        if not args.compare:
+            return 0
+        baseline = read_results(BASELINE)
+    else:
+        results = read_results(args.current)
+        baseline = read_results(args.baseline)
+
+    frame, regressed = compare(baseline, results, args.threshold)
+    with pd.option_context('display.float_format', '{:.4f}'.format):
+        print(frame.to_string(index=False))
+    if regressed:
+        print(f'{len(regressed)} benchmarks regressed more than {args.threshold:.0%} (or the spread of their runs): {", ".join(regressed)}')
+        return 1
+    print('no regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+from collections import OrderedDict
+import numpy as np
+
+
+def float_lengths(values):
+    ''' len(f"{v:0.2f}") for each value of a float array, without formatting
+    '''
+    values = np.asarray(values, dtype='float64')
+    lengths = np.full(values.shape, 3, dtype='int64')  # 'nan' / 'inf'
+    finite = np.isfinite(values)
+    rounded = np.round(np.abs(values[finite]), 2)
+    digits = np.floor(np.log10(np.maximum(rounded, 1))) + 1
+    lengths[finite] = digits.astype('int64') + 3  # '.' and 2 decimals
+    return lengths + np.signbit(values)
+
+
+def column_lengths(series, floats=True):
+    ''' text length of each value of 'series'
+        floats=True measures floats as the grids show them (0.2f), otherwise
+        every value is measured as str(value)
+    '''
+    values = series.to_numpy()
+    if floats and series.dtype.kind == 'f':
+        return float_lengths(values)
+    lengths = series.astype(str).str.len().to_numpy(dtype='int64')
+    if floats and series.dtype == object and len(values):
+        is_float = np.fromiter((isinstance(v, float) for v in values), dtype=bool, count=len(values))
+        if is_float.any():
+            lengths[is_float] = float_lengths(values[is_float].astype('float64'))
+    return lengths
+
+
+class ColumnWidths:
+    """
+    Column widths from the text length of a frame's values
+
+    Per-row lengths are computed a column at a time with vectorized string
+    operations and cached per frame key (e.g. the name looked up).  When a
+    frame with the same key and shape is measured again, only the rows whose
+    values changed are measured again.
+    """
+
+    def __init__(self, char_width=10, header_char_width=8, pad=5, floats=True, maxsize=32):
+        self.char_width = char_width
+        self.header_char_width = header_char_width
+        self.pad = pad
+        self.floats = floats
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+
+    def clear(self):
+        self.cache.clear()
+
+    def lengths(self, df, key=None):
+        ''' dict of column -> array of the text length of each row
+        '''
+        entry = self.cache.get(key) if key is not None else None
+        if entry is not None and entry['columns'] == list(df.columns) and len(entry['df']) == len(df):
+            lengths = {}
+            for col in df.columns:
+                new, old = df[col].astype(object), entry['df'][col].astype(object)
+                same = ((new.to_numpy() == old.to_numpy()) | (new.isna() & old.isna()).to_numpy())
+                if same.all():
+                    lengths[col] = entry['lengths'][col]
+                    continue
+                # measure only the changed rows
+                rows = np.flatnonzero(~same)
+                col_lengths = entry['lengths'][col].copy()
+                col_lengths[rows] = column_lengths(df[col].iloc[rows], self.floats)
+                lengths[col] = col_lengths
+            self.cache.move_to_end(key)
+        else:
+            lengths = {col: column_lengths(df[col], self.floats) for col in df.columns}
+
+        if key is not None:
+            self.cache[key] = {'columns': list(df.columns), 'df': df.copy(), 'lengths': lengths}
+            while len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+        return lengths
+
+    def max_lengths(self, df, key=None):
+        ''' dict of column -> longest text length in the column (0 if empty)
+        '''
+        return {col: int(l.max()) if len(l) else 0 for col, l in self.lengths(df, key).items()}
+
+    def widths(self, df, key=None):
+        ''' dict of column -> pixel width fitting the column's values and name
+        '''
+        widths = {}
+        for col, maxlen in self.max_lengths(df, key).items():
+            widths[col] = max(self.pad + self.char_width * maxlen,
+                              self.pad + self.header_char_width * len(str(col)))
+        return widths
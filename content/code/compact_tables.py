@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+# columns of each table stored compactly, see compact_frame
+CATEGORY_COLUMNS = {
+    'uni_g': ('nickname', 'supplier', 'unit', 'brand', 'allergen', 'conversion'),
+    'costdf': ('item', 'ingredient', 'conversion'),
+}
+FLOAT32_COLUMNS = {
+    'uni_g': ('price', 'note'),
+    'costdf': ('menu price', 'note'),
+}
+INTEGER_COLUMNS = {
+    'uni_g': ('number', 'order'),
+    'costdf': (),
+}
+# free text, arrow strings with string_backend='pyarrow'
+STRING_COLUMNS = {
+    'uni_g': ('description', 'size', 'date'),
+    'costdf': ('quantity',),
+}
+
+
+def compact_frame(df, table, string_backend=None):
+    ''' copy of 'table' (costdf or uni_g) with repeated names as categories,
+        numbers as float32 (or the smallest integer type that holds them)
+        and, with string_backend='pyarrow', free text as arrow strings
+    '''
+    df = df.copy()
+    for column in CATEGORY_COLUMNS[table]:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column in FLOAT32_COLUMNS[table]:
+        if column in df.columns and pd.api.types.is_float_dtype(df[column]):
+            df[column] = df[column].astype(np.float32)
+    for column in INTEGER_COLUMNS[table]:
+        if column in df.columns and pd.api.types.is_numeric_dtype(df[column]):
+            if df[column].isna().any():
+                df[column] = df[column].astype(np.float32)
+            else:
+                df[column] = pd.to_numeric(df[column], downcast='integer')
+    if string_backend == 'pyarrow':
+        if not has_pyarrow():
+            print('pyarrow is not installed, text columns are kept as python strings')
+        else:
+            for column in STRING_COLUMNS[table]:
+                if column in df.columns and df[column].dtype == object:
+                    df[column] = df[column].astype('string[pyarrow]')
+    return df
+
+
+def has_pyarrow():
+    ''' pyarrow is imported when arrow strings are asked for, not with the module
+    '''
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+
+def memory_usage(df):
+    ''' bytes used by df, python strings included
+    '''
+    return int(df.memory_usage(deep=True).sum())
+
+
+def settable(df, column, value):
+    ''' 'value' ready to be set in df[column]: a new category is added to a
+        categorical column first, and a float is stored as float32 in a
+        float32 column (so the column is not widened)
+    '''
+    if column not in df.columns:
+        return value
+    dtype = df[column].dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        if not pd.api.types.is_scalar(value) or pd.isna(value):
+            return value
+        if value not in dtype.categories:
+            df[column] = df[column].cat.add_categories([value])
+    elif dtype == np.float32 and isinstance(value, (float, int, np.floating, np.integer)) \
+            and not isinstance(value, bool):
+        return np.float32(value)
+    return value
+
+
+def concat_frames(frames, **kwargs):
+    ''' pd.concat, keeping the categorical, float32 and string columns of
+        the first frame (concatenating categories that differ, or rows from
+        plain frames, gives object columns otherwise)
+    '''
+    first = frames[0]
+    matched = [first]
+    for frame in frames[1:]:
+        dtypes = matching_dtypes(frame, first)
+        # astype copies even with nothing to cast
+        matched.append(frame.astype(dtypes) if dtypes else frame)
+    frames = matched
+    return restore_dtypes(pd.concat(frames, **kwargs), first)
+
+
+def matching_dtypes(frame, like):
+    ''' {column: dtype of 'like'} for the columns of frame to cast before
+        concatenating: all-NA ones, and floats going into float32
+    '''
+    dtypes = {}
+    for column in frame.columns.intersection(like.columns, sort=False):
+        dtype = like[column].dtype
+        if frame[column].dtype == dtype or dtype.kind in 'iub':
+            # numpy integers can't hold the NA
+            continue
+        if frame[column].isna().all() or (dtype == np.float32 and pd.api.types.is_float_dtype(frame[column])):
+            dtypes[column] = dtype
+    return dtypes
+
+
+def restore_dtypes(df, like):
+    ''' cast the columns of df that lost their compact dtype in 'like' back
+    '''
+    for column in like.columns:
+        dtype = like[column].dtype
+        if column not in df.columns or df[column].dtype == dtype:
+            continue
+        if isinstance(dtype, pd.CategoricalDtype):
+            # existing categories keep their codes, new values are added
+            values = pd.Index(df[column].dropna().unique())
+            new = values[~values.isin(dtype.categories)]
+            df[column] = df[column].astype(pd.CategoricalDtype(dtype.categories.append(new)))
+        elif dtype == np.float32 and pd.api.types.is_float_dtype(df[column]):
+            df[column] = df[column].astype(np.float32)
+        elif isinstance(dtype, pd.StringDtype):
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def widen(df):
+    ''' copy of df with float32 columns as the float64 values they were
+        read from (59.19, not 59.189998626708984), for writing
+    '''
+    columns = [c for c in df.columns if df[c].dtype == np.float32]
+    if not columns:
+        return df
+    df = df.copy()
+    for column in columns:
+        df[column] = df[column].astype(str).astype('float64')
+    return df
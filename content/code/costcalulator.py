@@ -1,11 +1,17 @@
 # costcalculator.py
+import copy
+import os
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 from datetime import datetime
 from utils import *
+from edit_journal import EditJournal
+from edit_log import EditLog
+from compact_tables import compact_frame, concat_frames, memory_usage, settable, widen
 
 class CostCalculator:
-    def __init__(self, filename=None, costpicker=None):
+    def __init__(self, filename=None, costpicker=None, compact=False, string_backend=None):
         self.costdf = pd.DataFrame()
         self.uni_g = pd.DataFrame()
         self.guide_sheet_name = 'unified - guide'
@@ -18,6 +24,25 @@ class CostCalculator:
                'conversion', 'description', 'supplier', 'date')
         self.uni_g_easyorder = ('nickname', '$/quant', 'price', 'size', 'supplier', 'date', 'description', 'conversion')
         self.use_saved = False
+        # findframe results by (name, data_version, cost_picker, use_saved), see invalidate
+        self.data_version = 0
+        self.frame_cache = OrderedDict()
+        self.frame_cache_size = 128
+        self.frame_names = None
+        self.frame_names_key = None
+        # guide prices behind 'equ quant', see unit_price
+        self.unit_prices = {}
+        self.equ_quant_memo = {}
+        # undo/redo of edits to costdf and uni_g
+        self.journal = EditJournal(self)
+        # edits are logged next to the workbook they were made on, see EditLog
+        self.log_edits = True
+        self.edit_log = None
+        self.workbook = None        # the xlsx the tables were loaded from
+        self.saved_edit_count = 0   # journal.edit_count when it was last written
+        # store the tables compactly when loaded, see compact_tables
+        self.compact = compact
+        self.string_backend = string_backend
 
         def defcostpicker(cdf):
             return pick_recent_cost(cdf)
@@ -119,8 +144,14 @@ class CostCalculator:
             column_name (column to set) value (value to set)
             recipe entrys are (should be) unique
         '''
+        new_column = column_name not in self.costdf.columns
+        value = settable(self.costdf, column_name, value)
         self.costdf.loc[(self.costdf['item'] == 'recipe') & (self.costdf['ingredient'] == inick),
             column_name] = value
+        if new_column:
+            self.invalidate()  # a new column changes every frame
+        else:
+            self.invalidate(inick)
         
     def set_item_ingredient(self, item, ingredient, column_name, value):
         ''' set a value for specified column (column_name) for (unique) entry
@@ -140,8 +171,15 @@ class CostCalculator:
                     print(f"Warning: Could not convert value '{value}' to float for column '{column_name}'")
         
         # Now set the value
+        new_column = column_name not in self.costdf.columns
+        value = settable(self.costdf, column_name, value)
         self.costdf.loc[(self.costdf['item'] == item) & (self.costdf['ingredient'] == ingredient),
             column_name] = value
+        if new_column:
+            self.invalidate()  # a new column changes every frame
+        else:
+            # the row is part of the frame of its item, a recipe entry of the recipe's
+            self.invalidate(ingredient if item == 'recipe' else item)
 
     def get_simple_ingredient_cost(self, inick, iquant):
         ''' get cost from the price guide, using weighted average if possible '''
@@ -313,6 +351,8 @@ class CostCalculator:
                                        & (self.costdf['ingredient'] == inick)]).empty:
                             self.costdf.loc[(self.costdf['item'] == 'recipe') 
                                        & (self.costdf['ingredient'] == inick), 'cost'] = cost
+                            # the recipe entry heads the frame of inick
+                            self.invalidate(inick)
                         return mycost
                     
                     # check if quants are equal (above)
@@ -325,16 +365,19 @@ class CostCalculator:
     def removeIngredient(self, item, ingredient):
         ''' remove an ingredient from a recipe (item)
         '''
-        self.costdf = self.costdf.drop(self.costdf[(self.costdf['item'] == item) & 
-                         (self.costdf['ingredient'] == ingredient)].index)
+        self.journal.drop('costdf', (self.costdf['item'] == item) &
+                          (self.costdf['ingredient'] == ingredient))
+        self.invalidate(item)
     
     # need to include instance of inick along with parents
     def clear_cost(self, inick):
         ''' clear the calculated cost of a item
             and any items with an affected cost
         '''
-        mask = self.costdf['ingredient'].isin([inick] + list(self.get_all_parents(inick, set())))
+        affected = [inick] + list(self.get_all_parents(inick, set()))
+        mask = self.costdf['ingredient'].isin(affected)
         self.costdf.loc[mask, 'cost'] = 0
+        self.invalidate(*affected)
         
     def calculate_cost(self, item_name):
         ''' calculate the cost subitems of a item
@@ -359,6 +402,68 @@ class CostCalculator:
             else:
                 self.item_cost('recipe', rentry['ingredient'])
         
+    def snapshot(self, share_guide=False):
+        ''' copy of the calculator with its own frames
+            a snapshot can be costed on another thread while this one is edited,
+            merge_results takes back what it computed
+            with share_guide the copy reads this uni_g (costing never writes it),
+            which must then be replaced rather than edited in place
+        '''
+        snap = copy.copy(self)
+        snap.costdf = self.costdf.copy()
+        snap.uni_g = self.uni_g if share_guide else self.uni_g.copy()
+        # cached frames are valid for the copy too, but it keeps its own cache
+        snap.frame_cache = OrderedDict(self.frame_cache)
+        snap.unit_prices = dict(self.unit_prices)
+        snap.equ_quant_memo = {nick: dict(memo) for nick, memo in self.equ_quant_memo.items()}
+        snap.journal = EditJournal(snap)
+        snap.edit_log = None
+        return snap
+
+    def merge_results(self, snap, columns=('cost',), check=True):
+        ''' copy computed values of 'columns' (costs, allergens) from snapshot 'snap'
+            values are only taken if the recipes, guide and cost settings are
+            unchanged since the snapshot was taken, returns True if merged
+            check=False skips comparing them, for callers that know it otherwise
+            (e.g. by a version number)
+        '''
+        # under the journal's lock, so no edit lands between the check and the merge
+        with self.journal.lock:
+            if check:
+                if (snap.cost_picker is not self.cost_picker) or (snap.use_saved != self.use_saved):
+                    return False
+                keys = [c for c in ('item', 'ingredient', 'quantity', 'saved cost', 'conversion')
+                        if c in self.costdf.columns]
+                if not self.costdf.index.equals(snap.costdf.index):
+                    return False
+                if not self.costdf[keys].equals(snap.costdf[keys]) or not self.uni_g.equals(snap.uni_g):
+                    return False
+
+            changed = pd.Series(False, index=self.costdf.index)
+            for col in columns:
+                theirs = snap.costdf[col]
+                if col not in self.costdf.columns:
+                    self.costdf[col] = theirs
+                    changed[:] = True
+                else:
+                    # keep values computed here since the snapshot was taken
+                    have = theirs.notna() & (theirs != 0)
+                    merged = theirs.where(have, self.costdf[col])
+                    ours = self.costdf[col]
+                    changed |= ~((merged == ours) | (merged.isna() & ours.isna()))
+                    self.costdf[col] = merged
+            stale = self.row_frames(self.costdf.loc[changed])
+            if stale:
+                self.invalidate(*stale)
+            return True
+
+    def row_frames(self, rows):
+        ''' names whose findframe result includes any of the costdf 'rows'
+            (the row's item, and the recipe of a recipe entry)
+        '''
+        is_entry = rows['item'] == 'recipe'
+        return set(rows.loc[~is_entry, 'item']) | set(rows.loc[is_entry, 'ingredient'])
+
     def item_list(self, iname):
         ''' dataframe of children
             return costdf.loc[costdf['item'] == iname.strip()
@@ -375,13 +480,17 @@ class CostCalculator:
 
         self.costdf['item'] = pd.Categorical(self.costdf['item'])
         self.costdf['ingredient'] = pd.Categorical(self.costdf['ingredient'])
+        if self.compact:
+            self.compact_tables()
+        self.invalidate()
+        self.journal.clear()
         
     def read_from_xlsx(self, filepath):
         # read the Excel file into a pandas dataframe
         excel_data = pd.read_excel(
             filepath, sheet_name=None, 
             converters={'date': lambda x: datetime.strptime(x, '%Y-%m-%d') if isinstance(x, str) else x}
-            #dtype_backend="pyarrow"
+            # text as arrow strings: string_backend='pyarrow', see compact_tables
             )
 
         #excel_data = pd.read_excel(filepath, sheet_name=None)
@@ -429,28 +538,128 @@ class CostCalculator:
         # rename cost column so it is separate from, (not overwritten by) calculations
         self.costdf = self.costdf.rename(columns={'cost': 'saved cost'})
         self.costdf.loc[:, 'cost'] = 0.0
+        if self.compact:
+            self.compact_tables()
+        self.invalidate()
+        self.journal.clear()
+
+        # edits not yet written to the workbook
+        self.workbook = filepath
+        self.saved_edit_count = self.journal.edit_count
+        self.edit_log = EditLog(filepath) if self.log_edits else None
+        if self.edit_log is not None:
+            self.edit_log.replay(self.journal)
+        self.journal.log = self.edit_log
         
 
+    def memory_usage(self):
+        ''' bytes used by each table, python strings included
+        '''
+        return pd.Series({'costdf': memory_usage(self.costdf), 'uni_g': memory_usage(self.uni_g)})
+
+    def compact_tables(self, string_backend=None):
+        ''' store the tables compactly: names (nickname, supplier, item,
+            ingredient...) as categories, kept categorical by every edit,
+            prices and other numbers as float32 or small integers, and with
+            string_backend='pyarrow' (or self.string_backend) free text as
+            arrow strings.  prices are written back as they were read.
+            returns the memory used before and after, in bytes
+        '''
+        string_backend = string_backend or self.string_backend
+        before = self.memory_usage()
+        self.costdf = compact_frame(self.costdf, 'costdf', string_backend)
+        self.uni_g = compact_frame(self.uni_g, 'uni_g', string_backend)
+        self.invalidate()
+        after = self.memory_usage()
+        return pd.DataFrame({'before': before, 'after': after, 'ratio': after / before})
+
     def write_cc(self, filename):
         ''' Write costdf, uni_g to given excel filename
+            writing the loaded workbook also empties its edit log
+        '''
+        if not self.is_workbook(filename):
+            self._write_xlsx(filename, self.ordered_costdf())
+            return
+        with self.journal.lock:
+            order = self.written_order()
+            self._write_xlsx(filename, self.costdf.iloc[order].reset_index(drop=True))
+            self._saved(order, self.journal.edit_count)
+
+    def replace_workbook(self, tmpname, edit_count):
+        ''' make 'tmpname', written (by write_cc of a snapshot) when the journal
+            was at 'edit_count', the loaded workbook with an atomic rename
+            nothing is replaced if there were edits since, returns True if replaced
+        '''
+        with self.journal.lock:
+            if self.journal.edit_count != edit_count:
+                return False
+            os.replace(tmpname, self.workbook)
+            self._saved(self.written_order(), edit_count)
+        return True
+
+    def is_workbook(self, filename):
+        ''' True if 'filename' is the workbook the tables were loaded from
+        '''
+        return self.workbook is not None and os.path.abspath(filename) == os.path.abspath(self.workbook)
+
+    def has_unsaved_edits(self):
+        ''' True if the tables were edited since the workbook was loaded or written
         '''
-        # order costdf by recipe
-        recipeset = list(self.costdf.loc[self.costdf['item'] == 'recipe']['ingredient'].unique())
+        return self.journal.edit_count != self.saved_edit_count
+
+    def ordered_costdf(self):
+        ''' costdf as it is written: each recipe entry followed by its
+            ingredients, recipes sorted by name (see written_order)
+        '''
+        return self.costdf.iloc[self.written_order()].reset_index(drop=True)
+
+    def written_order(self):
+        ''' positions of the costdf rows in the order they are written
+            rows of no recipe (e.g. whose recipe entry was renamed) are kept,
+            last, with a warning
+        '''
+        costdf = self.costdf
+
+        def positions(column, value):
+            return np.flatnonzero(costdf[column].eq(value).to_numpy(dtype=bool, na_value=False))
+
+        entries = positions('item', 'recipe')
+        recipeset = list(costdf['ingredient'].iloc[entries].unique())
         recipeset.sort()
-        orderedcost = pd.DataFrame()
+        order = []
         for rname in recipeset:
-            df2 = self.item_list(rname)
-            df1 = self.get_recipe_entry(rname)
-            orderedcost = pd.concat([orderedcost, df1, df2], ignore_index=True)
+            order += list(np.intersect1d(entries, positions('ingredient', rname)))
+            order += list(positions('item', rname.strip()))
+        # a row is written once, where it first comes
+        order = list(dict.fromkeys(int(i) for i in order))
+        written = set(order)
+        leftover = [i for i in range(len(costdf)) if i not in written]
+        if leftover:
+            print(f"!!! rows of no recipe, written last: {', '.join(map(str, costdf['item'].iloc[leftover].unique()))}")
+        return order + leftover
+
+    def _write_xlsx(self, filename, orderedcost):
         # only save saved cost, remove computed cost
+        orderedcost = orderedcost.copy()
         orderedcost.loc[:,'cost'] = orderedcost.loc[:,'saved cost']
-        orderedcost = orderedcost[self.cost_columns]
+        orderedcost = widen(orderedcost[self.cost_columns])
 
-        ordered_guide = pd.DataFrame()
-        
         with pd.ExcelWriter(filename) as writer: 
-            self.uni_g.to_excel(writer, sheet_name=self.guide_sheet_name, index=False)
+            widen(self.uni_g).to_excel(writer, sheet_name=self.guide_sheet_name, index=False)
             orderedcost.to_excel(writer, sheet_name=self.cost_sheet_name, index=False)
+
+    def _saved(self, order, edit_count):
+        # the workbook now holds the tables as they were at edit_count, with
+        # the costdf rows in 'order' (see written_order)
+        if self.edit_log is not None:
+            if order != list(range(len(self.costdf))):
+                # later edits are logged by row position in the workbook as
+                # written, the rows and the undo history are moved there
+                self.costdf = self.costdf.iloc[order].reset_index(drop=True)
+                self.invalidate()
+                self.journal.reorder('costdf', order)
+            self.edit_log.compact()
+        self.saved_edit_count = edit_count
     
     def ordered_xlsx(self, filename, oldcostsheets=None, cost_multipliers=[3.0, 3.5]):
         ''' create ordered xls from cost dataframe (cdf)
@@ -510,7 +719,7 @@ class CostCalculator:
                             myrow['change xx'] = f'=${alpha[nc_idx]}{i+row_offset}*{cell_mult_xx}-${alpha[oc_idx+1]}{i+row_offset}'
                         compdf = pd.concat([compdf, pd.DataFrame([myrow])], ignore_index=True)
                     compdf = pd.concat([pd.DataFrame({'cost x':['300%'], 'cost xx':['350%'], 'old cost x':['350%']}), compdf])[compdf.columns]             
-                    compdf.to_excel(writer, sheet_name=menu, index=False)
+                    widen(compdf).to_excel(writer, sheet_name=menu, index=False)
                     worksheet = writer.sheets[menu]
                     itemwidth = 0.8*max(compdf['item'].apply(lambda x: len(str(x))))
                     ingwidth = 0.8*max(compdf['ingredient'].apply(lambda x: len(str(x))))
@@ -521,7 +730,7 @@ class CostCalculator:
                 else:
                     for mult in cost_multipliers:
                         onesheet = add_costx(onesheet, mult)
-                    onesheet.to_excel(writer, sheet_name=menu, index=False)
+                    widen(onesheet).to_excel(writer, sheet_name=menu, index=False)
                     worksheet = writer.sheets[menu]
                     #compdf['ingredient']
                     width1 = max(onesheet['item'].apply(lambda x: len(x)))
@@ -534,7 +743,7 @@ class CostCalculator:
         
             # create a sheet for each recipe
             recipes = self.item_list('recipe').reset_index(drop=True)
-            recipe_names = (recipes['ingredient']).sort_values()
+            recipe_names = recipes['ingredient'].astype(object).sort_values()
             recipe_detail = pd.DataFrame()
             for name in recipe_names:
                 cur_recipe = self.item_list(name)
@@ -545,7 +754,7 @@ class CostCalculator:
             recipe_detail = recipe_detail[mycolumns]
             recipe_detail = add_costx(recipe_detail, 3.0)
             recipe_detail = add_costx(recipe_detail, 3.5)
-            recipe_detail.to_excel(writer, sheet_name='recipe', index=False)
+            widen(recipe_detail).to_excel(writer, sheet_name='recipe', index=False)
             worksheet = writer.sheets['recipe']
 
             width1 = max(recipe_detail['item'].apply(lambda x: len(x)))
@@ -575,7 +784,7 @@ class CostCalculator:
         orderdf = pd.concat([orderdf, detaildf], ignore_index=True)
             
         recipes = self.item_list('recipe').reset_index(drop=True)
-        recipe_names = (recipes['ingredient']).sort_values()
+        recipe_names = recipes['ingredient'].astype(object).sort_values()
         recipe_detail = pd.DataFrame()
         for name in recipe_names:
             cur_recipe = self.item_list(name)
@@ -589,40 +798,149 @@ class CostCalculator:
             
         orderdf = pd.concat([orderdf, recipe_detail], ignore_index=True)
             
-        orderdf.to_csv(filename)
+        widen(orderdf).to_csv(filename)
         
+    def unit_price(self, inick):
+        ''' ($/quantity, conversions) of the guide entry get_cost_df prices
+            'inick' with first, None if inick is not in the guide
+            kept until invalidate is called for inick
+        '''
+        if inick in self.unit_prices:
+            return self.unit_prices[inick]
+        entry = None
+        results = self.find_nick(inick)
+        if not results.empty:
+            convr = set(results['conversion'].dropna().unique())
+            for i, r in results.iterrows():
+                quant = parse_size(r['size'])
+                price = r['price']
+                if isinstance(price, str):
+                    price = float(price.strip('$'))
+                if (r['unit'] in ['lb', 'LB', 'Lb']):
+                    quant = Q_('1 lb')
+                # get_cost_df skips entries with a negative cost
+                if (price/quant).m >= 0:
+                    thisconv = [r['conversion']] if isinstance(r['conversion'], str) else list(convr)
+                    entry = (price/quant, thisconv)
+                    break
+        self.unit_prices[inick] = entry
+        return entry
+
+    def equ_quant(self, ingredient, quantity):
+        ''' 'quantity' of guide ingredient 'ingredient' in the units it is priced in
+            '' if it already is, None if not in the guide or quantity is not positive
+        '''
+        memo = self.equ_quant_memo.setdefault(ingredient, {})
+        if quantity in memo:
+            return memo[quantity]
+        equ = None
+        entry = self.unit_price(ingredient)
+        q = parse_quant(quantity)
+        if entry is not None and q.m > 0:
+            # the values get_cost_df stores as '$/quantity' and 'myconversion'
+            price_per_quant, thisconv = entry
+            nextprice, myconv = quantity_cost_and_conv(price_per_quant, q, parse_unit_conversion(thisconv))
+            cpq = Q_(str(price_per_quant).replace('ct','count'))
+            conv = Q_(str(myconv).replace('ct', 'count'))
+            equ = ''
+            if q.dimensionality != (1/cpq).dimensionality:
+                equ = f"{(q*conv).to_reduced_units().to(1/cpq.units):~.4f}"
+            elif q.units != (1/cpq).units:
+                equ = f"{q.to((1/cpq).units):~.4f}"
+        memo[quantity] = equ
+        return equ
+
+    def equ_quants(self, frame):
+        ''' 'equ quant' of every row of recipe 'frame' (NaN where there is none)
+            from the cached unit prices, without costing each row
+        '''
+        values = [self.equ_quant(i, q) for i, q in zip(frame['ingredient'], frame['quantity'])]
+        return [np.nan if v is None else v for v in values]
+
     def add_equ_quant(self, row):
         ''' add equivalent quantity to menu cost item
         '''
-        #row = row.copy()
-        if self.find_nick(row['ingredient']).empty:
-            return row
-        cl = self.get_cost_df(row['ingredient'], row['quantity'])
-        q = parse_quant(row['quantity'])
-        if q.m <= 0:
-            return row
-        cpq = Q_(cl.iloc[0]['$/quantity'].replace('ct','count'))
-        conv = Q_(cl.iloc[0]['myconversion'].replace('ct', 'count'))
-        row['equ quant'] = ''
-        if type(q) in (int, float):
-            return row
-        elif q.dimensionality != (1/cpq).dimensionality:
-            row['equ quant'] = f"{(q*conv).to_reduced_units().to(1/cpq.units):~.4f}"
-        elif q.dimensionality == (1/cpq).dimensionality:
-            if q.units != (1/cpq).units:
-                row['equ quant'] = f"{q.to((1/cpq).units):~.4f}"
+        equ = self.equ_quant(row['ingredient'], row['quantity'])
+        if equ is not None:
+            row['equ quant'] = equ
         return row
     
     def findframe(self, ingredient):
         ''' universal method to return the definition(s) of ingredient
+            results are cached (least recently used are dropped) until the
+            data they were built from changes, see invalidate
+        '''
+        key = self.frame_key(ingredient)
+        cached = self.frame_cache.get(key)
+        if cached is not None:
+            self.frame_cache.move_to_end(key)
+            return cached.copy()
+        myselection = self._findframe(ingredient)
+        self.frame_cache[key] = myselection.copy()
+        while len(self.frame_cache) > self.frame_cache_size:
+            self.frame_cache.popitem(last=False)
+        return myselection
+
+    def frame_key(self, ingredient):
+        ''' key of the cached findframe result of 'ingredient'
+        '''
+        return (ingredient, self.data_version, self.cost_picker, self.use_saved)
+
+    def invalidate(self, *names, parents=False):
+        ''' drop the cached findframe results of 'names', with parents=True
+            also those of the recipes listing them
+            without names every cached result is dropped (data_version changes)
+            call after editing costdf or uni_g in place
         '''
+        if not names:
+            self.data_version += 1
+            self.frame_cache.clear()
+            self.unit_prices.clear()
+            self.equ_quant_memo.clear()
+            return
+        for name in names:
+            self.unit_prices.pop(name, None)
+            self.equ_quant_memo.pop(name, None)
+        if not self.frame_cache:
+            return
+        names = set(names)
+        if parents:
+            for name in list(names):
+                names.update(self.get_parents(name))
+        for key in [k for k in self.frame_cache if k[0] in names]:
+            del self.frame_cache[key]
+
+    def has_frame(self, name):
+        ''' True if findframe(name) finds a definition (name is a recipe or
+            a nickname in the price guide), without building the frame
+        '''
+        key = (self.data_version, id(self.costdf), len(self.costdf), id(self.uni_g), len(self.uni_g))
+        if self.frame_names_key != key:
+            recipes, nicks = set(), set()
+            if 'item' in self.costdf.columns:
+                recipes = set(self.costdf.loc[self.costdf['item'] == 'recipe', 'ingredient'])
+            if 'nickname' in self.uni_g.columns:
+                nicks = set(self.uni_g['nickname'].dropna())
+            self.frame_names, self.frame_names_key = recipes | nicks, key
+        return name in self.frame_names
+
+    def _findframe(self, ingredient):
         myselection = pd.DataFrame()
         if ingredient is not None:
             rentry = self.get_recipe_entry(ingredient)
             ilist = self.item_list(ingredient)
             if rentry is not None and not rentry.empty:
                 myselection = pd.concat([rentry, ilist], ignore_index=True)
-                myselection = myselection.apply(self.add_equ_quant, axis=1)
+                equ = self.equ_quants(myselection)
+                # the frame the former row by row apply returned: object columns
+                # inferred again, sorted when only some rows have 'equ quant'
+                myselection = myselection.astype(object)
+                found = [isinstance(v, str) for v in equ]
+                if any(found):
+                    myselection['equ quant'] = equ
+                    if not all(found):
+                        myselection = myselection[sorted(myselection.columns)]
+                myselection = myselection.infer_objects()
                 myselection = reorder_columns(myselection, self.costdf_order)
                 
             else:# look in guide if no results in menu
@@ -643,7 +961,8 @@ class CostCalculator:
         mentiondf = pd.DataFrame()
         for p in self.get_parents(iname):
             if p != 'recipe':
-                mentiondf = pd.concat([mentiondf, self.findframe(p).loc[self.findframe(p)['ingredient'] == iname]], ignore_index=True)
+                frame = self.findframe(p)
+                mentiondf = pd.concat([mentiondf, frame.loc[frame['ingredient'] == iname]], ignore_index=True)
         
         return mentiondf
     
@@ -698,8 +1017,9 @@ class CostCalculator:
         if isinstance(q2, str):
             q2 = parse_quant(q2)
             
-        if q1.dimensionality == q2.dimensionality:
-            return q1.to(q2)
+        table = ureg.unit_table()
+        if table.same_dimensionality(q1, q2):
+            return table.to(q1, q2)
         
         results = list(self.find_nick(item)['conversion'].dropna().unique())
         convs = list(parse_unit_conversion(results))
@@ -709,21 +1029,21 @@ class CostCalculator:
             if isinstance(nextconv, int):
                 continue
             for c in nextconv.units._units:
-                if q1.dimensionality == ureg(c).dimensionality:
+                if table.same_dimensionality(q1, c):
                     # divide/mult by conversion as appropriate
                     result = q1*(nextconv**(-1*nextconv.units._units[c]))
-                    if result.dimensionality == q2.dimensionality:
-                        return result.to(q2.units)
+                    if table.same_dimensionality(result, q2):
+                        return table.to(result, q2)
                     else:
                         partialconv.append(result)
         # check any partial conversion for suitable convs (2nd pass)
         for pc in partialconv:
             for nextconv in convs:
                 for c in nextconv.units._units:
-                    if pc.dimensionality == ureg(c).dimensionality:
+                    if table.same_dimensionality(pc, c):
                         newresult = pc*(nextconv**(-1*nextconv.units._units[c]))
-                        if newresult.dimensionality == q2.dimensionality:
-                            return newresult.to(q2.units)
+                        if table.same_dimensionality(newresult, q2):
+                            return table.to(newresult, q2)
         return None
 
     def flatten_recipe(self, item, quant):
@@ -812,5 +1132,11 @@ class CostCalculator:
                             for a in allergen:
                                 for asub in a.replace(' ', '').split(','):
                                     allaller.add(asub)
+            new_column = 'allergen' not in self.costdf.columns
             self.costdf.loc[self.costdf['ingredient'] == item, 'allergen'] = ", ".join(allaller)
+            if new_column:
+                self.invalidate()  # a new column changes every frame
+            else:
+                # the rows are in the frames of item and the recipes listing it
+                self.invalidate(item, parents=True)
         return allaller
\ No newline at end of file
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import math
+import os
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+from costcalulator import CostCalculator
+from edit_log import EditLog
+from menu_catalog import MenuCatalog
+from search_index import PrefixIndex
+from shared_calculator import SharedCalculator
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LoadedMenu:
+    """
+    Everything the service answers from, for one version of the workbook
+
+    The workbook (with the edits logged since it was written, see EditLog)
+    is loaded once; allergens and ingredient lists come from a compiled
+    MenuCatalog, search from a PrefixIndex over its names.  Costs and
+    flattened recipes are worked out on first request, by worker threads
+    through a SharedCalculator, and kept.
+    """
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self.stamp = workbook_stamp(workbook)
+        cc = CostCalculator()
+        # read only: don't log, and leave a log being written as it is
+        cc.log_edits = False
+        cc.read_from_xlsx(workbook)
+        if cc.costdf.empty:
+            raise ValueError(f'no recipes in {workbook}')
+        EditLog(workbook).replay(cc.journal, put_aside=False)
+        self.catalog = MenuCatalog(cc)
+        self.index = PrefixIndex(self.catalog.entries)
+        self.shared = SharedCalculator(cc)
+        self.results = {}  # (kind, name) -> task of a worked out answer
+
+    def entry(self, name):
+        if name not in self.catalog:
+            raise ServiceError(404, f'{name!r} is not a recipe or ingredient')
+        return self.catalog.entries[name]
+
+    def cost(self, name):
+        entry = self.entry(name)
+        frame = self.shared.cost(name)
+        if entry.is_ingredient:
+            columns = [c for c in ('description', 'supplier', 'price', 'size', '$/quant', 'date')
+                       if c in frame.columns]
+            return {'item': name, 'type': 'ingredient',
+                    'guide': records(frame, columns)}
+        recipe = frame.iloc[0]
+        return {'item': name, 'type': 'recipe',
+                'quantity': plain(recipe.get('quantity')),
+                'cost': plain(recipe.get('cost')),
+                'menu price': plain(recipe.get('menu price')),
+                'ingredients': records(frame.iloc[1:], ['ingredient', 'quantity', 'cost'])}
+
+    def recipe(self, name):
+        entry = self.entry(name)
+        if entry.is_ingredient or not entry.children:
+            raise ServiceError(404, f'{name!r} is not a recipe')
+        flat = self.shared.flatten(name)
+        return {'item': name,
+                'flat': records(flat, ['ingredient', 'quantity']),
+                'ingredients': list(entry.ingredients)}
+
+    def allergens(self, name):
+        entry = self.entry(name)
+        allergens = entry.guide_allergens if entry.is_ingredient else entry.allergens
+        return {'item': name,
+                'allergens': [a.strip() for a in allergens.split(',') if a.strip()]}
+
+    def search(self, prefix, limit=20):
+        return {'query': prefix,
+                'results': [{'name': name, 'type': 'ingredient' if self.catalog.entries[name].is_ingredient else 'recipe'}
+                            for name in self.index.search(prefix, limit=limit)]}
+
+
+class CostingService:
+    """
+    Menu costs, recipes, allergens and search as JSON over local HTTP
+
+        GET /cost?item=pancakes        cost of a recipe (or guide prices of an ingredient)
+        GET /recipe?item=pancakes      flattened recipe and ingredient list, heaviest first
+        GET /allergens?item=pancakes   allergens of a recipe or ingredient
+        GET /search?q=pan&limit=20     names starting with (a word starting with) q
+        GET /status                    the loaded workbook
+
+    Requests are served concurrently by asyncio; costing runs on worker
+    threads and each answer is worked out once per loaded workbook (requests
+    for the same one wait for the same result).  The workbook and its edit
+    log are checked every reload_interval seconds, and loaded again when
+    they change; requests are answered from the previous version until the
+    new one is ready, and a workbook that can't be loaded (e.g. half
+    written) is tried again on the next check.
+    """
+
+    def __init__(self, workbook, host='127.0.0.1', port=8765, reload_interval=2.0):
+        self.workbook = workbook
+        self.host = host
+        self.port = port
+        self.reload_interval = reload_interval
+        self.menu = None
+        self.loads = 0    # times the workbook was loaded
+        self.server = None
+        self.watcher = None
+        self.routes = {
+            '/cost': self.get_cost,
+            '/recipe': self.get_recipe,
+            '/allergens': self.get_allergens,
+            '/search': self.get_search,
+            '/status': self.get_status,
+        }
+
+    async def start(self):
+        ''' load the workbook and start listening (port 0 picks a free port)
+        '''
+        await self.load()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.watcher = asyncio.ensure_future(self.watch())
+        return self
+
+    async def stop(self):
+        if self.watcher is not None:
+            self.watcher.cancel()
+            self.watcher = None
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def serve_forever(self):
+        await self.start()
+        print(f'serving {self.workbook} on http://{self.host}:{self.port}')
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def load(self):
+        menu = await asyncio.get_running_loop().run_in_executor(None, LoadedMenu, self.workbook)
+        self.menu = menu
+        self.loads += 1
+
+    async def reload_if_changed(self):
+        ''' load the workbook again if it (or its edit log) changed
+            returns True if it was reloaded
+        '''
+        try:
+            if workbook_stamp(self.workbook) == self.menu.stamp:
+                return False
+            await self.load()
+        except Exception as e:
+            print(f'!!! {self.workbook} not reloaded: {e}')
+            return False
+        return True
+
+    async def watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload_if_changed()
+
+    async def handle(self, reader, writer):
+        try:
+            status, body = await self.respond(reader)
+        except Exception as e:
+            status, body = 500, {'error': str(e)}
+        try:
+            payload = json.dumps(body, default=plain).encode()
+            writer.write((f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+                          'Content-Type: application/json\r\n'
+                          f'Content-Length: {len(payload)}\r\n'
+                          'Connection: close\r\n\r\n').encode() + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, reader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return 400, {'error': 'bad request'}
+        method, _, target = head.decode('latin-1').split('\r\n', 1)[0].partition(' ')
+        target = target.rsplit(' ', 1)[0]
+        if method != 'GET':
+            return 405, {'error': f'{method} not supported'}
+        url = urlsplit(target)
+        route = self.routes.get(url.path.rstrip('/') or '/')
+        if route is None:
+            return 404, {'error': f'no {url.path}', 'paths': sorted(self.routes)}
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            return 200, await route(self.menu, query)
+        except ServiceError as e:
+            return e.status, {'error': str(e)}
+
+    async def answer(self, menu, kind, name):
+        ''' menu.kind(name) on a worker thread, once per loaded menu
+        '''
+        key = (kind, name)
+        task = menu.results.get(key)
+        if task is None:
+            work = getattr(menu, kind)
+            task = asyncio.get_running_loop().run_in_executor(None, work, name)
+            menu.results[key] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # not kept, e.g. an unknown name is looked up again next time
+            menu.results.pop(key, None)
+            raise
+
+    async def get_cost(self, menu, query):
+        return await self.answer(menu, 'cost', item_param(query))
+
+    async def get_recipe(self, menu, query):
+        return await self.answer(menu, 'recipe', item_param(query))
+
+    async def get_allergens(self, menu, query):
+        return menu.allergens(item_param(query))
+
+    async def get_search(self, menu, query):
+        try:
+            limit = int(query.get('limit', 20))
+        except ValueError:
+            raise ServiceError(400, 'limit must be a number')
+        return menu.search(query.get('q', ''), limit=limit)
+
+    async def get_status(self, menu, query):
+        return {'workbook': self.workbook, 'loads': self.loads,
+                'items': len(menu.catalog), 'answers': len(menu.results)}
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def workbook_stamp(workbook):
+    ''' (size, mtime) of the workbook and of its edit log (None if there is none)
+    '''
+    stamps = []
+    for path in (workbook, os.path.splitext(workbook)[0] + '.edits.ndjson'):
+        try:
+            stat = os.stat(path)
+            stamps.append((stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            if path == workbook:
+                raise
+            stamps.append(None)
+    return tuple(stamps)
+
+
+def item_param(query):
+    name = query.get('item', '').strip()
+    if not name:
+        raise ServiceError(400, 'missing item=')
+    return name
+
+
+def plain(value):
+    ''' json friendly value, NaN becomes None
+    '''
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def records(frame, columns):
+    columns = [c for c in columns if c in frame.columns]
+    return [{c: plain(v) for c, v in zip(columns, row)}
+            for row in frame[columns].itertuples(index=False)]
+
+
+def serve(workbook, host='127.0.0.1', port=8765, reload_interval=2.0):
+    ''' serve 'workbook' until interrupted
+    '''
+    service = CostingService(workbook, host, port, reload_interval)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='menu costing JSON service')
+    parser.add_argument('workbook', nargs='?', default='amc_menu_database.xlsx')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--reload-interval', type=float, default=2.0)
+    args = parser.parse_args()
+    serve(args.workbook, args.host, args.port, args.reload_interval)
@@ -4,9 +4,13 @@ from IPython.display import display, clear_output
 from costcalulator import CostCalculator
 from utils import *
 from data_frame_widget import DataFrameWidget, DisplayDataFrameWidget
+from background import LatestRunner
+from autosave import AutoSaver
 
 class DataFrameExplorer:
-    def __init__(self, cc=CostCalculator()):
+    def __init__(self, cc=None, render_mode='widgets'):
+        # Initialize with a CostCalculator if provided, otherwise create a new one
+        cc = cc if cc is not None else CostCalculator()
         self.df = pd.DataFrame()
         self.mentiondf = pd.DataFrame()
         self.allvals = set()
@@ -30,6 +34,8 @@ class DataFrameExplorer:
         
         # Track current mode (edit/view)
         self.edit_mode = True
+        # 'html' shows read-only frames (view mode, mentions) as one HTML table
+        self.render_mode = render_mode
 
         # top utility displays
         cost_chooser = widgets.Text(value='menucost.xlsx')
@@ -41,8 +47,14 @@ class DataFrameExplorer:
         loadbutton = widgets.Button(description=f'reload database')
         loadbutton.on_click(lambda x: self.reload_database(database_chooser.value))
         writebutton = widgets.Button(description='write database')
-        writebutton.on_click(lambda x: self.cc.write_cc(f"{database_chooser.value}"))
-        self.database_display = widgets.HBox([widgets.Label(value='Database filename:'), database_chooser, loadbutton, writebutton])
+        writebutton.on_click(lambda x: self.write_database(f"{database_chooser.value}"))
+        # opt-in: write the loaded database in the background after edits
+        self.autosave_status = widgets.Label(value='')
+        autosave_check = widgets.Checkbox(value=False, description='autosave', indent=False,
+                                          layout=widgets.Layout(width='auto'))
+        autosave_check.observe(self.toggle_autosave, names='value')
+        self.database_display = widgets.HBox([widgets.Label(value='Database filename:'), database_chooser, loadbutton, writebutton,
+                                              autosave_check, self.autosave_status])
 
         # add recipe
         addrecipe_text = widgets.Text(value='recipe name')
@@ -117,10 +129,26 @@ class DataFrameExplorer:
         # composition
         self.dfdisplay = widgets.Output(layout={ 'overflow': 'scroll', 'border': '1px solid black'})
         self.df_widget = DataFrameWidget(pd.DataFrame(), width='90px', enabled_columns=self.enabled_columns, 
-                                        hide_columns=self.hide_columns, cc=self.cc, output=self.dfdisplay, trigger=self.trigger_update)
+                                        hide_columns=self.hide_columns, cc=self.cc, output=self.dfdisplay, trigger=self.trigger_update,
+                                        edit_delay=0.3, render_mode=self.render_mode)
         
         # Get reference to the back button
         self.backbutton = self.df_widget.backbutton
+
+        # undo/redo of edits, see EditJournal
+        self.undobutton = widgets.Button(description='Undo', disabled=True)
+        self.undobutton.on_click(self.undo)
+        self.redobutton = widgets.Button(description='Redo', disabled=True)
+        self.redobutton.on_click(self.redo)
+        self.undo_box = widgets.HBox([self.undobutton, self.redobutton])
+        self.cc.journal.on_change = self.journal_changed
+        self.autosaver = AutoSaver(self.cc, interval=60, on_status=self.show_autosave,
+                                   lock=self.df_widget.edit_lock)
+
+        # costing runs on a worker thread, only the latest request is shown
+        self.progress = widgets.IntProgress(value=0, min=0, max=1, description='costing:',
+                                            bar_style='info', layout=widgets.Layout(visibility='hidden'))
+        self.runner = LatestRunner(on_busy=self.show_busy, on_progress=self.show_progress)
         
         # cost multipliers (cost 3.0x, cost 3.5x)
         cost_mult_input = widgets.FloatsInput(
@@ -157,7 +185,7 @@ class DataFrameExplorer:
         # Modify top display to include menu buttons and back button
         topdisplay = widgets.VBox([
             self.menubutton_hbox,
-            widgets.HBox([self.backbutton, self.searchinput, copybutton, usesaved]), 
+            widgets.HBox([self.backbutton, self.undo_box, self.searchinput, copybutton, usesaved, self.progress]), 
             self.dfdisplay
         ], layout={'border': '2px solid green'})
         
@@ -165,7 +193,8 @@ class DataFrameExplorer:
         self.mdfdisplay = widgets.Output(layout={'border': '1px solid black'})        
         self.bottom_label = widgets.Label(value='items containing...', style=self.fontstyle)
         self.mdf_widget = DisplayDataFrameWidget(pd.DataFrame(), width='90px', enabled_columns=[], 
-                                        hide_columns=self.hide_columns, cc=self.cc, output=self.mdfdisplay, trigger=self.trigger_mentions)
+                                        hide_columns=self.hide_columns, cc=self.cc, output=self.mdfdisplay, trigger=self.trigger_mentions,
+                                        render_mode=self.render_mode)
         bottom_display = widgets.VBox([self.bottom_label, self.mdfdisplay], layout={'border': '2px solid blue'})
         
         # Create tools section containing recipe and ingredient creation
@@ -179,7 +208,8 @@ class DataFrameExplorer:
         self.editor_widgets = {
             'recipe_tools': tools_section,
             'database_tools': self.database_display,
-            'cost_tools': self.cost_display
+            'cost_tools': self.cost_display,
+            'undo_tools': self.undo_box
         }
         
         # display composition
@@ -247,10 +277,7 @@ class DataFrameExplorer:
         if change['new'] in self.allvals:
             change['owner'].style.text_color = self.defcolor
             iname = change['new']
-
-            self.df_widget.lookup_name(iname)
-            self.df_widget.update_display()
-            self.update_mentions(iname)
+            self.show_costed(iname, mentions=True)
 
         else:
             change['owner'].style.text_color = 'red'
@@ -260,8 +287,8 @@ class DataFrameExplorer:
         self.cc.cost_picker = self.cost_select_method[method]
         # clear all costs
         self.cc.costdf['cost'] = 0
-        self.df_widget.lookup_name(self.df_widget.last_lookup)
-        self.df_widget.update_display()
+        self.cc.invalidate()
+        self.show_costed(self.df_widget.last_lookup)
 
     def set_cost_multipliers(self, change):
         self.df_widget.cost_multipliers = change['new']
@@ -289,8 +316,50 @@ class DataFrameExplorer:
         
         # recompute all?
         self.cc.costdf['cost'] = 0            
-        self.df_widget.lookup_name(self.df_widget.last_lookup)
-        self.df_widget.update_display()
+        self.cc.invalidate()
+        self.show_costed(self.df_widget.last_lookup)
+
+    def show_costed(self, iname, mentions=False):
+        ''' cost 'iname' on a snapshot in the background, then show it
+            a newer request replaces this one, and the result is dropped
+            (and costed again) if the data was edited in the meantime
+        '''
+        if not iname:
+            return
+        # pending edits go into the snapshot
+        self.df_widget.flush_edits(refresh=False)
+        snap = self.cc.snapshot()
+
+        def work(job):
+            job.report(0, 2)
+            if not snap.get_recipe_entry(iname).empty:
+                snap.recipe_cost(iname)
+            job.report(1, 2)
+            frame = snap.findframe(iname)
+            job.report(2, 2)
+            return snap, frame
+
+        def apply(result):
+            # runs on the runner's thread, edits wait until it is shown
+            snap, frame = result
+            with self.df_widget.edit_lock:
+                if not self.cc.merge_results(snap):
+                    self.show_costed(iname, mentions)
+                    return
+                self.df_widget.lookup_name(iname, frame)
+                self.df_widget.update_display()
+                if mentions:
+                    self.update_mentions(iname)
+
+        self.runner.submit(work, apply)
+
+    def show_busy(self, busy):
+        self.progress.value = 0
+        self.progress.layout.visibility = 'visible' if busy else 'hidden'
+
+    def show_progress(self, done, total):
+        self.progress.max = total
+        self.progress.value = done
         
     # def update_mentions(self, iname):
     #     self.mdf_widget.search_name(iname)
@@ -304,14 +373,49 @@ class DataFrameExplorer:
         
         if self.mdf_widget.df.empty:
             # Create a message when no mentions are found
-            with self.mdfdisplay:
-                self.mdfdisplay.clear_output(wait=True)
-                print(f"{iname} does not appear in any recipe")
+            self.mdf_widget.show_message(f"{iname} does not appear in any recipe")
             self.bottom_label.value = f"items containing {iname}:"
         else:
             self.mdf_widget.update_display()
             self.bottom_label.value = f"items containing {iname}:"
     
+    def undo(self, button=None):
+        self.df_widget.undo()
+        self.update_names()
+
+    def redo(self, button=None):
+        self.df_widget.redo()
+        self.update_names()
+
+    def journal_changed(self, journal):
+        self.undobutton.disabled = not journal.can_undo()
+        self.redobutton.disabled = not journal.can_redo()
+        self.autosaver.touch()
+
+    def toggle_autosave(self, change):
+        if change['new']:
+            self.autosaver.start()
+        else:
+            self.autosaver.stop()
+            self.autosave_status.value = ''
+
+    def show_autosave(self, text):
+        self.autosave_status.value = text
+
+    def update_names(self):
+        ''' offer the recipes and ingredients there are now
+        '''
+        nicks = set(self.cc.uni_g['nickname'].dropna().unique())
+        ingrs = set(self.cc.costdf['ingredient'].dropna().unique())
+        self.allvals = nicks.union(ingrs)
+        self.searchinput.options = tuple(self.allvals)
+        self.df_widget.all_ingredients = self.allvals
+
+    def write_database(self, database):
+        # writing the loaded workbook may reorder the tables, not during a flush
+        with self.df_widget.edit_lock:
+            self.cc.write_cc(database)
+
     def reload_database(self, database):
         self.cc.read_from_xlsx(database)
         nicks = set(self.cc.uni_g['nickname'].dropna().unique())
@@ -325,14 +429,15 @@ class DataFrameExplorer:
         '''
         # check recipe dne
         rname = textbox.value.strip()
-        if self.cc.findframe(rname).empty:
+        if not self.cc.has_frame(rname):
             # add to costdf
             newdf = pd.DataFrame(
                 data={'item':['recipe'], 
                       'ingredient':[rname], 
                       'quantity':['1 ct']}
             )
-            self.cc.costdf = pd.concat([self.cc.costdf, newdf], ignore_index=True)
+            self.cc.journal.append('costdf', newdf)
+            self.cc.invalidate(rname)
             nicks = set(self.cc.uni_g['nickname'].dropna().unique())
             ingrs = set(self.cc.costdf['ingredient'].dropna().unique())
             self.allvals = nicks.union(ingrs)
@@ -371,7 +476,9 @@ class DataFrameExplorer:
         )
         
         # Add the new ingredient to the guide
-        self.cc.uni_g = pd.concat([self.cc.uni_g, new_ingredient], ignore_index=True)
+        self.cc.journal.append('uni_g', new_ingredient)
+        # recipes may already list it
+        self.cc.invalidate(ing_name, parents=True)
         
         # Update the available values for search
         nicks = set(self.cc.uni_g['nickname'].dropna().unique())
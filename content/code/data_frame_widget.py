@@ -1,8 +1,14 @@
 import pandas as pd
 import ipywidgets as widgets
 import numpy as np
+import threading
+from html import escape
+from types import SimpleNamespace
+from contextlib import ExitStack, contextmanager
 from IPython.display import display, clear_output
 from costcalulator import CostCalculator
+from column_widths import ColumnWidths
+from html_table import HtmlTable
 from utils import *
 
 class DataFrameWidget:
@@ -10,11 +16,16 @@ class DataFrameWidget:
     '''
     
     def __init__(self, df, width='80px', enabled_columns=None, hide_columns=None, 
-                 cc=CostCalculator(), output=widgets.Output(), trigger=None):
+                 cc=None, output=None, trigger=None, edit_delay=0,
+                 render_mode='widgets'):
+        # created here, not as defaults, so importing the module builds nothing
+        cc = cc if cc is not None else CostCalculator()
+        output = output if output is not None else widgets.Output()
         self.df = df.reset_index(drop=True).copy()
         self.defcolor = widgets.Text().style.text_color
         self.width = width
         self.column_width = {}
+        self.column_widths = ColumnWidths(char_width=10, header_char_width=8, pad=5)
         self.df_type = None
         self.enabled_columns = enabled_columns if enabled_columns else []
         self.hide_columns = hide_columns if hide_columns else []
@@ -45,11 +56,36 @@ class DataFrameWidget:
             
         self.df_types = set(('guide', 'recipe', 'mentions'))
         
-        self.grid = self._create_grid()
+        # cell widgets are pooled per (row, column, kind) slot and rebound on refresh
+        self.pool = {}
+        self.pool_slack = 20  # spare rows of widgets kept when a frame shrinks
+        self.shown_kinds = {}  # (row, column) -> kind of widget the grid shows there
+        self.binding = False
+        self.cells = {}
+        # frame and layout currently shown, used to patch only changed cells
+        self.shown_df = None
+        self.shown_key = None
+        self.grid = widgets.GridBox([])
+        # edits are queued and recosted/redrawn together once they settle
+        self.edit_delay = edit_delay  # seconds to wait for further edits
+        self.edit_lock = threading.RLock()
+        self.edit_timer = None
+        self.batch_depth = 0
+        self.pending = self._new_pending()
+        self.edited_cells = set()
+        # 'html' shows the frame as one HTML table while nothing is editable
+        self.render_mode = render_mode
+        self.html_table = None
+        self._create_grid()
 
-    def setdf(self, mylookup):
+    def setdf(self, mylookup, frame=None):
+        ''' show the definition of 'mylookup', 'frame' is used in place of
+            findframe when it was already built (e.g. on a snapshot)
+        '''
         self.last_lookup = mylookup
-        mydf =  self.cc.findframe(mylookup).reset_index(drop=True).copy()
+        if frame is None:
+            frame = self.cc.findframe(mylookup)
+        mydf = frame.reset_index(drop=True).copy()
         self.df = mydf
         self.findtype()
         if (self.df_type == 'recipe'):
@@ -76,19 +112,10 @@ class DataFrameWidget:
             
             
     def update_column_width(self):
-        def carlen(myval):
-            myval = f"{myval:0.2f}" if isinstance(myval, float) else myval
-            return len(str(myval))
-
-        # Calculate maxlen using map
+        # widths fit the longest value (floats as 0.2f) and the column name,
+        # lengths are cached per lookup so only edited rows are measured again
         try:
-            maxlen = self.df.apply(lambda x: x.map(lambda y: 5 + 10 * carlen(y))).max().to_dict()
-            
-            # Calculate cn_len for column names
-            cn_len = {c: 5 + 8 * len(str(c)) for c in self.df.columns}
-
-            # Update column_width using the maximum value between maxlen and cn_len
-            self.column_width = {c: max(maxlen[c], cn_len[c]) for c in maxlen}
+            self.column_width = self.column_widths.widths(self.df, key=(self.df_type, self.last_lookup))
             if self.df_type == 'recipe':
                 self.column_width['item'] = 5 + 8 * len('recipe for:')
         except:
@@ -98,11 +125,14 @@ class DataFrameWidget:
                 self.column_width['item'] = 5 + 8 * len('recipe for:')
         
     def update_display(self):
-        self.grid.disabled = True
-        self.grid = self._create_grid()
-        with self.output:
-            self.output.clear_output(wait=True)
-            display(self.grid)
+        if self.html_view():
+            self.render_html()
+        # push only the changed cells when the same layout is still displayed
+        elif not self._patch_grid():
+            self._create_grid()
+            with self.output:
+                self.output.clear_output(wait=True)
+                display(self.grid)
 
         if (self.trigger != None):
             if (self.df_type == 'recipe'):
@@ -131,447 +161,710 @@ class DataFrameWidget:
             self.df_type = None
         return self.df_type
         
+    def _pooled(self, key, create):
+        ''' get the pooled widget for slot 'key', creating it if needed
+            pooled widgets are kept between refreshes and only rebound,
+            so a refresh does not create a new widget (comm) for every cell
+        '''
+        widget = self.pool.get(key)
+        if widget is None:
+            widget = create()
+            self.pool[key] = widget
+        if len(key) == 3:
+            self.shown_kinds[key[:2]] = key[2]
+        return widget
+
+    def _trim_pool(self, num_rows):
+        ''' close pooled widgets for rows well beyond the current frame, and
+            those of another kind than their (row, column) slot shows now
+        '''
+        def unused(key):
+            if not isinstance(key[0], int):
+                return False
+            if key[0] >= num_rows + self.pool_slack:
+                return True
+            kind = self.shown_kinds.get(key[:2])
+            return kind is not None and kind != key[2]
+
+        for key in [k for k in self.pool if unused(k)]:
+            self._close(self.pool.pop(key))
+
+    def _close(self, widget):
+        ''' close a widget with its children, layout and style
+        '''
+        for child in getattr(widget, 'children', ()):
+            self._close(child)
+        for part in (getattr(widget, 'layout', None), getattr(widget, 'style', None)):
+            if isinstance(part, widgets.Widget):
+                part.close()
+        widget.close()
+
     def _create_grid(self):
         # Create a list to store the widgets
         items = []
-        
+
         self.num_cols = len(self.df.columns) + 1 # extra one for button
-        # Create a GridBox to display the widgets
+        self.edited_cells = set()
+        self.shown_kinds = {}
+        # Rebind the pooled cell widgets instead of creating new ones
+        self.binding = True
+        try:
+            # Setup column names
+            # add blank label in place of a button
+            for i in range(self.num_cols - len(self.df.columns)):
+                label = self._pooled(('header', i), widgets.Label)
+                label.value = ''
+                label.layout.width = self.getlayout()['width']
+                label.layout.padding = '0px 1px'
+                items.append(label)
 
-        # Setup column names
-        # add blank label in place of a button
-        
-        for i in range(self.num_cols - len(self.df.columns)):
-            items.append(widgets.Label(value='', layout=self.getlayout()))
-        
-        # add column labels for each column at top of interface
-        for col in self.df.columns:
-            items.append(widgets.Label(value=col, layout=self.getlayout(col)))
-            
-        # if we have a recipe df, add row at end for ability to add to ingredient to recipe
-        if self.df_type == 'recipe':
-            new_row = pd.DataFrame({column: [''] for column in self.df.columns})
-            # set blank row up as a member of the recipe
-            new_row['item'] = self.df.iloc[0]['ingredient']
-            self.df = pd.concat([self.df, new_row], ignore_index=True)
+            # add column labels for each column at top of interface
+            for j, col in enumerate(self.df.columns, start=self.num_cols - len(self.df.columns)):
+                label = self._pooled(('header', j), widgets.Label)
+                label.value = col
+                label.layout.width = self.getlayout(col)['width']
+                label.layout.padding = '0px 1px'
+                items.append(label)
 
-        # Create interface for each row of the DataFrame
-        for index, row in self.df.iterrows():
-            self.create_row(items, index, row)
-        
-        grid = widgets.GridBox(items, layout=widgets.Layout(grid_template_columns=f"repeat({self.num_cols}, {self.width})"))
+            # if we have a recipe df, add row at end for ability to add to ingredient to recipe
+            if self.df_type == 'recipe':
+                new_row = pd.DataFrame({column: [''] for column in self.df.columns})
+                # set blank row up as a member of the recipe
+                new_row['item'] = self.df.iloc[0]['ingredient']
+                self.df = pd.concat([self.df, new_row], ignore_index=True)
+
+            # Create interface for each row of the DataFrame
+            self.buttons = {}
+            self.cells = {}
+            for index, row in self.df.iterrows():
+                self.create_row(items, index, row)
+        finally:
+            self.binding = False
+
+        self._trim_pool(len(self.df))
+        self.grid.children = items
         # set the width of the first column to 100 pixels
-        grid.layout.grid_template_columns = f"{self.width} {'px '.join([str(self.column_width[x]) for x in self.df.columns])}px"
-        return grid
-    
+        self.grid.layout.grid_template_columns = f"{self.width} {'px '.join([str(self.column_width[x]) for x in self.df.columns])}px"
+        self.shown_df = self.df.copy()
+        self.shown_key = self._display_key()
+        return self.grid
+
     def create_row(self, items, index, row):
         ''' given a 'row' from a dataframe and the 'index' of the row in the dataframe
-            create ui widgets for the row and add the widgets to 'items'
+            bind pooled ui widgets to the row and add the widgets to 'items'
         '''
-        # Create a button for each row and associate it with the row index
-        # only create lookup button for row with ingredients
-        butlist = []
-        
-        def create_lookup_button():
-            # check there is a valid thing to lookup
-            button = widgets.Button(description=f'lookup', layout=self.getlayout())
-            if self.cc.findframe(row['ingredient']).empty:
-                button.disabled = True
-            button.tag = index  # Store the row index in the button's 'tag' attribute
-            button.on_click(self.on_lookup_click)
-            return button
-        
-        def create_search_button():
-            button = widgets.Button(description=f'search', layout=self.getlayout())
-            button.tag = index  # Store the row index in the button's 'tag' attribute
-            button.on_click(self.on_search_click)
-            return button
+        # add button based on what type of dataframe we have
+        if self.df_type:
+            items.append(self._bind_buttons(index, row))
 
-        def create_duplicate_button():
-            button = widgets.Button(description=f'duplicate', layout=self.getlayout(), button_style='info')
-            button.tag = index  # Store the row index in the button's 'tag' attribute
-            button.on_click(self.on_duplicate_click)
+        # Bind a widget for each cell in the row
+        for j, col in enumerate(self.df.columns, start=1):
+            items.append(self._bind_cell(index, j, col, row))
+
+    def _bind_buttons(self, index, row):
+        ''' bind the pooled button box of row 'index'
+        '''
+        # Bind a button for each row and associate it with the row index
+        # only enable lookup button for row with ingredients
+        def new_button(description, on_click, button_style=''):
+            button = widgets.Button(description=description, layout=self.getlayout(), button_style=button_style)
+            button.on_click(on_click)
             return button
-        
-        def create_delete_button():
-            # Add delete button
-            button = widgets.Button(description=f'delete', layout=self.getlayout(), button_style='danger')
+
+        def create_buttons(kind):
+            if kind == 'search':
+                butlist = [new_button('search', self.on_search_click)]
+            elif kind == 'lookup':
+                butlist = [new_button('lookup', self.on_lookup_click)]
+            else:
+                butlist = [new_button('duplicate', self.on_duplicate_click, 'info'),
+                           new_button('delete', self.on_delete_click, 'danger')]
+            return widgets.HBox(butlist)
+
+        if self.df_type == 'recipe':
+            kind = 'search' if row['item'] == 'recipe' else 'lookup'
+        elif self.df_type == 'guide':
+            kind = 'guide'
+        else:
+            kind = 'lookup'
+
+        button_box = self._pooled((index, 0, kind), lambda: create_buttons(kind))
+        for button in button_box.children:
             button.tag = index  # Store the row index in the button's 'tag' attribute
-            button.on_click(self.on_delete_click)
-            return button
-        
-        def set_df_val(df, row, column, newval):
-            df.loc[
+            button.disabled = False
+        if kind == 'lookup':
+            # check there is a valid thing to lookup
+            button_box.children[0].disabled = not self.cc.has_frame(row['ingredient'])
+        self.buttons[index] = button_box.children[0]
+        return button_box
+
+    def _bind_cell(self, index, j, col, row):
+        ''' bind the pooled widget for the cell of row 'index', column 'col'
+            (at grid position j) and return it
+        '''
+        is_disabled = (col not in self.enabled_columns) or (self.df_type == 'mentions' and col == 'ingredient')
+        # hide cell visibility
+        hide = False
+        # Simplifying value assignment and handling for 'myval'
+        if str(row[col]) not in [str(np.nan), '']:
+             myval = row[col]
+        else:
+            myval = ''
+            hide = True
+        #myval = row[col] if str(row[col]) not in [str(np.nan), ''] else '-'
+        myval = f"{myval:0.2f}" if isinstance(myval, float) else myval
+
+        # Widget assignment based on 'item' and 'df_type'
+        width = self.getlayout(col)['width']
+        font_style = None
+        if col == 'item':
+            kind = 'label'
+            if myval == 'recipe':
+                myval = 'recipe for:'
+                font_style = 'italic'
+            elif self.df_type == 'mentions':
+                width = self.getlayout()['width']
+            else:
+                myval = ''
+                width = None
+        elif is_disabled or (col == 'ingredient' and self.df_type == 'recipe' and row['item'] == 'recipe'):
+            kind = 'label'
+        elif (col == 'ingredient') and (self.df_type == 'recipe') and (myval == ''):
+            kind = 'combo' # use combobox for blank item
+        else:
+            kind = 'text'
+
+        cell_widget = self._pooled((index, j, kind), lambda: self._create_cell(kind))
+        if kind == 'label':
+            cell_widget.style.font_style = font_style
+        elif kind == 'combo':
+            cell_widget.options = tuple(self.all_ingredients)
+        cell_widget.value = str(myval)
+        cell_widget.layout.width = width
+        cell_widget.layout.padding = '0px 1px' if width else None
+        if kind != 'label':
+            cell_widget.disabled = is_disabled
+            cell_widget.style.text_color = self.defcolor
+            cell_widget.cell = (index, col)
+
+        cell_widget.layout.visibility = 'hidden' if (hide and is_disabled) else None
+        self.cells[(index, col)] = cell_widget
+        return cell_widget
+
+    def html_view(self):
+        ''' True if the frame is shown as one HTML table (view mode)
+        '''
+        return self.render_mode == 'html' and not self.enabled_columns and self.df_type is not None
+
+    def render_html(self):
+        ''' show the frame as one HTML table, the row buttons become links
+            that call the same handlers with a stand-in for the button
+        '''
+        if self.html_table is None:
+            self.html_table = HtmlTable()
+        table = self.html_table
+        table.clear()
+
+        columns = list(self.df.columns)
+        widths = [self.width] + [f"{self.column_width.get(col, 80)}px" for col in columns]
+        body = ["<table class='mv-table'>",
+                ''.join(f"<col style='width: {w}'>" for w in widths),
+                "<tr><th></th>" + ''.join(f"<th>{escape(str(col))}</th>" for col in columns) + "</tr>"]
+        for index, row in self.df.iterrows():
+            body.append(f"<tr><td>{self._html_action(table, index, row)}</td>")
+            for col in columns:
+                value, cls = row[col], ''
+                if str(value) in [str(np.nan), '']:
+                    value = ''
+                value = f"{value:0.2f}" if isinstance(value, float) else value
+                if col == 'item':
+                    if value == 'recipe':
+                        value, cls = 'recipe for:', 'mv-italic'
+                    elif self.df_type != 'mentions':
+                        value = ''
+                body.append(f"<td class='{cls}'>" if cls else "<td>")
+                body.append(f"{escape(str(value))}</td>")
+            body.append("</tr>")
+        body.append("</table>")
+        table.render(''.join(body))
+
+        # the grid has to be rebuilt when editing again
+        self.shown_df = None
+        with self.output:
+            self.output.clear_output(wait=True)
+            display(table.widget)
+
+    def _html_action(self, table, index, row):
+        ''' html link taking the place of the buttons of row 'index'
+            guide rows get none, duplicate and delete are editing actions
+        '''
+        if self.df_type == 'recipe' and row['item'] == 'recipe':
+            return table.link('search', lambda: self.on_search_click(SimpleNamespace(tag=index)),
+                              tooltip=f"items containing {row['ingredient']}")
+        if self.df_type == 'recipe':
+            name = row['ingredient']
+        elif self.df_type == 'mentions':
+            name = row['item']
+        else:
+            return ''
+        if not self.cc.has_frame(name):
+            return ''
+        return table.link('lookup', lambda: self.on_lookup_click(SimpleNamespace(tag=index, disabled=False)),
+                          tooltip=f"look up {name}")
+
+    def _display_key(self):
+        ''' everything besides cell values that decides how the grid is laid out
+        '''
+        return (self.df_type, tuple(self.df.columns), tuple(self.enabled_columns),
+                tuple(self.column_width.get(c) for c in self.df.columns))
+
+    def _patch_grid(self):
+        ''' update only the cells whose values differ from the displayed frame
+            all changed widgets are synced together when the batch closes
+            returns False if the frame can't be patched (use _create_grid)
+        '''
+        if self.shown_df is None or self.shown_key != self._display_key():
+            return False
+
+        newdf = self.df
+        if self.df_type == 'recipe':
+            new_row = pd.DataFrame({column: [''] for column in newdf.columns})
+            new_row['item'] = newdf.iloc[0]['ingredient']
+            newdf = pd.concat([newdf, new_row], ignore_index=True)
+        olddf = self.shown_df
+        if len(newdf) != len(olddf):
+            return False
+
+        # find changed cells, treating missing values as equal
+        changed = {}
+        for col in newdf.columns:
+            new, old = newdf[col].astype(object), olddf[col].astype(object)
+            rows = np.flatnonzero(~((new == old) | (new.isna() & old.isna())).to_numpy())
+            if len(rows):
+                changed[col] = [int(i) for i in rows]
+        # edited cells are redrawn too, a rejected edit reverts to the frame value
+        for index, col in self.edited_cells:
+            if col in changed and index < len(newdf):
+                if index not in changed[col]:
+                    changed[col].append(index)
+            elif col in newdf.columns and index < len(newdf):
+                changed[col] = [index]
+        self.edited_cells = set()
+
+        self.binding = True
+        try:
+            with ExitStack() as batch:
+                def hold(widget):
+                    batch.enter_context(widget.hold_sync())
+                    batch.enter_context(widget.layout.hold_sync())
+                    return widget
+
+                rebound = set()
+                for col, rows in changed.items():
+                    j = list(newdf.columns).index(col) + 1
+                    for index in rows:
+                        row = newdf.iloc[index]
+                        if self.df_type and col in ('item', 'ingredient') and index not in rebound:
+                            # the row's buttons depend on what it refers to
+                            rebound.add(index)
+                            old_button = self.buttons.get(index)
+                            if old_button is None:
+                                return False
+                            hold(old_button)
+                            if self._bind_buttons(index, row).children[0] is not old_button:
+                                return False
+                        widget = self.cells.get((index, col))
+                        if widget is None:
+                            return False
+                        hold(widget)
+                        if self._bind_cell(index, j, col, row) is not widget:
+                            # the kind of widget changed, the grid must be rebuilt
+                            return False
+        finally:
+            self.binding = False
+
+        self.df = newdf
+        self.shown_df = newdf.copy()
+        return True
+
+    def _create_cell(self, kind):
+        ''' create a new cell widget of the given kind ('label', 'text', 'combo')
+            input cells observe on_cell_change once, for as long as they are pooled
+        '''
+        if kind == 'label':
+            return widgets.Label()
+        if kind == 'combo':
+            cell_widget = widgets.Combobox(ensure_option=False, continuous_update=False)
+        else:
+            cell_widget = widgets.Text(continuous_update=False)
+        cell_widget.observe(self.on_cell_change, 'value')
+        return cell_widget
+
+    def on_cell_change(self, change):
+        ''' route a value change of a pooled input cell to on_text_change
+        '''
+        if self.binding:
+            return
+        cell_widget = change['owner']
+        index, column = cell_widget.cell
+        with self.edit_lock:
+            # redraw the edited cell even if the frame is unchanged (rejected edit)
+            self.edited_cells.add((index, column))
+            # one undo step per edit
+            with self.cc.journal.batch():
+                self.on_text_change(change, index, column, cell_widget)
+
+    @staticmethod
+    def _new_pending():
+        return {'lookup': None, 'clear': set(), 'clear_ingredients': set(), 'recost': set()}
+
+    def queue_refresh(self, lookup, clear=(), clear_ingredients=(), recost=()):
+        ''' queue the cost updates and redraw needed after an edit
+            'clear' recipes have their cost cleared, 'clear_ingredients' have the
+            cost of every recipe using them cleared, 'recost' recipes are costed
+            again and 'lookup' is shown.
+            requests arriving within edit_delay seconds of each other, or inside
+            batch_edit(), are merged and applied once by flush_edits
+        '''
+        # the edit already changed cc's frames, cached frames using them are stale
+        self.cc.invalidate(lookup, *clear, *clear_ingredients, *recost, parents=True)
+        with self.edit_lock:
+            self.pending['lookup'] = lookup
+            self.pending['clear'].update(clear)
+            self.pending['clear_ingredients'].update(clear_ingredients)
+            self.pending['recost'].update(recost)
+            if self.batch_depth > 0:
+                return
+            if self.edit_timer is not None:
+                self.edit_timer.cancel()
+            self.edit_timer = run_later(self.edit_delay, self.flush_edits)
+
+    def flush_edits(self, refresh=True):
+        ''' apply the queued cost updates now, each recipe is cleared and
+            costed once however many edits touched it
+            the display is redrawn unless refresh is False
+        '''
+        with self.edit_lock:
+            if self.edit_timer is not None:
+                self.edit_timer.cancel()
+                self.edit_timer = None
+            pending, self.pending = self.pending, self._new_pending()
+            if pending['lookup'] is None:
+                return
+
+            # costs are written under the journal's lock, as background results
+            # are merged
+            with self.cc.journal.lock:
+                clear = set(pending['clear'])
+                for nickname in pending['clear_ingredients']:
+                    clear |= self.clear_ingredient_costs(nickname)
+                for recipename in clear:
+                    self.cc.clear_cost(recipename)
+                for recipename in pending['recost']:
+                    self.cc.recipe_cost(recipename)
+
+            if refresh:
+                self.setdf(pending['lookup'])
+                self.update_display()
+
+    @contextmanager
+    def batch_edit(self):
+        ''' merge every edit made inside the block into a single flush
+        '''
+        with self.edit_lock:
+            self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self.edit_lock:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    self.flush_edits()
+
+    def undo(self):
+        ''' revert the last edit (see EditJournal) and show the result
+        '''
+        self._journal_move(self.cc.journal.undo)
+
+    def redo(self):
+        ''' apply the last undone edit again and show the result
+        '''
+        self._journal_move(self.cc.journal.redo)
+
+    def _journal_move(self, move):
+        with self.edit_lock:
+            # queued edits are part of the journal already, settle them first
+            self.flush_edits(refresh=False)
+            affected = move()
+            if affected is None:
+                return
+            recipes, nicknames = affected
+            nicks = set(self.cc.uni_g['nickname'].dropna().unique())
+            ingrs = set(self.cc.costdf['ingredient'].dropna().unique())
+            self.all_ingredients = nicks.union(ingrs)
+            recost = [self.last_lookup] if self.df_type == 'recipe' else []
+            with self.batch_edit():
+                self.queue_refresh(self.last_lookup, clear=recipes, clear_ingredients=nicknames, recost=recost)
+
+    def clear_ingredient_costs(self, nickname):
+        ''' zero the cost of 'nickname' in each recipe containing it
+            returns the names of those recipes, whose cost must be cleared
+        '''
+        mdf = self.cc.find_ingredient(nickname)
+        for i,m in mdf.iterrows():
+            self.cc.set_item_ingredient(m['item'], nickname, 'cost', 0)
+        return set(mdf['item'])
+
+    def on_text_change(self, change, index, column, widget):
+        ''' apply an edit made in the cell at row 'index', 'column'
+        '''
+        # cc's tables are edited through its journal, so edits can be undone
+        def set_df_val(table, row, column, newval):
+            df = getattr(self.cc, table)
+            self.cc.journal.set(table,
                 (
                     df['item'] == row['item']
                 ) & 
                 (
                     df['ingredient'] == row['ingredient']
-                ), column] = newval
+                ), column, newval)
 
-        def set_df_for_iq(df, row, column, newval):
+        def set_df_for_iq(table, row, column, newval):
             '''
-                set a value for df, match ingredient, quantity
+                set a value for table, match ingredient, quantity
             '''
-            df.loc[
+            df = getattr(self.cc, table)
+            self.cc.journal.set(table,
                 (
                     df['ingredient'] == row['ingredient']
                 ) & 
                 (
                     df['quantity'] == row['quantity']
-                ), column] = newval
-            
-        def get_df_val(df, row, column):
-            return df.loc[
-                (
-                    df['item'] == row['item']
-                ) & 
-                (
-                    df['ingredient'] == row['ingredient']
-                ), column].values[0]
+                ), column, newval)
 
-            
-        # Add an observer to the Text widget that enables the button when the content changes
-        def on_text_change(change, column, widget):
-            
-            def _update_df(df, row, match_columns, update_column, new_value):
-                condition = True
-                for col in match_columns:
-                    condition &= (df[col] == row[col])
-                df.loc[condition, update_column] = new_value
-                
-            # clear cost of each recipe containing ingredient
-            def _clear_costs(nickname):
-                mdf = self.cc.find_ingredient(nickname)
-                for i,m in mdf.iterrows():
-                    self.cc.set_item_ingredient(m['item'], nickname, 'cost', 0)
-                    self.cc.clear_cost(m['item'])
-            
-            defmatch = ['nickname', 'description', 'size', 'price', 'date', 'supplier']
-            newval = change['new']
-            oldval = self.df.iloc[index][column]
-                
-            if column == 'quantity':
-                if self.df_type == 'recipe':
-                    recipename = self.df.iloc[0]['ingredient']
-                    # only update as recipe if in recipe mode
-                    # check that we are editting a quantity for a valid ingredient
-                    if self.df.iloc[index]['ingredient'] in self.all_ingredients:
-                        #newsize = parse_quant(newval)
-                        #oldsize = parse_quant(oldval)
-                        # print(f"{oldval=}, {newval=}")
-                        row = self.df.iloc[index]
-                        # set_df_val(cc.costdf, row, column, newval)
-                        self.df.loc[index:index, column] = newval
-                        if (newval != oldval):
-    
-                            #button[0].disabled = False
-                            updatecost = True
-                            set_df_val(self.cc.costdf, row, column, newval)
-                            set_df_val(self.cc.costdf, row, 'cost', 0)
-    
-                            self.cc.clear_cost(recipename)
-                            self.cc.recipe_cost(recipename)
-                            self.setdf(recipename)
-                            self.update_display()
-                        
-            elif column == 'ingredient':
-                if self.df_type == 'recipe':
-                    recipename = self.df.iloc[0]['ingredient']
-                    # check if valid ingredient
-                    if newval in self.all_ingredients:
-                        widget.style.text_color = self.defcolor
-                        # check if ingredient is alread in recipe
-                        self.df.loc[index:index, 'item'] = recipename
-                        if newval in self.cc.item_list(recipename)['ingredient'].unique():
-                            # ignore (repeated ingredients not allowed)
-                            print('already in recipe')
-                        else:
-                            # check if there was a valid old value
-                            if oldval in self.all_ingredients:
-                                self.cc.removeIngredient(recipename, oldval)
-
-                            # add new row to costdf
-                            # set quantity to zero if none
-                            self.df.loc[index:index, 'ingredient'] = newval
-                            quant = parse_quant(self.df.loc[index]['quantity'])
-                            if not quant:
-                                self.df.loc[index:index, 'quantity'] = '0'
-                            self.df.loc[index:index, 'cost'] = 0
-                            newdf = pd.DataFrame([self.df.iloc[index]])
-                            self.cc.costdf = pd.concat([self.cc.costdf, newdf], ignore_index=True)
-
-                            self.cc.clear_cost(recipename)
-                            self.cc.recipe_cost(recipename)
-                            self.setdf(recipename)
-                            # self.df = self.cc.findframe(reciperow['ingredient']).reset_index(drop=True)
-                            self.update_display()
-
-                    else: # newval not an ingredient
-                        if str(newval) == '':
-                            self.cc.removeIngredient(recipename, oldval)
-                            self.cc.clear_cost(recipename)
-                            self.cc.recipe_cost(recipename)
-                            self.setdf(recipename)
-                            # self.df = self.cc.findframe(reciperow['ingredient']).reset_index(drop=True)
-                            self.update_display()
-                        else:
-                            widget.style.text_color = 'red'
-                            #widget.add_class('invalid-input')  # CSS class for invalid input
-
-                            
-
-            elif column == 'saved cost':
-                # check if valid cost
-                try:
-                    newval = float(newval)
-                    # check valid value
-            
-                except:
-                    # clear saved cost?
-                    newval = -1
+        def _update_df(table, row, match_columns, update_column, new_value):
+            df = getattr(self.cc, table)
+            condition = True
+            for col in match_columns:
+                condition &= (df[col] == row[col])
+            self.cc.journal.set(table, condition, update_column, new_value)
+            # keep the shown row in step, queued edits to it still match on it
+            if update_column in self.df.columns:
+                self.df.at[index, update_column] = new_value
 
-                if self.df_type == 'recipe':
-                    recipename = self.df.iloc[0]['ingredient']
-                    # update saved cost
+        defmatch = ['nickname', 'description', 'size', 'price', 'date', 'supplier']
+        newval = change['new']
+        oldval = self.df.iloc[index][column]
+
+        if column == 'quantity':
+            if self.df_type == 'recipe':
+                recipename = self.df.iloc[0]['ingredient']
+                # only update as recipe if in recipe mode
+                # check that we are editting a quantity for a valid ingredient
+                if self.df.iloc[index]['ingredient'] in self.all_ingredients:
+                    #newsize = parse_quant(newval)
+                    #oldsize = parse_quant(oldval)
+                    # print(f"{oldval=}, {newval=}")
                     row = self.df.iloc[index]
-                    if (newval < 0):
-                        set_df_val(self.cc.costdf, row, 'saved cost', np.nan)
-                        if (self.cc.use_saved):
-                            self.cc.set_item_ingredient(recipename, row['ingredient'], 'cost', 0)
-                            self.cc.costdf.loc[self.cc.costdf['ingredient'] == row['ingredient'],'cost'] = 0
-                    else:
-                        set_df_val(self.cc.costdf, row, 'saved cost', newval)
-                    #set_df_val(cc.costdf, row, 'cost', newval)
-                    
-                    # zero out all affected cost
-                    # parent recipe, 
-                    self.cc.clear_cost(recipename)
+                    # set_df_val(cc.costdf, row, column, newval)
+                    self.df.loc[index:index, column] = newval
+                    if (newval != oldval):
 
-                    self.cc.recipe_cost(recipename)
-                    self.setdf(recipename)
-                    print('saved cost')
-                    self.update_display()
-                    
-            elif column == 'menu price':
-                # check if valid cost
-                try:
-                    newval = float(newval)
-                    # check valid value
-            
-                except:
-                    print('invalid menu price')
-                    return
+                        #button[0].disabled = False
+                        updatecost = True
+                        set_df_val('costdf', row, column, newval)
+                        self.cc.set_item_ingredient(row['item'], row['ingredient'], 'cost', 0)
 
-                if self.df_type == 'recipe':
-                    recipename = self.df.iloc[0]['ingredient']
-                    # update menu price
-                    row = self.df.iloc[index]
-                    #self.cc.costdf.loc[self.costdf['']
-                    set_df_for_iq(self.cc.costdf, row, 'menu price', newval)
-                    self.setdf(recipename)
-                    self.update_display()
+                        self.queue_refresh(recipename, clear=[recipename], recost=[recipename])
 
-            elif column == 'date':
-                if self.df_type == 'guide':
-                    row = self.df.iloc[index]
-                    # match nickname, description, size, date
-                    mydate = pd.to_datetime(newval, errors='coerce')
-                    if (mydate is pd.NaT):
-                        # don't update if date if the input is invalid
-                        self.update_display()
+        elif column == 'ingredient':
+            if self.df_type == 'recipe':
+                recipename = self.df.iloc[0]['ingredient']
+                # check if valid ingredient
+                if newval in self.all_ingredients:
+                    widget.style.text_color = self.defcolor
+                    # check if ingredient is alread in recipe
+                    self.df.loc[index:index, 'item'] = recipename
+                    if newval in self.cc.item_list(recipename)['ingredient'].unique():
+                        # ignore (repeated ingredients not allowed)
+                        print('already in recipe')
                     else:
-                        mydate = mydate.strftime('%Y-%m-%d')
-                        
-                        _update_df(self.cc.uni_g, row, defmatch, 'date', mydate)
-                        
-                        _clear_costs(row['nickname'])
+                        # check if there was a valid old value
+                        if oldval in self.all_ingredients:
+                            self.cc.removeIngredient(recipename, oldval)
 
-                        self.setdf(row['nickname'])
-                        self.update_display()
-                    
-            elif column == 'size':
-                if self.df_type == 'guide':
-                    row = self.df.iloc[index]
-                    newval = newval.strip()
-                    newsize = parse_size(newval)
-                    if (newval in ['', '-', '0']) or (newsize.m <= 0):
-                        # ignore blank size, 0 size
-                        self.update_display()
+                        # add new row to costdf
+                        # set quantity to zero if none
+                        self.df.loc[index:index, 'ingredient'] = newval
+                        quant = parse_quant(self.df.loc[index]['quantity'])
+                        if not quant:
+                            self.df.loc[index:index, 'quantity'] = '0'
+                        self.df.loc[index:index, 'cost'] = 0
+                        newdf = pd.DataFrame([self.df.iloc[index]])
+                        self.cc.journal.append('costdf', newdf)
+
+                        self.queue_refresh(recipename, clear=[recipename], recost=[recipename])
+
+                else: # newval not an ingredient
+                    if str(newval) == '':
+                        self.cc.removeIngredient(recipename, oldval)
+                        self.queue_refresh(recipename, clear=[recipename], recost=[recipename])
                     else:
-                        # match nickname, description, size, date
-                        _update_df(self.cc.uni_g, row, defmatch, 'size', newval)
-                        _clear_costs(row['nickname'])
-    
-                        self.setdf(row['nickname'])
-                        self.update_display()
-                        # update mention display?
-            
-            elif column == 'price':
-                if self.df_type == 'guide':
-                    row = self.df.iloc[index]
-                    try:
-                        newval = float(newval)
-                    except:
-                        print('bad new price')
-                        return
-
-                    # match nickname, description, size, date, and update
-                    _update_df(self.cc.uni_g, row, defmatch, 'price', newval)
-                    
-                    # clear cost of each recipe containing ingredient
-                    _clear_costs(row['nickname'])
+                        widget.style.text_color = 'red'
+                        #widget.add_class('invalid-input')  # CSS class for invalid input
 
-                    self.setdf(row['nickname'])
-                    self.update_display()
-                    # update mention display?
-                    
-            elif column == 'supplier':
-                if self.df_type == 'guide':
-                    row = self.df.iloc[index]
-                    # match nickname, description, size, date, and update
-                    _update_df(self.cc.uni_g, row, defmatch, 'supplier', newval)          
-                    # clear cost of each recipe containing ingredient
-                    _clear_costs(row['nickname'])
 
-                    self.setdf(row['nickname'])
-                    self.update_display()
-                    # update mention display?
-                    
-            elif column == 'order':
-                if self.df_type == 'guide':
-                    row = self.df.iloc[index]
-                    try:
-                        newval = str(newval)
-                    except:
-                        print('bad order value')
-                        return
-
-                    # match nickname, description, size, date, and update
-                    _update_df(self.cc.uni_g, row, defmatch, 'order', newval)          
-                    
-                    # clear cost of each recipe containing ingredient
-                    _clear_costs(row['nickname'])
-                    
-                    self.setdf(row['nickname'])
-                    self.update_display()
-                    
-            elif column == 'description':
-                if self.df_type == 'guide':
-                    row = self.df.iloc[index]
-                    # match nickname, description, size, date, and update
-                    _update_df(self.cc.uni_g, row, defmatch, 'description', newval)          
-                    self.setdf(row['nickname'])
-                    self.update_display()
-                    # update mention display?
-                    
-            elif column == 'allergen':
-                if self.df_type == 'guide':
-                    row = self.df.iloc[index]
-                    # match nickname, description, supplier
-                    _update_df(self.cc.uni_g, row, ['nickname', 'description', 'supplier'], 'allergen', newval)          
-                    self.setdf(row['nickname'])
-                    self.update_display()
-                    # update mention display?
-                    
-            elif column == 'conversion':
-                if (self.df_type == 'guide') or (self.df_type == 'recipe'):
-                    row = self.df.iloc[index]
-                    newval = newval.strip()
-                    # check valid conversion
-                    convrs = parse_conversion(newval)
-                    if len(convrs) > 0:
-                        # set convrs
-                        if self.df_type == 'recipe':
-                            _update_df(self.cc.costdf, row, ['ingredient', 'item', 'quantity'], 'conversion', newval)
-                            _clear_costs(row['ingredient'])
-                            self.setdf(row['ingredient'])
-                        else:
-                            _update_df(self.cc.uni_g, row, ['nickname', 'description', 'size', 'supplier'], 'conversion', newval)
-                            _clear_costs(row['nickname'])
-                            self.setdf(row['nickname'])
-                        self.update_display()
-        
-        # add button based on what type of dataframe we have
-        if self.df_type:
+
+        elif column == 'saved cost':
+            # check if valid cost
+            try:
+                newval = float(newval)
+                # check valid value
+
+            except:
+                # clear saved cost?
+                newval = -1
+
             if self.df_type == 'recipe':
-                if row['item'] == 'recipe':
-                    butlist.append(create_search_button())
+                recipename = self.df.iloc[0]['ingredient']
+                # update saved cost
+                row = self.df.iloc[index]
+                if (newval < 0):
+                    set_df_val('costdf', row, 'saved cost', np.nan)
+                    if (self.cc.use_saved):
+                        self.cc.set_item_ingredient(recipename, row['ingredient'], 'cost', 0)
+                        self.cc.costdf.loc[self.cc.costdf['ingredient'] == row['ingredient'],'cost'] = 0
+                        self.cc.invalidate(row['ingredient'], parents=True)
                 else:
-                    butlist.append(create_lookup_button())
-            elif self.df_type == 'guide':
-                butlist.append(create_duplicate_button())
-                butlist.append(create_delete_button())
-            elif self.df_type == 'mentions':
-                butlist.append(create_lookup_button())
-                
-            self.buttons[index] = butlist[0]
-            items.append(widgets.HBox(butlist))
+                    set_df_val('costdf', row, 'saved cost', newval)
+                #set_df_val(cc.costdf, row, 'cost', newval)
 
-            
-        # Create a Text widget for each cell in the row
-        for col in self.df.columns:
-            is_disabled = (col not in self.enabled_columns) or (self.df_type == 'mentions' and col == 'ingredient')
-            # hide cell visibility
-            hide = False
-            # Simplifying value assignment and handling for 'myval'
-            if str(row[col]) not in [str(np.nan), '']:
-                 myval = row[col]
-            else:
-                myval = ''
-                hide = True
-            #myval = row[col] if str(row[col]) not in [str(np.nan), ''] else '-'
-            myval = f"{myval:0.2f}" if isinstance(myval, float) else myval
-
-            # Widget assignment based on 'item' and 'df_type'
-            if col == 'item':
-                if myval == 'recipe':
-                    cell_widget = widgets.Label(value='recipe for:', layout=self.getlayout(col), style={'font_style': 'italic'})
-                elif self.df_type == 'mentions':
-                    cell_widget = widgets.Label(value=str(myval), layout=self.getlayout())
+                # zero out all affected cost
+                # parent recipe, 
+                self.queue_refresh(recipename, clear=[recipename], recost=[recipename])
+                print('saved cost')
+
+        elif column == 'menu price':
+            # check if valid cost
+            try:
+                newval = float(newval)
+                # check valid value
+
+            except:
+                print('invalid menu price')
+                return
+
+            if self.df_type == 'recipe':
+                recipename = self.df.iloc[0]['ingredient']
+                # update menu price
+                row = self.df.iloc[index]
+                #self.cc.costdf.loc[self.costdf['']
+                set_df_for_iq('costdf', row, 'menu price', newval)
+                self.queue_refresh(recipename)
+
+        elif column == 'date':
+            if self.df_type == 'guide':
+                row = self.df.iloc[index]
+                # match nickname, description, size, date
+                mydate = pd.to_datetime(newval, errors='coerce')
+                if (mydate is pd.NaT):
+                    # don't update if date if the input is invalid
+                    self.queue_refresh(row['nickname'])
                 else:
-                    cell_widget = widgets.Label()
-            else:
-                if is_disabled or (col == 'ingredient' and self.df_type == 'recipe' and row['item'] == 'recipe'):
-                    cell_widget = widgets.Label(value=str(myval), layout=self.getlayout(col))
+                    mydate = mydate.strftime('%Y-%m-%d')
+
+                    _update_df('uni_g', row, defmatch, 'date', mydate)
+
+                    self.queue_refresh(row['nickname'], clear_ingredients=[row['nickname']])
+
+        elif column == 'size':
+            if self.df_type == 'guide':
+                row = self.df.iloc[index]
+                newval = newval.strip()
+                newsize = parse_size(newval)
+                if (newval in ['', '-', '0']) or (newsize.m <= 0):
+                    # ignore blank size, 0 size
+                    self.queue_refresh(row['nickname'])
                 else:
-                    if (col == 'ingredient') and (self.df_type == 'recipe'):
-                        cell_widget = None
-                        if (myval == ''): # use combobox for blank item
-                            cell_widget = widgets.Combobox(
-                                value = str(myval),
-                                options=tuple(self.all_ingredients),
-                                ensure_option=False,
-                                disabled=is_disabled,
-                                continuous_update=False,
-                                layout = self.getlayout(col)
-                            )
-                        else:
-                            cell_widget = widgets.Text(
-                                value = str(myval),
-                                #options=tuple(self.all_ingredients),
-                                ensure_option=False,
-                                disabled=is_disabled,
-                                continuous_update=False,
-                                layout = self.getlayout(col)
-                            )
-                        cell_widget.observe(lambda change, col=col, cell_widget=cell_widget: on_text_change(change, col, cell_widget), 'value')
+                    # match nickname, description, size, date
+                    _update_df('uni_g', row, defmatch, 'size', newval)
+                    self.queue_refresh(row['nickname'], clear_ingredients=[row['nickname']])
+                    # update mention display?
+
+        elif column == 'price':
+            if self.df_type == 'guide':
+                row = self.df.iloc[index]
+                try:
+                    newval = float(newval)
+                except:
+                    print('bad new price')
+                    return
+
+                # match nickname, description, size, date, and update
+                _update_df('uni_g', row, defmatch, 'price', newval)
+
+                # clear cost of each recipe containing ingredient
+                self.queue_refresh(row['nickname'], clear_ingredients=[row['nickname']])
+                # update mention display?
+
+        elif column == 'supplier':
+            if self.df_type == 'guide':
+                row = self.df.iloc[index]
+                # match nickname, description, size, date, and update
+                _update_df('uni_g', row, defmatch, 'supplier', newval)          
+                # clear cost of each recipe containing ingredient
+                self.queue_refresh(row['nickname'], clear_ingredients=[row['nickname']])
+                # update mention display?
+
+        elif column == 'order':
+            if self.df_type == 'guide':
+                row = self.df.iloc[index]
+                try:
+                    newval = str(newval)
+                except:
+                    print('bad order value')
+                    return
+
+                # match nickname, description, size, date, and update
+                _update_df('uni_g', row, defmatch, 'order', newval)          
+
+                # clear cost of each recipe containing ingredient
+                self.queue_refresh(row['nickname'], clear_ingredients=[row['nickname']])
+
+        elif column == 'description':
+            if self.df_type == 'guide':
+                row = self.df.iloc[index]
+                # match nickname, description, size, date, and update
+                _update_df('uni_g', row, defmatch, 'description', newval)          
+                self.queue_refresh(row['nickname'])
+                # update mention display?
+
+        elif column == 'allergen':
+            if self.df_type == 'guide':
+                row = self.df.iloc[index]
+                # match nickname, description, supplier
+                _update_df('uni_g', row, ['nickname', 'description', 'supplier'], 'allergen', newval)          
+                self.queue_refresh(row['nickname'])
+                # update mention display?
+
+        elif column == 'conversion':
+            if (self.df_type == 'guide') or (self.df_type == 'recipe'):
+                row = self.df.iloc[index]
+                newval = newval.strip()
+                # check valid conversion
+                convrs = parse_conversion(newval)
+                if len(convrs) > 0:
+                    # set convrs
+                    if self.df_type == 'recipe':
+                        _update_df('costdf', row, ['ingredient', 'item', 'quantity'], 'conversion', newval)
+                        self.queue_refresh(row['ingredient'], clear_ingredients=[row['ingredient']])
                     else:
-                        cell_widget = widgets.Text(
-                            value=str(myval), 
-                            layout=self.getlayout(col), 
-                            disabled=is_disabled, 
-                            continuous_update=False
-                        )
-                        cell_widget.observe(lambda change, col=col, cell_widget=cell_widget: on_text_change(change, col, cell_widget), 'value')
-
-
-            if (hide and is_disabled):
-                cell_widget.layout.visibility = 'hidden'
-            items.append(cell_widget)
-            
+                        _update_df('uni_g', row, ['nickname', 'description', 'size', 'supplier'], 'conversion', newval)
+                        self.queue_refresh(row['nickname'], clear_ingredients=[row['nickname']])
+
     def on_back_click(self, button):
         """Handle back button click"""
+        self.flush_edits(refresh=False)
         if len(self.search_history) > 1:
             self.search_history.pop()  # Remove current
             previous = self.search_history[-1]  # Get previous without popping it
@@ -600,16 +893,10 @@ class DataFrameWidget:
             # add only recognized guide columns
             newrow = newrow[self.cc.guide_columns]
             newdf = pd.DataFrame([newrow])
-            self.cc.uni_g = pd.concat([self.cc.uni_g, newdf], ignore_index=True)
+            self.cc.journal.append('uni_g', newdf)
 
             # clear cost of each recipe containing ingredient
-            mdf = self.cc.find_ingredient(row['nickname'])
-            for i,m in mdf.iterrows():
-                self.cc.set_item_ingredient(m['item'], row['nickname'], 'cost', 0)
-                self.cc.clear_cost(m['item'])
-
-            self.setdf(row['nickname'])
-            self.update_display()
+            self.queue_refresh(row['nickname'], clear_ingredients=[row['nickname']])
         else:
             print("Can't duplicate! Dates must be different")
     
@@ -634,7 +921,8 @@ class DataFrameWidget:
             original_index = self.cc.uni_g[mask].index[0]
             
             # Delete only this specific row
-            self.cc.uni_g = self.cc.uni_g.drop(original_index).reset_index(drop=True)
+            self.cc.journal.drop('uni_g', self.cc.uni_g.index == original_index, reset_index=True)
+            self.cc.invalidate(row['nickname'], parents=True)
             
             # Update the search options
             if hasattr(self, 'all_ingredients'):
@@ -642,8 +930,7 @@ class DataFrameWidget:
                 ingrs = set(self.cc.costdf['ingredient'].dropna().unique())
                 self.all_ingredients = nicks.union(ingrs)
                         
-            self.setdf(row['nickname'])
-            self.update_display()
+            self.queue_refresh(row['nickname'])
 
             
     def on_search_click(self, button):
@@ -674,6 +961,7 @@ class DataFrameWidget:
         button.disabled = True
 
     def search_name(self, search):
+        self.flush_edits(refresh=False)
         self.df = self.cc.find_ingredient(search).reset_index(drop=True)
         # calculate cost for each mention
         for i, row in self.df.iterrows():
@@ -693,13 +981,18 @@ class DataFrameWidget:
         self.update_column_width()
         
                 
-    def lookup_name(self, lookup):
+    def lookup_name(self, lookup, frame=None):
+        self.flush_edits(refresh=False)
         # Update the DataFrame and the grid
-        self.setdf(lookup)
-        self.findtype()
-        if self.df_type == 'recipe':
-            self.cc.recipe_cost(self.df.iloc[0]['ingredient'])
+        if frame is not None:
+            # frame was built from an already costed calculator
+            self.setdf(lookup, frame)
+        else:
             self.setdf(lookup)
+            self.findtype()
+            if self.df_type == 'recipe':
+                self.cc.recipe_cost(self.df.iloc[0]['ingredient'])
+                self.setdf(lookup)
         
         # Update search history
         if not self.search_history or lookup != self.search_history[-1]:
@@ -708,6 +1001,14 @@ class DataFrameWidget:
         # Update back button state
         self.backbutton.disabled = len(self.search_history) <= 1
 
+    def show_message(self, message):
+        ''' replace the grid in the output with a message
+        '''
+        self.shown_df = None
+        with self.output:
+            self.output.clear_output(wait=True)
+            print(message)
+
     def get_widget(self):
         return(self.grid)
     
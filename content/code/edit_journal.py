@@ -0,0 +1,300 @@
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import count
+import numpy as np
+import pandas as pd
+from compact_tables import concat_frames, settable
+
+# one change to a table of a CostCalculator ('costdf' or 'uni_g')
+# row is the position of the row in the table when the change was made
+# column is None for a whole row: inserted (old is None, new the row)
+# or deleted (old the row, new is None), row is None for a column added
+Delta = namedtuple('Delta', ['table', 'row', 'column', 'old', 'new'])
+
+# the deltas of one undoable edit, with the table lengths before and after it
+Step = namedtuple('Step', ['deltas', 'before', 'after'])
+
+
+def row_runs(deltas):
+    ''' the deltas in lists, in order: consecutive rows inserted or deleted
+        in one table together (applied at once), any other delta alone
+    '''
+    runs = []
+    for delta in deltas:
+        last = runs[-1][-1] if runs else None
+        if (last is not None and delta.row is not None and delta.column is None
+                and last.row is not None and last.column is None and last.table == delta.table):
+            runs[-1].append(delta)
+        else:
+            runs.append([delta])
+    return runs
+
+
+class EditJournal:
+    """
+    Undo/redo of the edits made to the recipes (costdf) and guide (uni_g)
+
+    Edits go through set, append and drop, which change the table and record
+    one Delta per cell or row.  Everything recorded inside batch() (or by a
+    single call outside of it) is one step, undone or redone as a whole by
+    applying its deltas in reverse or again.  Rows are addressed by position,
+    valid because steps are always undone last first; a step whose tables
+    no longer have the lengths it left them with (edited without the
+    journal) can't be undone and the journal is cleared.  When the rows are
+    put in another order (written sorted), reorder() moves the steps along.
+    Calculated costs are not recorded, undo and redo invalidate the frames
+    the step touched and return what to clear (see affected).
+    """
+
+    def __init__(self, cc, limit=200):
+        self.cc = cc
+        self.limit = limit  # steps kept for undo
+        self.undo_stack = []
+        self.redo_stack = []
+        self.step = None     # deltas of the open batch
+        self.before = None   # table lengths when it was opened
+        self.depth = 0
+        self.on_change = None  # called with the journal after each change
+        self.log = None        # EditLog each step is written to
+        self.edit_count = 0    # steps made, undone, redone or replayed so far
+        # held while a step is made or applied, e.g. to save in between
+        self.lock = threading.RLock()
+
+    def sizes(self):
+        return (len(self.cc.costdf), len(self.cc.uni_g))
+
+    def can_undo(self):
+        return len(self.undo_stack) > 0
+
+    def can_redo(self):
+        return len(self.redo_stack) > 0
+
+    def clear(self):
+        ''' forget every step, e.g. after loading other data
+        '''
+        self.undo_stack = []
+        self.redo_stack = []
+        self.changed()
+
+    def changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    @contextmanager
+    def batch(self):
+        ''' record every edit made inside the block as one step
+        '''
+        with self.lock:
+            if self.depth == 0:
+                self.step = []
+                self.before = self.sizes()
+            self.depth += 1
+            try:
+                yield self
+            finally:
+                self.depth -= 1
+                if self.depth == 0:
+                    deltas, self.step = self.step, None
+                    if deltas:
+                        step = Step(deltas, self.before, self.sizes())
+                        self.undo_stack.append(step)
+                        del self.undo_stack[:-self.limit]
+                        self.redo_stack = []
+                        self.edit_count += 1
+                        if self.log is not None:
+                            self.log.write(step)
+                        self.changed()
+
+    def set(self, table, mask, column, value):
+        ''' table.loc[mask, column] = value, recording the old values
+        '''
+        with self.batch():
+            df = getattr(self.cc, table)
+            rows = np.flatnonzero(np.asarray(mask, dtype=bool))
+            if column in df.columns:
+                old = list(df[column].iloc[rows])
+            else:
+                old = [np.nan] * len(rows)
+                self.step.append(Delta(table, None, column, None, None))
+            value = settable(df, column, value)
+            df.loc[mask, column] = value
+            for row, oldval in zip(rows, old):
+                self.step.append(Delta(table, int(row), column, oldval, value))
+
+    def append(self, table, newdf):
+        ''' add the rows of 'newdf' to the end of table (reindexed)
+        '''
+        with self.batch():
+            df = getattr(self.cc, table)
+            start = len(df)
+            for column in newdf.columns.difference(df.columns, sort=False):
+                self.step.append(Delta(table, None, column, None, None))
+            df = concat_frames([df, newdf], ignore_index=True)
+            setattr(self.cc, table, df)
+            for row in range(start, len(df)):
+                self.step.append(Delta(table, row, None, None, df.iloc[row].copy()))
+
+    def drop(self, table, mask, reset_index=False):
+        ''' remove the rows of table selected by 'mask'
+        '''
+        with self.batch():
+            df = getattr(self.cc, table)
+            rows = np.flatnonzero(np.asarray(mask, dtype=bool))
+            # last first, so each position is still valid when it is applied
+            for row in rows[::-1]:
+                self.step.append(Delta(table, int(row), None, df.iloc[row].copy(), None))
+            df = df[~np.asarray(mask, dtype=bool)]
+            if reset_index:
+                df = df.reset_index(drop=True)
+            setattr(self.cc, table, df)
+
+    def undo(self):
+        ''' revert the last step
+            returns its affected names, None if there is nothing to undo
+        '''
+        return self._move(self.undo_stack, self.redo_stack, undo=True)
+
+    def redo(self):
+        ''' apply the last undone step again
+            returns its affected names, None if there is nothing to redo
+        '''
+        return self._move(self.redo_stack, self.undo_stack, undo=False)
+
+    def _move(self, source, target, undo):
+        with self.lock:
+            if not source:
+                return None
+            step = source[-1]
+            if self.sizes() != (step.after if undo else step.before):
+                print('the data was changed outside of the edit journal, undo history cleared')
+                self.clear()
+                return None
+            source.pop()
+            affected = self.apply_step(step, undo)
+            target.append(step)
+            if self.log is not None:
+                self.log.write(step, undo)
+        self.changed()
+        return affected
+
+    def apply_step(self, step, undo=False):
+        ''' apply the deltas of 'step' (revert them if undo), without recording
+            returns the names it affects, see affected
+        '''
+        deltas = list(reversed(step.deltas)) if undo else step.deltas
+        with self.lock:
+            applied = []
+            try:
+                for run in row_runs(deltas):
+                    delta = run[0]
+                    if delta.row is None and not undo and delta.column in getattr(self.cc, delta.table).columns:
+                        continue  # the column is there already
+                    self._apply(run, undo)
+                    applied.append(run)
+            except Exception:
+                # a step is applied whole or not at all (e.g. a logged one
+                # that doesn't fit the tables), take back what was done
+                for run in reversed(applied):
+                    self._apply(run[::-1], not undo)
+                raise
+            self.edit_count += 1
+        recipes, nicknames = self.affected(step)
+        self.cc.invalidate(*recipes, *nicknames, parents=True)
+        return recipes, nicknames
+
+    def _apply(self, run, undo):
+        delta = run[0]
+        df = getattr(self.cc, delta.table)
+        old, new = (delta.new, delta.old) if undo else (delta.old, delta.new)
+        if delta.row is None:
+            if undo:
+                setattr(self.cc, delta.table, df.drop(columns=delta.column))
+            elif delta.column not in df.columns:
+                df[delta.column] = np.nan
+        elif delta.column is not None:
+            df.iat[delta.row, df.columns.get_loc(delta.column)] = settable(df, delta.column, new)
+            if delta.table == 'costdf' and 'cost' in df.columns:
+                # the row's cost is calculated from what changed
+                df.iat[delta.row, df.columns.get_loc('cost')] = 0
+        else:
+            self._move_rows(delta.table, run, undo)
+
+    def _move_rows(self, table, run, undo):
+        # the rows are removed and put back on a list of positions (labels
+        # may repeat) and the table is built once from it, one take (and
+        # one concat of the rows put back) for the whole run
+        df = getattr(self.cc, table)
+        rows = list(range(len(df)))
+        inserted = []
+        for delta in run:
+            new = delta.old if undo else delta.new
+            if not 0 <= delta.row <= len(rows) - (new is None):
+                raise IndexError(f'row {delta.row} is out of {table}, of {len(rows)} rows')
+            if new is None:
+                del rows[delta.row]
+            else:
+                rows.insert(delta.row, len(df) + len(inserted))
+                inserted.append(new)
+        if inserted:
+            df = concat_frames([df, pd.DataFrame(inserted)])
+        setattr(self.cc, table, df.iloc[rows])
+
+    def reorder(self, table, order):
+        ''' the rows of table were put in 'order' (their old positions, in
+            the new order), the steps are rewritten to address them there
+        '''
+        with self.lock:
+            for stack, undo in ((self.undo_stack, True), (self.redo_stack, False)):
+                # rows (in the old order) and ordered (in the new one) list the
+                # same row ids, from the rows now back through the undone steps
+                # or forward through the redone ones
+                rows, ordered = list(range(len(order))), list(order)
+                added = count(len(order))
+                for i in reversed(range(len(stack))):
+                    stack[i] = self._reorder_step(stack[i], table, rows, ordered, added, undo)
+
+    def _reorder_step(self, step, table, rows, ordered, added, undo):
+        deltas = list(step.deltas)
+        for i in (reversed(range(len(deltas))) if undo else range(len(deltas))):
+            delta = deltas[i]
+            if delta.table != table or delta.row is None:
+                continue
+            if delta.column is not None:
+                row = ordered.index(rows[delta.row])
+            elif (delta.old is None) != undo:
+                # a row comes in, after the row before it in the old order
+                rowid = next(added)
+                rows.insert(delta.row, rowid)
+                row = ordered.index(rows[delta.row - 1]) + 1 if delta.row else 0
+                ordered.insert(row, rowid)
+            else:
+                row = ordered.index(rows.pop(delta.row))
+                ordered.pop(row)
+            deltas[i] = delta._replace(row=row)
+        return step._replace(deltas=deltas)
+
+    def affected(self, step):
+        ''' (recipes, nicknames) changed by 'step': recipes whose cost must be
+            cleared and guide nicknames whose recipes must be cleared
+        '''
+        recipes, nicknames = set(), set()
+        for delta in step.deltas:
+            if delta.row is None:
+                continue
+            if delta.column is None:
+                rows = [delta.old if delta.new is None else delta.new]
+            else:
+                row = getattr(self.cc, delta.table).iloc[delta.row]
+                # a renamed row concerns its old name too
+                rows = [row, row.copy()]
+                rows[1][delta.column] = delta.old
+            for row in rows:
+                if delta.table == 'uni_g':
+                    nicknames.add(row['nickname'])
+                elif row['item'] == 'recipe':
+                    recipes.add(row['ingredient'])
+                else:
+                    recipes.add(row['item'])
+        return ({r for r in recipes if isinstance(r, str)},
+                {n for n in nicknames if isinstance(n, str)})
@@ -0,0 +1,165 @@
+import json
+import os
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from edit_journal import Delta, Step
+
+
+class EditLog:
+    """
+    Write-ahead log of the edits made to a workbook since it was written
+
+    Each EditJournal step (and each undo/redo of one) is appended as one
+    line of JSON to <workbook>.edits.ndjson as soon as it is made, so an
+    edit costs one short append and nothing is lost if the kernel dies.
+    Loading the workbook replays the log on top of it; writing the workbook
+    again (compact) makes the log empty.
+    The first line records the size and time of the workbook the log
+    applies to; a log that doesn't match its workbook is put aside as
+    <log>.bad (.bad.1 and so on if there is one) instead of being applied,
+    one that can't be replayed to the end is put aside too and cut to the
+    steps that could (see replay).
+    """
+
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self.path = os.path.splitext(workbook)[0] + '.edits.ndjson'
+        self.stamp = self.workbook_stamp()
+
+    def workbook_stamp(self):
+        stat = os.stat(self.workbook)
+        return {'workbook': os.path.basename(self.workbook), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    def __len__(self):
+        ''' number of steps logged
+        '''
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path) as f:
+            return max(sum(1 for line in f if line.strip()) - 1, 0)
+
+    def write(self, step, undo=False):
+        ''' append 'step' (undone if undo) to the log
+        '''
+        lines = []
+        if not os.path.exists(self.path):
+            lines.append(json.dumps(self.stamp))
+        lines.append(json.dumps({
+            'undo': undo,
+            'before': step.before,
+            'after': step.after,
+            'deltas': [[d.table, d.row, d.column, _encode(d.old), _encode(d.new)] for d in step.deltas],
+        }))
+        with open(self.path, 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def lines(self):
+        with open(self.path) as f:
+            return [line if line.endswith('\n') else line + '\n' for line in f if line.strip()]
+
+    def entries(self):
+        ''' the logged (step, undo) pairs, oldest first
+        '''
+        for line in self.lines()[1:]:
+            yield _read_step(line)
+
+    def replay(self, journal, put_aside=True):
+        ''' apply the logged edits to the tables of journal's calculator
+            returns the number of steps applied, replay stops at a step that
+            can't be applied, which is left out whole (see apply_step)
+            a last line cut short (by a crash while it was written) is
+            dropped; if a step can't be applied the log is kept as it was
+            under a new <log>.bad name and rewritten with the steps applied,
+            so the edits made next are logged after them
+            put_aside=False leaves the log where and as it is, for readers of
+            a workbook that is edited elsewhere
+        '''
+        if not os.path.exists(self.path):
+            return 0
+        lines = self.lines()
+        applied = 0
+        try:
+            if not lines or json.loads(lines[0]) != self.stamp:
+                raise ValueError(f'{self.path} was not written for this {self.workbook}')
+            for i, line in enumerate(lines[1:], start=1):
+                try:
+                    step, undo = _read_step(line)
+                except ValueError:
+                    if i < len(lines) - 1:
+                        raise
+                    print(f'!!! dropped the unfinished last edit of {self.path}')
+                    if put_aside:
+                        self.rewrite(lines[:i])
+                    break
+                if journal.sizes() != (step.after if undo else step.before):
+                    raise ValueError(f'{self.path} does not match the tables')
+                journal.apply_step(step, undo)
+                applied += 1
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            # keep what can't be applied for a closer look
+            print(f'!!! edit log not replayed past step {applied}: {e}')
+            if put_aside:
+                bad = unused_name(self.path + '.bad')
+                os.replace(self.path, bad)
+                print(f'!!! the edit log was kept as {bad}')
+                if applied:
+                    self.rewrite(lines[:applied + 1])
+        if applied:
+            print(f'recovered {applied} edits from {self.path}')
+        return applied
+
+    def rewrite(self, lines):
+        ''' replace the log by 'lines' (the stamp and logged steps)
+        '''
+        temp = self.path + '.new'
+        with open(temp, 'w') as f:
+            f.write(''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+
+    def compact(self):
+        ''' the workbook was written with every logged edit, empty the log
+        '''
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.stamp = self.workbook_stamp()
+
+
+def _read_step(line):
+    entry = json.loads(line)
+    deltas = [Delta(t, r, c, _decode(o), _decode(n)) for t, r, c, o, n in entry['deltas']]
+    return Step(deltas, tuple(entry['before']), tuple(entry['after'])), entry['undo']
+
+
+def unused_name(path):
+    ''' path, or path.1, path.2 ... the first that doesn't exist
+    '''
+    name, n = path, 0
+    while os.path.exists(name):
+        n += 1
+        name = f'{path}.{n}'
+    return name
+
+
+def _encode(value):
+    ''' json friendly value, rows become {'row': {column: value}}
+    '''
+    if isinstance(value, pd.Series):
+        return {'row': {str(k): _encode(v) for k, v in value.items()}}
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return str(value)
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        return pd.Series(value['row'])
+    return value
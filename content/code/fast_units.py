@@ -0,0 +1,286 @@
+import re
+
+# the units of nearly every menu quantity, by the spellings used for them
+# (dozens are written '*12 count' by parse_size); spellings the registry
+# doesn't define are left to pint
+UNITS = {
+    'ounce': ('oz', 'ounce', 'ounces'),
+    'pound': ('lb', 'lbs', 'pound', 'pounds'),
+    'gram': ('g', 'gram', 'grams'),
+    'kilogram': ('kg', 'kilogram', 'kilograms'),
+    'fluid_ounce': ('floz', 'fluid_ounce'),
+    'cup': ('cup', 'cups'),
+    'tablespoon': ('tbsp', 'tablespoon'),
+    'teaspoon': ('tsp', 'teaspoon'),
+    'pint': ('pt', 'pint'),
+    'quart': ('qt', 'quart'),
+    'gallon': ('gal', 'gallon'),
+    'liter': ('l', 'liter'),
+    'milliliter': ('ml', 'milliliter'),
+    'count': ('count',),
+    'dozen': ('dozen',),
+}
+
+# dimension exponents are packed as the digits of this base (-500 to 499)
+CODE_BASE = 1000
+
+# a number as pint reads it: integers without leading zeros are ints, the
+# rest floats (exponents and signs are left to pint)
+NUMBER = r'(?:0|[1-9][0-9]*)(?:\.[0-9]*)?|\.[0-9]+'
+# '4 oz', '6*10 oz', '1/2 cup', '2'
+QUANTITY_RE = re.compile(rf'\s*({NUMBER})\s*(?:([*/])\s*({NUMBER})\s*)?([a-z_]+)?\s*')
+
+
+class Unsupported(Exception):
+    """ a unit or value the table doesn't handle, pint is used instead """
+
+
+def number(text):
+    if '.' in text:
+        return float(text)
+    return int(text)
+
+
+class UnitTable:
+    """
+    Parsing and arithmetic of the common units without pint's machinery
+
+    Every spelling of UNITS is looked up in the registry once: its unit name,
+    the units container pint makes for it and its dimension code, the
+    exponents of its dimensions packed in one integer (digits of base
+    CODE_BASE), so the code of a product of units is the sum of their codes
+    times their exponents and 0 is dimensionless (count is 0).  The
+    quantities are pint's, what the table skips is pint's parser and the
+    generic code around its arithmetic: parse() reads '6*10 oz' with a
+    regular expression and computes the magnitude as pint's evaluator
+    does, and the operations below work on (magnitude, {unit: exponent})
+    pairs, adding exponents in the order UnitsContainer does and comparing
+    dimension codes.  Conversion factors are converted with pint (1 of the
+    source units to the destination) the first time a pair of units is
+    converted and kept, so every float is the one pint gives.  Only pint's
+    public API is used.  Anything else (another unit, a non numeric
+    magnitude, units pint would reduce) raises Unsupported or returns None,
+    and the caller does it with pint.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.Quantity = registry.Quantity
+        self.containers = {}  # spelling -> units container
+        self.codes = {}       # unit name -> dimension code
+        self.vectors = {}     # unit name -> dimension exponents
+        dimensions = {}
+        for name, spellings in UNITS.items():
+            for spelling in spellings:
+                try:
+                    unit = registry.get_name(spelling)
+                except Exception:
+                    continue
+                if unit not in dimensions:
+                    dimensions[unit] = registry.get_dimensionality(unit)
+                self.containers[spelling] = registry.UnitsContainer({unit: 1})
+        self.dimensions = sorted({d for dims in dimensions.values() for d in dims})
+        for unit, dims in dimensions.items():
+            vector = tuple(dims[d] if d in dims else 0 for d in self.dimensions)
+            self.vectors[unit] = vector
+            self.codes[unit] = sum(e * CODE_BASE ** i for i, e in enumerate(vector))
+        self.count = self.containers.get('count')
+        self.factors = {}  # (source units, destination units) -> factor
+
+    def parse(self, text):
+        ''' the quantity pint makes of 'text', None if it isn't a number or
+            two and one of the table's units
+        '''
+        match = QUANTITY_RE.fullmatch(text)
+        if match is None:
+            return None
+        first, op, second, spelling = match.groups()
+        magnitude = number(first)
+        if op == '*':
+            magnitude = magnitude * number(second)
+        elif op == '/':
+            magnitude = magnitude / number(second)
+        if spelling is None:
+            return self.Quantity(magnitude)
+        units = self.containers.get(spelling)
+        if units is None:
+            return None
+        # the unit is read as 1 unit times the number
+        return self.Quantity(1 * magnitude, units)
+
+    def split(self, q):
+        ''' (magnitude, units) of quantity q, units a dict of unit names
+            to exponents (None for a plain number)
+        '''
+        if isinstance(q, self.Quantity):
+            magnitude = q.magnitude
+            units = dict(q.unit_items())
+            for unit in units:
+                if unit not in self.codes:
+                    raise Unsupported(unit)
+        else:
+            magnitude, units = q, None
+        if not isinstance(magnitude, (int, float)) or isinstance(magnitude, bool):
+            raise Unsupported(magnitude)
+        return magnitude, units
+
+    def code(self, units):
+        ''' dimension code of units (a dict of unit names to exponents)
+        '''
+        codes = self.codes
+        return sum([codes[unit] * exponent for unit, exponent in units.items()])
+
+    def dimensionless(self, units):
+        return units is None or self.code(units) == 0
+
+    def quantity(self, value):
+        ''' the pint quantity of a (magnitude, units) pair
+        '''
+        magnitude, units = value
+        return self.Quantity(magnitude, self.registry.UnitsContainer(units or {}))
+
+    def factor(self, source, destination):
+        key = (tuple(source.items()), tuple(destination.items()))
+        factor = self.factors.get(key)
+        if factor is None:
+            from pint import DimensionalityError
+            container = self.registry.UnitsContainer
+            try:
+                factor = self.Quantity(1, container(source)).to(container(destination)).magnitude
+            except DimensionalityError:
+                raise Unsupported(source, destination)
+            self.factors[key] = factor
+        return factor
+
+    def mul(self, a, b):
+        ''' a*b of (magnitude, units) pairs, as Quantity.__mul__
+        '''
+        (m1, u1), (m2, u2) = a, b
+        if u1 is None:
+            (m1, u1), (m2, u2) = b, a
+        if u1 is None:
+            raise Unsupported('no units')
+        units = dict(u1)
+        for unit, exponent in (u2 or {}).items():
+            units[unit] = units.get(unit, 0) + exponent
+            if units[unit] == 0:
+                del units[unit]
+        return m1 * m2, units
+
+    def div(self, a, b):
+        ''' a/b of (magnitude, units) pairs, as Quantity.__truediv__
+        '''
+        (m1, u1), (m2, u2) = a, b
+        if u1 is None:
+            if u2 is None:
+                raise Unsupported('no units')
+            return m1 / m2, {unit: -exponent for unit, exponent in u2.items()}
+        if isinstance(m1, int) or (u2 is not None and isinstance(m2, int)):
+            # pint divides ints as floats
+            m1 = float(m1) if isinstance(m1, int) else m1
+            m2 = float(m2) if isinstance(m2, int) else m2
+        units = dict(u1)
+        for unit, exponent in (u2 or {}).items():
+            units[unit] = units.get(unit, 0) - exponent
+            if units[unit] == 0:
+                del units[unit]
+        return m1 / m2, units
+
+    def reduced(self, value):
+        ''' value in reduced units, as Quantity.to_reduced_units
+        '''
+        magnitude, units = value
+        if self.dimensionless(units):
+            if units:
+                magnitude = magnitude * self.factor(units, {})
+            return magnitude, {}
+        vectors = [self.vectors[unit] for unit in units]
+        for i, first in enumerate(vectors):
+            for second in vectors[i + 1:]:
+                if self.comparable(first, second):
+                    # units pint would combine into one
+                    raise Unsupported(units)
+        return magnitude, units
+
+    def comparable(self, first, second):
+        ''' whether the dimensions of one exponent vector are a power of the
+            other's, as registry._get_dimensionality_ratio
+        '''
+        if first == second:
+            return True
+        if not any(first) or not any(second):
+            return False
+        if [c != 0 for c in first] != [c != 0 for c in second]:
+            return False
+        ratios = {s / f for f, s in zip(first, second) if f != 0}
+        return len(ratios) == 1
+
+    # the operations on pint quantities, done by pint when the table can't
+
+    def to(self, q, other):
+        ''' q.to(other), in the units of quantity 'other' (to other units
+            by pint)
+        '''
+        try:
+            if not isinstance(other, self.Quantity):
+                raise Unsupported(other)
+            magnitude, source = self.split(q)
+            destination = dict(other.unit_items())
+            if source is None or self._code_of(destination) != self._code_of(source):
+                raise Unsupported(source, destination)
+            if source != destination:
+                magnitude = magnitude * self.factor(source, destination)
+            return self.Quantity(magnitude, other.units)
+        except Unsupported:
+            return q.to(other)
+
+    def divide(self, a, b):
+        ''' a/b of two quantities
+        '''
+        try:
+            return self.quantity(self.div(self.split(a), self.split(b)))
+        except Unsupported:
+            return a / b
+
+    def inverse(self, q):
+        ''' 1/q, as Quantity.__rtruediv__
+        '''
+        if not isinstance(q, self.Quantity):
+            return 1 / q
+        return self.Quantity(1 / q.magnitude, q.units ** -1)
+
+    def counts(self, magnitude):
+        ''' magnitude*ureg.count
+        '''
+        return self.Quantity(1 * magnitude, self.count)
+
+    def is_dimensionless(self, q):
+        try:
+            return self._code_of(q) == 0
+        except Unsupported:
+            return q.dimensionless
+
+    def same_dimensionality(self, a, b):
+        ''' a.dimensionality == b.dimensionality, for quantities or unit names
+        '''
+        try:
+            return self._code_of(a) == self._code_of(b)
+        except Unsupported:
+            pass
+        dims = [self.registry.get_dimensionality(x) if isinstance(x, str) else x.dimensionality
+                for x in (a, b)]
+        return dims[0] == dims[1]
+
+    def _code_of(self, x):
+        if isinstance(x, str):
+            if x not in self.codes:
+                raise Unsupported(x)
+            return self.codes[x]
+        if isinstance(x, dict):
+            units = x
+        else:
+            units = self.split(x)[1] or {}
+        for unit in units:
+            if unit not in self.codes:
+                raise Unsupported(unit)
+        return self.code(units)
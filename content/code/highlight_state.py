@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class HighlightState:
+    """
+    What the menu viewer highlights, shared by MenuViewer and MenuDisplayWidget
+
+    The viewer edits the selection (selected_allergens, highlighted_ingredients)
+    and calls update_rows with the shown frame; the flags are then read by
+    the display widget while rendering, without looking at the frame again.
+    Row flags are boolean arrays by row position of the shown frame.
+    """
+
+    def __init__(self):
+        self.selected_allergens = []       # checked allergens, lower case
+        self.highlighted_ingredients = []  # in the order they were added
+        self.ingredient_rows = np.zeros(0, dtype=bool)  # rows using a highlighted ingredient
+        self.allergen_rows = np.zeros(0, dtype=bool)    # rows containing a selected allergen
+        self.allergen_ingredients = set()  # ingredients containing a selected allergen
+
+    def reset_rows(self, size=0):
+        ''' clear the flags, for a new frame of 'size' rows
+        '''
+        self.ingredient_rows = np.zeros(size, dtype=bool)
+        self.allergen_rows = np.zeros(size, dtype=bool)
+        self.allergen_ingredients = set()
+
+    def row_highlighted(self, position):
+        ''' True if the row at 'position' is highlighted by ingredient or allergen
+        '''
+        return bool((position < len(self.ingredient_rows) and self.ingredient_rows[position]) or
+                    (position < len(self.allergen_rows) and self.allergen_rows[position]))
+
+    def ingredient_highlighted(self, ingredient):
+        ''' True if 'ingredient' is highlighted itself or contains a selected allergen
+        '''
+        return ingredient in self.highlighted_ingredients or ingredient in self.allergen_ingredients
+
+    def uses_highlighted(self, ingredients):
+        ''' True if any of 'ingredients' is a highlighted ingredient
+        '''
+        return not set(self.highlighted_ingredients).isdisjoint(ingredients)
+
+    def update_ingredient_rows(self, df, catalog):
+        ''' flag the rows of recipe frame 'df' that use a highlighted ingredient,
+            directly or in their flattened recipe
+        '''
+        self.ingredient_rows = np.zeros(len(df), dtype=bool)
+        if not self.highlighted_ingredients:
+            return
+        highlighted = set(self.highlighted_ingredients)
+        # row 0 is the recipe itself
+        for position, ingredient in enumerate(df['ingredient'].iloc[1:], start=1):
+            entry = catalog.get(ingredient)
+            self.ingredient_rows[position] = ingredient in highlighted or \
+                (not entry.is_ingredient and len(entry.children) > 0 and not highlighted.isdisjoint(entry.flat))
+
+    def update_allergen_rows(self, df, catalog):
+        ''' flag the rows of recipe frame 'df', and the ingredients, that
+            contain a selected allergen
+        '''
+        self.allergen_rows = np.zeros(len(df), dtype=bool)
+        self.allergen_ingredients = set()
+        if not self.selected_allergens:
+            return
+        selected = {a.lower() for a in self.selected_allergens}
+        allergens = list(df['allergen']) if 'allergen' in df.columns else [None] * len(df)
+        # row 0 is the recipe itself
+        rows = zip(df['ingredient'].iloc[1:], allergens[1:])
+        for position, (ingredient, allergen) in enumerate(rows, start=1):
+            # allergens listed for the row
+            if isinstance(allergen, str) and not selected.isdisjoint(a.strip().lower() for a in allergen.split(',')):
+                self.allergen_rows[position] = True
+                self.allergen_ingredients.add(ingredient)
+
+            # ingredients of a sub-recipe with a selected allergen
+            entry = catalog.get(ingredient)
+            if not entry.is_ingredient and len(entry.children) > 0:
+                found = {ing for ing in entry.flat if self.has_selected_allergen(catalog.get(ing).allergens)}
+                if found:
+                    self.allergen_rows[position] = True
+                    self.allergen_ingredients.update(found)
+
+    def has_selected_allergen(self, allergen_text):
+        ''' True if comma separated 'allergen_text' lists a selected allergen
+        '''
+        allergens = {a.strip().lower() for a in allergen_text.split(',')}
+        return any(a.lower() in allergens for a in self.selected_allergens)
@@ -0,0 +1,164 @@
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+import utils
+from costcalulator import CostCalculator
+
+# CostCalculator methods and utils functions that are timed
+METHODS = ('item_cost', 'get_cost_df', 'flatten_recipe', 'do_conversion', 'findframe')
+FUNCTIONS = ('parse_size', 'parse_quant')
+
+
+def findframe_hit(cc, ingredient, *args, **kwargs):
+    return cc.frame_key(ingredient) in cc.frame_cache
+
+# name -> hit(*args) telling whether a call is answered from a cache
+CACHE_TESTS = {'findframe': findframe_hit}
+
+
+class CallStats:
+    __slots__ = ('calls', 'total', 'own', 'max_depth', 'hits', 'misses')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0    # seconds in the outermost calls, children included
+        self.own = 0.0      # seconds in the function itself, timed children excluded
+        self.max_depth = 0  # deepest recursion seen (1 for none)
+        self.hits = 0
+        self.misses = 0
+
+
+class HotPathProfiler:
+    """
+    Call counts and timings of the costing hot paths
+
+    enable() replaces the METHODS of CostCalculator and the FUNCTIONS of
+    utils (in every loaded module that imported them) with timing wrappers,
+    disable() puts the originals back, so nothing is paid while it is off.
+    For each function it records the calls, the cumulative time (outermost
+    calls only, so recursion isn't counted twice), the self time (time not
+    spent in other timed functions), the deepest recursion and, where it
+    has a cache, the hits and misses.  to_frame() returns the figures,
+    reset() starts over, e.g. for each interaction (see measure).
+    Modules imported after enable() call the originals.
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()  # each thread's running calls and depths
+        self.patched = []  # (owner, attribute, original)
+
+    def enable(self):
+        if self.enabled:
+            return
+        for name in METHODS:
+            original = CostCalculator.__dict__[name]
+            self._patch(CostCalculator, name, original)
+        for name in FUNCTIONS:
+            original = getattr(utils, name)
+            for module in list(sys.modules.values()):
+                if getattr(module, name, None) is original:
+                    self._patch(module, name, original)
+        self.enabled = True
+
+    def _patch(self, owner, name, original):
+        setattr(owner, name, self._wrap(name, original))
+        self.patched.append((owner, name, original))
+
+    def disable(self):
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched = []
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+
+    @contextmanager
+    def measure(self):
+        ''' time the block from scratch:
+            with profiler.measure(): ... then profiler.to_frame()
+        '''
+        was_enabled = self.enabled
+        self.reset()
+        self.enable()
+        try:
+            yield self
+        finally:
+            if not was_enabled:
+                self.disable()
+
+    def _wrap(self, name, func):
+        hit_test = CACHE_TESTS.get(name)
+        clock = time.perf_counter
+        profiler = self
+
+        def timed(*args, **kwargs):
+            local = profiler.local
+            if not hasattr(local, 'stack'):
+                local.stack = []
+                local.depths = {}
+            depth = local.depths[name] = local.depths.get(name, 0) + 1
+            hit = None
+            if hit_test is not None:
+                hit = hit_test(*args, **kwargs)
+            # [time in timed children]
+            children = [0.0]
+            local.stack.append(children)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                local.stack.pop()
+                if local.stack:
+                    local.stack[-1][0] += elapsed
+                local.depths[name] = depth - 1
+                with profiler.lock:
+                    stats = profiler.stats.get(name)
+                    if stats is None:
+                        stats = profiler.stats[name] = CallStats()
+                    stats.calls += 1
+                    stats.own += elapsed - children[0]
+                    if depth == 1:
+                        stats.total += elapsed
+                    stats.max_depth = max(stats.max_depth, depth)
+                    if hit is not None:
+                        if hit:
+                            stats.hits += 1
+                        else:
+                            stats.misses += 1
+
+        timed.__wrapped__ = func
+        timed.__name__ = func.__name__
+        timed.__doc__ = func.__doc__
+        return timed
+
+    def to_frame(self):
+        ''' one row per function, most self time first
+        '''
+        with self.lock:
+            rows = [{
+                'function': name,
+                'calls': s.calls,
+                'cumulative s': s.total,
+                'self s': s.own,
+                'self ms/call': 1000 * s.own / s.calls if s.calls else 0.0,
+                'max depth': s.max_depth,
+                'hits': s.hits,
+                'misses': s.misses,
+                'hit ratio': s.hits / (s.hits + s.misses) if s.hits + s.misses else float('nan'),
+            } for name, s in self.stats.items()]
+        columns = ['function', 'calls', 'cumulative s', 'self s', 'self ms/call',
+                   'max depth', 'hits', 'misses', 'hit ratio']
+        frame = pd.DataFrame(rows, columns=columns)
+        return frame.sort_values(by='self s', ascending=False, kind='stable').reset_index(drop=True)
+
+
+# the profiler of this session
+profiler = HotPathProfiler()
@@ -0,0 +1,90 @@
+import itertools
+from html import escape
+import ipywidgets as widgets
+
+try:
+    from ipyevents import Event
+except ImportError:
+    Event = None
+
+TABLE_CSS = """<style>
+.mv-table { border-collapse: collapse; width: 100%; }
+.mv-table th { text-align: left; font-weight: normal; padding: 4px; }
+.mv-table td { vertical-align: top; padding: 4px; border: 2px dotted gray; }
+.mv-table td.mv-plain { border: none; }
+.mv-link { cursor: pointer; font-weight: bold; font-variant: small-caps; color: #1a5fb4; }
+.mv-link:hover { text-decoration: underline; }
+.mv-highlight { background-color: #beb153; }
+.mv-italic { font-style: italic; }
+</style>"""
+
+
+class HtmlTable:
+    """
+    A whole table shown as one widgets.HTML, for read-only views
+
+    The table is pushed to the frontend as a single HTML string instead of
+    one widget per cell.  link() adds a clickable element with a unique id;
+    clicks on the table are delegated through one ipyevents listener, which
+    reports the id of the clicked element.  Without ipyevents (e.g. not
+    installed in pyodide) the links are offered in a 'Go to' dropdown.
+    """
+
+    _tables = itertools.count()
+
+    def __init__(self, css=TABLE_CSS):
+        self.css = css
+        self.prefix = f'mvt{next(HtmlTable._tables)}-'
+        self.links = {}
+        self.html = widgets.HTML()
+        self.nav = widgets.Dropdown(description='Go to:', options=[('', None)], value=None,
+                                    layout=widgets.Layout(display='none'))
+        self.nav.observe(self.on_nav, 'value')
+        self.events = None
+        if Event is not None:
+            self.events = Event(source=self.html, watched_events=['click'])
+            self.events.on_dom_event(self.on_dom_event)
+        self.widget = widgets.VBox([self.nav, self.html])
+
+    def clear(self):
+        ''' forget the links of the previous table
+        '''
+        self.links = {}
+
+    def link(self, text, on_click, cls='', tooltip=None):
+        ''' html of a clickable 'text', on_click() is called when clicked
+            the tooltip (or text) also labels the link in the dropdown
+        '''
+        link_id = f'{self.prefix}{len(self.links)}'
+        label = tooltip or text
+        self.links[link_id] = (label, on_click)
+        return f"<span id='{link_id}' class='mv-link {cls}' title='{escape(label, quote=True)}'>{escape(text)}</span>"
+
+    def render(self, body):
+        ''' show 'body' (html using the table classes) as the new table
+        '''
+        if self.events is None:
+            # no click events, navigate with the dropdown
+            seen, options = set(), [('', None)]
+            for link_id, (label, on_click) in self.links.items():
+                if label not in seen:
+                    seen.add(label)
+                    options.append((label, link_id))
+            self.nav.options = options
+            self.nav.value = None
+            self.nav.layout.display = 'flex' if len(options) > 1 else 'none'
+        self.html.value = self.css + body
+
+    def follow(self, link_id):
+        link = self.links.get(link_id)
+        if link is not None:
+            link[1]()
+
+    def on_dom_event(self, event):
+        self.follow(event.get('target', {}).get('id'))
+
+    def on_nav(self, change):
+        if change['new'] is not None:
+            link_id = change['new']
+            self.nav.value = None
+            self.follow(link_id)
@@ -0,0 +1,174 @@
+from collections import namedtuple
+import pandas as pd
+from utils import reorder_columns
+
+# display data of one item, see MenuCatalog
+CatalogEntry = namedtuple('CatalogEntry', [
+    'name',
+    'is_ingredient',    # a nickname in the price guide
+    'children',         # immediate ingredients (tuple)
+    'flat',             # simple ingredients of the flattened recipe (tuple)
+    'ingredients',      # flat ingredients, heaviest first (tuple, empty if unknown)
+    'allergens',        # allergen text as shown in a recipe row
+    'guide_allergens',  # all allergens of the guide entries, sorted text
+    'description',      # most recent guide description
+    'collapse',         # the single simple ingredient this item stands for, or itself
+])
+
+MENUS = ['breakfast', 'lunch', 'dinner', 'desserts']
+
+
+class MenuCatalog:
+    """
+    Read-only display data for every item of a CostCalculator
+
+    compile(cc) is run once after loading and resolves, for each recipe and
+    ingredient, the allergens, the weight-ordered ingredient list, the
+    description and the single-ingredient collapse target, along with the
+    frame shown when the item is looked up.  Rendering then reads entries
+    only, without walking recipes, flattening or converting units.
+    Names missing from the catalog (e.g. added after compiling) are resolved
+    on first use.
+    """
+
+    def __init__(self, cc=None):
+        self.cc = None
+        self.entries = {}
+        self.frames = {}
+        self.descriptions = {}
+        self.guide_allergens = {}
+        self.children = {}
+        self.nicknames = set()
+        self.generation = 0  # bumped by each compile
+        if cc is not None:
+            self.compile(cc)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def compile(self, cc):
+        ''' build the catalog from the recipes and guide of 'cc'
+        '''
+        self.cc = cc
+        self.generation += 1
+        self.entries = {}
+        self.frames = {}
+        costdf, uni_g = cc.costdf, cc.uni_g
+        if costdf.empty or 'nickname' not in uni_g.columns:
+            self.descriptions, self.guide_allergens, self.children = {}, {}, {}
+            self.nicknames = set()
+            return self
+
+        # most recent description of each nickname
+        guide = uni_g.dropna(subset=['nickname'])
+        self.nicknames = set(guide['nickname'])
+        if 'date' in guide.columns:
+            try:
+                guide = guide.sort_values(by='date', ascending=False, kind='stable')
+            except TypeError:
+                pass
+        latest = guide.drop_duplicates('nickname')
+        self.descriptions = {}
+        if 'description' in latest.columns:
+            for nick, desc in zip(latest['nickname'], latest['description']):
+                self.descriptions[nick] = str(desc) if desc and not pd.isna(desc) else ''
+
+        # every allergen listed for a nickname
+        self.guide_allergens = {}
+        if 'allergen' in guide.columns:
+            for nick, allergens in guide.dropna(subset=['allergen']).groupby('nickname', observed=True)['allergen']:
+                found = set()
+                for allergen in allergens.unique():
+                    if isinstance(allergen, str):
+                        found.update(a for a in allergen.replace(' ', '').split(',') if a)
+                self.guide_allergens[nick] = ", ".join(sorted(found)) if found else ""
+
+        self.children = {item: list(ingredients) for item, ingredients in costdf.groupby('item', sort=False, observed=True)['ingredient']}
+
+        names = set(costdf['ingredient'].dropna()) | self.nicknames
+        for name in names:
+            self.entries[name] = self._compile_entry(name)
+        return self
+
+    def get(self, name):
+        ''' the CatalogEntry of 'name' (resolved now if it isn't compiled)
+        '''
+        entry = self.entries.get(name)
+        if entry is None and self.cc is not None:
+            # resolving writes allergens and costs to the calculator, possibly
+            # from a background thread, so under the lock its edits take
+            with self.cc.journal.lock:
+                entry = self.entries[name] = self._compile_entry(name)
+        return entry
+
+    def frame(self, name):
+        ''' copy of the frame shown when 'name' is looked up (empty if unknown)
+        '''
+        if name not in self.frames:
+            if self.cc is None:
+                return pd.DataFrame()
+            self.get(name)
+        return self.frames.get(name, pd.DataFrame()).copy()
+
+    def all_children(self, name, found=None):
+        found = set() if found is None else found
+        for child in self.children.get(name, []):
+            found.add(child)
+            self.all_children(child, found)
+        return found
+
+    def _compile_entry(self, name):
+        cc = self.cc
+        is_ingredient = name in self.nicknames or cc.is_ingredient(name)
+        children = tuple(self.children.get(name, cc.get_children(name)))
+
+        flat, ingredients = (), ()
+        if not is_ingredient and children:
+            try:
+                quant = cc.get_recipe_entry(name)['quantity'].squeeze()
+                rdf = cc.flatten_recipe(name, quant)
+                flat = tuple(rdf['ingredient'])
+                rdf['weight'] = [self._weight(r['ingredient'], r['quantity']) for i, r in rdf.iterrows()]
+                ingredients = tuple(rdf.sort_values(by='weight', ascending=False)['ingredient'])
+            except Exception:
+                ingredients = ()
+
+        collapse = name
+        if not is_ingredient:
+            all_children = self.all_children(name)
+            if len(all_children) == 1:
+                collapse = all_children.pop()
+
+        allergens = ', '.join(cc.findNset_allergens(name))
+        if name in MENUS:
+            allergens = ''
+
+        self.frames[name] = self._compile_frame(name)
+        return CatalogEntry(name, is_ingredient, children, flat, ingredients, allergens,
+                            self.guide_allergens.get(name, ''),
+                            self.descriptions.get(name, ''), collapse)
+
+    def _weight(self, ingredient, quantity):
+        try:
+            return self.cc.do_conversion(ingredient, str(quantity), '1 g')
+        except Exception:
+            return None
+
+    def _compile_frame(self, name):
+        cc = self.cc
+        rentry = cc.get_recipe_entry(name)
+        if not rentry.empty:
+            frame = pd.concat([rentry, cc.item_list(name)], ignore_index=True)
+            return reorder_columns(frame, cc.costdf_order)
+        frame = cc.find_nick(name)
+        if frame.empty:
+            return pd.DataFrame()
+        if 'date' in frame.columns:
+            try:
+                frame = frame.sort_values(by='date', ascending=False, kind='stable')
+            except TypeError:
+                pass
+        return reorder_columns(frame.reset_index(drop=True), cc.uni_g_easyorder)
@@ -1,8 +1,14 @@
+from functools import partial
+from html import escape
 import pandas as pd
 import ipywidgets as widgets
 from IPython.display import display, clear_output, HTML
 from costcalulator import CostCalculator
 from utils import reorder_columns
+from column_widths import ColumnWidths
+from menu_catalog import MenuCatalog
+from html_table import HtmlTable
+from highlight_state import HighlightState
 from menu_styles_components import *
 
 class MenuDisplayWidget:
@@ -10,23 +16,47 @@ class MenuDisplayWidget:
     Widget for displaying menu items and recipes in a user-friendly format
     """
     
-    def __init__(self, df, cc=None, output=None, trigger=None, viewer=None):
+    def __init__(self, df, cc=None, output=None, trigger=None, viewer=None, catalog=None,
+                 render_mode='widgets', highlights=None):
         # Initialize with a CostCalculator if provided, otherwise create a new one
         self.cc = cc if cc is not None else CostCalculator()
+        # Display data is read from the catalog, names not compiled yet are resolved from cc
+        self.catalog = catalog if catalog is not None else MenuCatalog()
+        if self.catalog.cc is None:
+            self.catalog.cc = self.cc
         self.df = df.reset_index(drop=True).copy()
         self.output = output if output is not None else widgets.Output()
         self.trigger = trigger
         self.viewer = viewer  # Store reference to MenuViewer
+        # selection and row flags, shared with the viewer that sets them
+        self.highlights = highlights if highlights is not None else HighlightState()
         
         # Initialize properties
         self.width = '100px'
         self.column_width = {}
+        self.column_widths = ColumnWidths(char_width=10, header_char_width=8, pad=5)
+        self.text_lengths = ColumnWidths(floats=False)
         self.df_type = None
         self.hide_columns = ['cost', 'note', 'conversion', 'saved cost', 'equ quant']
         self.backbutton = create_styled_button('Back', disabled=True)
         self.search_history = []
         self.last_lookup = ''
         
+        # Rows are built a page at a time
+        self.page_size = 40
+        self.row_count = 0
+        self.rendered_rows = 0
+        self.render_context = {}
+        self.rows_vbox = widgets.VBox([])
+        self.more_button = create_styled_button('Show more', self.render_more)
+        
+        # 'widgets' builds a widget per row, 'html' shows all rows as one HTML table
+        self.render_mode = render_mode
+        self.html_table = None
+        # content of the shown rows by position, used to restyle only what changed
+        self.row_parts = {}
+        self.row_widgets = {}
+        
         # Initialize ingredient lists
         self.all_ingredients = set()
         self.simple_ingredients = set()
@@ -56,24 +86,9 @@ class MenuDisplayWidget:
     
     def update_column_width(self):
         """Calculate and update column widths based on content"""
-        def carlen(myval):
-            myval = f"{myval:0.2f}" if isinstance(myval, float) else myval
-            return len(str(myval))
-    
         try:
-            # Calculate widths based on content
-            maxlen = {}
-            for col in self.df.columns:
-                try:
-                    maxlen[col] = self.df[col].map(lambda y: 5 + 10 * carlen(y)).max()
-                except:
-                    maxlen[col] = MIN_BUTTON_WIDTH  # Default width
-            
-            # Calculate widths based on column names
-            cn_len = {c: 5 + 8 * len(str(c)) for c in self.df.columns}
-    
-            # Use the maximum of content width and column name width
-            self.column_width = {c: max(maxlen.get(c, MIN_BUTTON_WIDTH), cn_len.get(c, MIN_BUTTON_WIDTH)) for c in self.df.columns}
+            # Use the maximum of content width (floats as 0.2f) and column name width
+            self.column_width = self.column_widths.widths(self.df, key=self.last_lookup)
             
             # Special case for recipe item column
             if self.df_type == 'recipe':
@@ -82,18 +97,21 @@ class MenuDisplayWidget:
             # Default if something goes wrong
             self.column_width = {c: MIN_BUTTON_WIDTH for c in self.df.columns}
     
-    def setdf(self, mylookup):
-        """Set the current DataFrame based on the lookup value"""
+    def setdf(self, mylookup, frame=None):
+        """Set the current DataFrame based on the lookup value (or a prebuilt frame)"""
         self.last_lookup = mylookup
-        mydf = self.cc.findframe(mylookup).reset_index(drop=True).copy()
+        if frame is None:
+            frame = self.catalog.frame(mylookup)
+        mydf = frame.reset_index(drop=True).copy()
         self.df = mydf
+        self.highlights.reset_rows(len(self.df))
         self.findtype()
         
         if self.df_type == 'recipe':
             colorder = ['item', 'ingredient', 'quantity', 'cost', 'equ quant']
             
             # Add allergen column
-            mydf['allergen'] = mydf['ingredient'].apply(lambda x: ', '.join(self.cc.findNset_allergens(x)))
+            mydf['allergen'] = mydf['ingredient'].apply(lambda x: self.catalog.get(x).allergens)
             
             mydf = reorder_columns(mydf, colorder)
             mycolumns = [x for x in mydf.columns if x not in self.hide_columns]
@@ -117,30 +135,12 @@ class MenuDisplayWidget:
     
     def update_display(self):
         """Update the display with widgets for each cell of the DataFrame"""
-        def addweight(row):
-            """Helper function to add weight to a row"""
-            try:
-                row['weight'] = self.cc.do_conversion(row['ingredient'], str(row['quantity']), '1 g')
-            except:
-                row['weight'] = None
-            return row
-        
-        def ingredients_by_weight(ing, quant):
-            """Get ingredients sorted by weight"""
-            try:
-                rdf = self.cc.flatten_recipe(ing, quant)
-                rdf = rdf.apply(addweight, axis=1)
-                return list(rdf.sort_values(by='weight', ascending=False)['ingredient'])
-            except:
-                return []
-        
         # Calculate maximum text length for each column
-        max_lengths = {}
-        for col in self.df.columns:
-            try:
-                max_lengths[col] = max(self.df[col].astype(str).map(len).max(), len(col)) * 9
-            except:
-                max_lengths[col] = MIN_BUTTON_WIDTH
+        try:
+            text_lengths = self.text_lengths.max_lengths(self.df, key=self.last_lookup)
+            max_lengths = {col: max(text_lengths[col], len(col)) * 9 for col in self.df.columns}
+        except:
+            max_lengths = {col: MIN_BUTTON_WIDTH for col in self.df.columns}
         
         # Configure 'Back' button
         self.backbutton.layout.width = f'{MIN_BUTTON_WIDTH}px'
@@ -150,30 +150,17 @@ class MenuDisplayWidget:
         else:
             self.backbutton.disabled = True
             
-        # Create header row with standardized styling
-        header_hbox = create_header_row(self.df.columns, max_lengths)
-        
-        # Create a list to hold row widgets
-        rows = []
-        
-        # Get highlighted ingredients from the viewer
-        highlighted_ingredients = []
-        if self.viewer:
-            highlighted_ingredients = self.viewer.highlighted_ingredients
-        
         # First, calculate the maximum button width based on ingredients
         max_button_width = MIN_BUTTON_WIDTH
-        for index, row in self.df.iterrows():
-            if self.df_type == 'recipe':
-                if index == 0:
-                    continue  # Skip recipe title
-                ingredient = row['ingredient']
-            elif self.df_type == 'mentions':
-                ingredient = row['item']
-            else:
-                continue
-            # Calculate width needed for this ingredient text
-            text_width = len(ingredient) * 10 # Approximate pixels per character
+        if self.df_type == 'recipe':
+            names = self.df['ingredient'].iloc[1:]  # Skip recipe title
+        elif self.df_type == 'mentions':
+            names = self.df['item']
+        else:
+            names = pd.Series([], dtype=object)
+        if len(names):
+            # Calculate width needed for the longest ingredient text
+            text_width = int(names.str.len().max()) * 10 # Approximate pixels per character
             max_button_width = max(max_button_width, text_width)
             
         # Add some padding to ensure no truncation
@@ -182,311 +169,263 @@ class MenuDisplayWidget:
         button_width = max_button_width
         
         # Iterate through DataFrame rows and create widgets for each cell
-        for index, row in self.df.iterrows():
-            row_widgets = []
-            item_widget = None
-            allergen_widget = None
-            inglist_widget = None
-            
-            if self.df_type in ['guide', None]:
-                # we want to display the ingredient name and description
-                if self.df_type == 'guide':
-                    # For guide type, display nickname, complete allergens, and description
-                    if 'nickname' in row:
-                        ingredient_name = row['nickname']
-                        
-                        # Create ingredient title
-                        item_widget = widgets.HTML(
-                            value=HTML_TEMPLATES['recipe_title'].format(text=ingredient_name),
-                            layout=widgets.Layout(width=f'{button_width}px')
-                        )
-                        row_widgets.append(item_widget)
-                        
-                        # Create a container for description and allergens
-                        info_container = []
-                        
-                        # Get complete allergen information
-                        all_allergens = self.get_all_allergens_for_ingredient(ingredient_name)
-                        
-                        if all_allergens:
-                            # Get selected allergens from viewer
-                            selected_allergens = self.viewer.selected_allergens if self.viewer else []
-                            
-                            # Format the allergen text with icons
-                            formatted_allergen = format_allergen_text(all_allergens, selected_allergens)
-                            
-                            # Create allergen widget
-                            allergen_widget = widgets.HTML(
-                                value=f"<strong>Allergens:</strong> {formatted_allergen}",
-                                layout=widgets.Layout(
-                                    width='auto',
-                                    min_width='150px',
-                                    margin='0 10px',
-                                    padding='5px 0',
-                                    height='auto'
-                                )
-                            )
-                            info_container.append(allergen_widget)
-                        
-                        # Add description if it exists
-                        description = row.get('description', '')
-                        if description:
-                            description_widget = widgets.HTML(
-                                value=f"<em>{description}</em>",
-                                layout=widgets.Layout(
-                                    height='auto',
-                                    min_height=BUTTON_HEIGHT,
-                                    padding='5px 0',
-                                    flex='1 1 auto'
-                                )
-                            )
-                            info_container.append(description_widget)
-                            
-                        # If neither allergen nor description, add empty placeholder
-                        if not info_container:
-                            info_container.append(widgets.Label(
-                                layout=widgets.Layout(height=BUTTON_HEIGHT, flex='1 1 auto')
-                            ))
-                        
-                        # Create VBox for description with allergens above
-                        info_vbox = widgets.VBox(
-                            info_container,
-                            layout=LAYOUTS['ingredient_container']
-                        )
-                        row_widgets.append(info_vbox)
-                        
-                        # Add the row to rows
-                        row_hbox = widgets.HBox(row_widgets, layout=LAYOUTS['row'])
-                        rows.append(row_hbox)
-                    # No continue needed - we've processed the only guide row
-                    break
-                continue  # Skip processing for 'guide' and None types
-            
-            if self.df_type == 'recipe':
-                recipe_title = False
-                if index == 0:
-                    if row['ingredient'] in ['breakfast', 'lunch', 'dinner', 'desserts']:
-                        continue
-                    
-                    # Create recipe title
-                    item_widget = widgets.HTML(
-                        value=HTML_TEMPLATES['recipe_title'].format(text=row['ingredient']),
-                        layout=widgets.Layout(width=f'{button_width}px')
-                    )
-                ingredient = row['ingredient']
-            elif self.df_type == 'mentions':
-                ingredient = row['item']
-            else:
-                continue
-
-            # Create ingredient list
-            inglist = []
+        # Only the first page of rows is built now, the rest wait behind 'show more'
+        if self.df_type == 'guide':
+            self.row_count = min(len(self.df), 1)  # only the first guide row is shown
+        elif self.df_type in ['recipe', 'mentions']:
+            self.row_count = len(self.df)
+        else:
+            self.row_count = 0
+        self.render_context = dict(button_width=button_width)
+        self.row_parts = {}
+        self.row_widgets = {}
+        if self.render_mode == 'html':
+            self.render_html(button_width)
+            return
+        
+        # Create header row with standardized styling
+        header_hbox = create_header_row(self.df.columns, max_lengths)
+        self.rendered_rows = 0
+        self.rows_vbox = widgets.VBox([])
+        self.render_more()
+        
+        # Combine with the header row
+        display_layout = widgets.VBox([header_hbox, self.rows_vbox])
+        
+        # Clear previous output and display the new layout
+        with self.output:
+            self.output.clear_output(wait=True)
+            display(display_layout)
+    
+    def render_more(self, button=None):
+        """Build the next page of rows, keeping a 'show more' button while rows remain"""
+        start = self.rendered_rows
+        stop = min(start + self.page_size, self.row_count)
+        new_rows = []
+        for position in range(start, stop):
+            parts = self.row_parts[position] = self._row_parts(self.df.index[position], self.df.iloc[position])
+            if parts is not None:
+                row_hbox = self.row_widgets[position] = self._render_row(parts, **self.render_context)
+                new_rows.append(row_hbox)
+        self.rendered_rows = stop
+        
+        children = [c for c in self.rows_vbox.children if c is not self.more_button] + new_rows
+        remaining = self.row_count - stop
+        if remaining > 0:
+            self.more_button.description = f'Show more ({remaining} more)'
+            children.append(self.more_button)
+        self.rows_vbox.children = children
+    
+    def restyle(self):
+        """Show a change of highlighting, rebuilding only the shown rows whose content changed"""
+        changed = {}
+        for position, old_parts in self.row_parts.items():
+            parts = self._row_parts(self.df.index[position], self.df.iloc[position])
+            if parts != old_parts:
+                changed[position] = parts
+        if not changed:
+            return
+        
+        if self.render_mode == 'html':
+            # the table is one string, send it again
+            self.render_html(**self.render_context)
+            return
+        
+        replaced = {}
+        for position, parts in changed.items():
+            self.row_parts[position] = parts
+            old_row = self.row_widgets.get(position)
+            if old_row is not None and parts is not None:
+                row_hbox = self.row_widgets[position] = self._render_row(parts, **self.render_context)
+                replaced[id(old_row)] = row_hbox
+        self.rows_vbox.children = [replaced.get(id(c), c) for c in self.rows_vbox.children]
+    
+    def _row_parts(self, index, row):
+        """What one row of the frame shows, as text and HTML (None if the row is not shown)
+        
+        Shared by the widget and the HTML render modes. 'allergens' is None when
+        there is no allergen line, 'ingredients' None when there is no ingredient
+        list and 'description' None when there is nothing to describe.
+        """
+        highlights = self.highlights
+        selected_allergens = highlights.selected_allergens
+        
+        if self.df_type == 'guide':
+            # For guide type, display nickname, complete allergens, and description
+            if 'nickname' not in row:
+                return None
+            ingredient_name = row['nickname']
             
-            if item_widget is None:
-                # Determine if this row should be highlighted
-                highlight_row = False
-                if row.get('highlight', False):
-                    # Ingredient highlighting
-                    highlight_row = True
-                elif row.get('allergen_highlight', False):
-                    # Allergen highlighting
-                    highlight_row = True
-                elif highlighted_ingredients and inglist:
-                    # Ingredient list matching
-                    if any(ing in highlighted_ingredients for ing in inglist):
-                        highlight_row = True
-                
-                # Create the button with appropriate style
-                button_click_handler = self.make_on_click(ingredient)
-                item_widget = create_styled_button(
-                    ingredient,
-                    button_click_handler, 
-                    f"View details for {ingredient}",
-                    width=f'{button_width}px',
-                    styledict=dict(font_weight='bold', font_variant="small-caps",)
-                )
-                
-                # Highlight if either ingredient or allergen highlighting is active
-                if row.get('highlight', False) or row.get('allergen_highlight', False):
-                    item_widget.style.button_color = HIGHLIGHT_COLOR
-
-            row_widgets.append(item_widget)
-
-            # Create labels for the other columns
-            for col in self.df.columns:
-                if col in ['ingredient', 'item', 'menu price']:
-                    continue
-                # For the allergen column
-                elif col in ['allergen']:
-                    allergen_value = str(row[col])
-                    
-                    if len(allergen_value) > 0:
-                        # Get selected allergens from viewer
-                        selected_allergens = self.viewer.selected_allergens if self.viewer else []
-                        
-                        # Format the allergen text with icons
-                        formatted_allergen = format_allergen_text(allergen_value, selected_allergens)
-                        
-                        # HTML widget gives better formatting control and handles overflow better
-                        allergen_widget = widgets.HTML(
-                            value=formatted_allergen,
-                            layout=widgets.Layout(
-                                width='auto',
-                                min_width='150px',
-                                margin='0 10px',
-                                height='auto'
-                            )
-                        )
-                    else:
-                        allergen_widget = None
+            # Get complete allergen information
+            all_allergens = self.get_all_allergens_for_ingredient(ingredient_name)
+            allergens = None
+            if all_allergens:
+                allergens = f"<strong>Allergens:</strong> {format_allergen_text(all_allergens, selected_allergens)}"
             
-            # Create ingredient list
-            inglist = []
-            ingredients_container = []
-            if allergen_widget is not None:
-                ingredients_container.append(allergen_widget)
-            clean_ingredient = ingredient
-                
-            if not self.cc.is_ingredient(clean_ingredient) and len(self.cc.get_children(clean_ingredient)) > 1:
-                # Get ingredient list
-                if 'ingredient list' in self.df.columns and isinstance(row.get('ingredient list'), str):
-                    inglist = row['ingredient list'].split(',')
-                else:
-                    try:
-                        inglist = ingredients_by_weight(clean_ingredient, row['quantity'])
-                        if inglist:
-                            if 'ingredient list' not in self.cc.costdf.columns:
-                                self.cc.costdf['ingredient list'] = None
-                            self.cc.costdf.loc[self.cc.costdf['ingredient'] == clean_ingredient, 'ingredient list'] = ",".join(inglist)
-                            if 'ingredient list' not in self.df.columns:
-                                self.df['ingredient list'] = None
-                            self.df.loc[self.df['ingredient'] == clean_ingredient, 'ingredient list'] = ",".join(inglist)
-                    except:
-                        inglist = []
-                    
-                if inglist:
-                    # Format ingredients as HTML list with highlighting
-                    formatted_ingredients_parts = []
-                    
-                    # Get highlighted ingredients (from ingredient highlighting)
-                    highlighted_ingredients = self.viewer.highlighted_ingredients if self.viewer else []
-                    
-                    # Get allergen ingredients
-                    allergen_ingredients = set()
-                    if 'allergen_ingredients' in self.df.columns:
-                        allergen_str = row.get('allergen_ingredients', '').strip('{}')
-                        if allergen_str:
-                            allergen_ingredients = {ing.strip().strip("'") for ing in allergen_str.split(',')}
-                    
-                    # Format each ingredient with a unified highlighting style
-                    for ing in inglist:
-                        # Check if ingredient should be highlighted (either by ingredient or allergen)
-                        should_highlight = (highlighted_ingredients and ing in highlighted_ingredients) or \
-                                        (allergen_ingredients and ing in allergen_ingredients)
-                        
-                        # Get formatted HTML for this ingredient
-                        formatted_ingredients_parts.append(get_highlighted_ingredient_html(ing, should_highlight))
-                    
-                    formatted_ingredients = ", ".join(formatted_ingredients_parts)
-                    
-                    inglist_widget = widgets.HTML(
-                        value=HTML_TEMPLATES['ingredient_list'].format(ingredients=formatted_ingredients),
-                        layout=LAYOUTS['ingredient_list']
-                    )
-                    ingredients_container.append(inglist_widget)
-                    
-                else:
-                    # For simple ingredients, get and display the description
-                    description = self.get_ingredient_description(clean_ingredient)
-                    if description:
-                        description_widget = widgets.HTML(
-                            value=f"<em>{description}</em>",
-                            layout=widgets.Layout(
-                                height='auto',
-                                min_height=BUTTON_HEIGHT,
-                                flex='1 1 auto'
-                            )
-                        )
-                        ingredients_container.append(description_widget)
-                    else:
-                        # If no description, add empty placeholder
-                        ingredients_container.append(widgets.Label(
-                            layout=widgets.Layout(height=BUTTON_HEIGHT, flex='1 1 auto')
-                        )) 
+            # Add description if it exists
+            description = row.get('description', '')
+            return dict(name=ingredient_name, title=True, highlight=False, highlight_row=False,
+                        allergens=allergens, ingredients=None,
+                        description=f"<em>{description}</em>" if description else None)
+        
+        if self.df_type == 'recipe':
+            ingredient = row['ingredient']
+            title = index == 0
+            if title and ingredient in ['breakfast', 'lunch', 'dinner', 'desserts']:
+                return None
+        elif self.df_type == 'mentions':
+            ingredient = row['item']
+            title = False
+        else:
+            return None
+        
+        # Format the allergen text with icons
+        allergens = None
+        if 'allergen' in self.df.columns:
+            allergen_value = str(row['allergen'])
+            if len(allergen_value) > 0:
+                allergens = format_allergen_text(allergen_value, selected_allergens)
+        
+        # Create ingredient list
+        inglist = []
+        ingredients = None
+        description = None
+        entry = self.catalog.get(ingredient)
+        if not entry.is_ingredient and len(entry.children) > 1:
+            # Get ingredient list, heaviest first
+            inglist = list(entry.ingredients)
+            if inglist:
+                # Format each ingredient with a unified highlighting style (by ingredient or allergen)
+                formatted_ingredients_parts = [get_highlighted_ingredient_html(ing, highlights.ingredient_highlighted(ing))
+                                               for ing in inglist]
+                ingredients = HTML_TEMPLATES['ingredient_list'].format(ingredients=", ".join(formatted_ingredients_parts))
             else:
-                mying = clean_ingredient
-                if self.cc.is_ingredient(clean_ingredient):
-                    pass
-                elif len(theing := self.cc.get_all_children(clean_ingredient, set())) == 1:
-                    mying = theing.pop()
                 # For simple ingredients, get and display the description
-                description = self.get_ingredient_description(mying)
-                if description:
-                    description_widget = widgets.HTML(
-                        value=f"<em>{description}</em>",
-                        layout=widgets.Layout(
-                            height='auto',
-                            min_height=BUTTON_HEIGHT,
-                            flex='1 1 auto'
-                        )
-                    )
-                    ingredients_container.append(description_widget)
-                else:
-                    # If no description, add empty placeholder
-                    ingredients_container.append(widgets.Label(
-                        layout=widgets.Layout(height=BUTTON_HEIGHT, flex='1 1 auto')
-                    ))
-            # Create VBox for ingredients with allergens above
-            ingredients_vbox = widgets.VBox(
-                ingredients_container,
-                layout=LAYOUTS['ingredient_container']
+                description = self.get_ingredient_description(ingredient)
+        else:
+            # a recipe of a single ingredient shows that ingredient
+            description = self.get_ingredient_description(entry.collapse)
+        
+        # Highlight if either ingredient or allergen highlighting is active
+        highlight = highlights.row_highlighted(index)
+        highlight_row = highlight or highlights.uses_highlighted(inglist)
+        return dict(name=ingredient, title=title, highlight=highlight, highlight_row=highlight_row,
+                    allergens=allergens, ingredients=ingredients,
+                    description=f"<em>{description}</em>" if description else None)
+    
+    def _render_row(self, parts, button_width):
+        """Build the widgets of one row from its _row_parts"""
+        # guide rows are padded a little more
+        padding = '5px 0' if self.df_type == 'guide' else None
+        
+        if parts['title']:
+            # Create recipe title
+            item_widget = widgets.HTML(
+                value=HTML_TEMPLATES['recipe_title'].format(text=parts['name']),
+                layout=widgets.Layout(width=f'{button_width}px')
             )
-            row_widgets.append(ingredients_vbox)
-
-            # Determine if this row should be highlighted
-            highlight_row = False
-            if row.get('highlight', False):
-                # Ingredient highlighting
-                highlight_row = True
-            elif row.get('allergen_highlight', False):
-                # Allergen highlighting
-                highlight_row = True
-            elif highlighted_ingredients and inglist:
-                # Ingredient list matching
-                if any(ing in highlighted_ingredients for ing in inglist):
-                    highlight_row = True
-
-            # Use appropriate layout based on highlighting
-            row_layout = LAYOUTS['highlighted_row'] if highlight_row else LAYOUTS['row']
-                                        
-            row_hbox = widgets.HBox(row_widgets, layout=row_layout)
-            rows.append(row_hbox)
+        else:
+            # Create the button with appropriate style
+            ingredient = parts['name']
+            item_widget = create_styled_button(
+                ingredient,
+                self.make_on_click(ingredient), 
+                f"View details for {ingredient}",
+                width=f'{button_width}px',
+                styledict=dict(font_weight='bold', font_variant="small-caps",)
+            )
+            if parts['highlight']:
+                item_widget.style.button_color = HIGHLIGHT_COLOR
+        
+        # Create a container for allergens above the ingredients or description
+        info_container = []
+        if parts['allergens'] is not None:
+            # HTML widget gives better formatting control and handles overflow better
+            info_container.append(widgets.HTML(
+                value=parts['allergens'],
+                layout=widgets.Layout(
+                    width='auto',
+                    min_width='150px',
+                    margin='0 10px',
+                    padding=padding,
+                    height='auto'
+                )
+            ))
+        if parts['ingredients'] is not None:
+            info_container.append(widgets.HTML(
+                value=parts['ingredients'],
+                layout=LAYOUTS['ingredient_list']
+            ))
+        elif parts['description'] is not None:
+            info_container.append(widgets.HTML(
+                value=parts['description'],
+                layout=widgets.Layout(
+                    height='auto',
+                    min_height=BUTTON_HEIGHT,
+                    padding=padding,
+                    flex='1 1 auto'
+                )
+            ))
+        elif self.df_type != 'guide' or not info_container:
+            # If no description, add empty placeholder
+            info_container.append(widgets.Label(
+                layout=widgets.Layout(height=BUTTON_HEIGHT, flex='1 1 auto')
+            ))
         
-        # Create a VBox for all rows
-        rows_vbox = widgets.VBox(rows)
+        # Create VBox for ingredients with allergens above
+        info_vbox = widgets.VBox(
+            info_container,
+            layout=LAYOUTS['ingredient_container']
+        )
         
-        # Combine with the header row
-        display_layout = widgets.VBox([header_hbox, rows_vbox])
+        # Use appropriate layout based on highlighting
+        row_layout = LAYOUTS['highlighted_row'] if parts['highlight_row'] else LAYOUTS['row']
+        return widgets.HBox([item_widget, info_vbox], layout=row_layout)
+    
+    def render_html(self, button_width):
+        """Show all rows as one HTML table, item names link to their lookup"""
+        if self.html_table is None:
+            self.html_table = HtmlTable()
+        table = self.html_table
+        table.clear()
+        
+        body = ["<table class='mv-table'>",
+                f"<tr><th style='width: {button_width}px'>Item</th><th>Allergen / Ingredients</th></tr>"]
+        for position in range(self.row_count):
+            parts = self.row_parts[position] = self._row_parts(self.df.index[position], self.df.iloc[position])
+            if parts is None:
+                continue
+            name = parts['name']
+            if parts['title']:
+                item = HTML_TEMPLATES['recipe_title'].format(text=escape(str(name)))
+            else:
+                item = table.link(name, partial(self.make_on_click(name), None),
+                                  cls='mv-highlight' if parts['highlight'] else '',
+                                  tooltip=f"View details for {name}")
+            info = [f"<div>{parts[key]}</div>" for key in ['allergens', 'ingredients'] if parts[key] is not None]
+            if parts['ingredients'] is None and parts['description'] is not None:
+                info.append(f"<div>{parts['description']}</div>")
+            body.append(f"<tr><td>{item}</td><td>{''.join(info)}</td></tr>")
+        body.append("</table>")
+        table.render(''.join(body))
         
-        # Clear previous output and display the new layout
         with self.output:
             self.output.clear_output(wait=True)
-            display(display_layout)
+            display(table.widget)
     
+
     def make_on_click(self, ingredient):
         """Create an on_click handler for a specific ingredient"""
         def on_click(button):
             # Add to search history
             self.search_history.append(ingredient)
             
-            # Look up the ingredient
-            self.lookup_name(ingredient)
-            
-            # If we have a trigger, call it to ensure allergen highlighting is applied
+            # If we have a trigger, it looks the ingredient up and applies allergen highlighting
             if self.trigger:
                 self.trigger(ingredient)
             else:
-                # Update the display
+                # Look up the ingredient and update the display
+                self.lookup_name(ingredient)
                 self.update_display()
             
         return on_click
@@ -497,20 +436,18 @@ class MenuDisplayWidget:
             self.search_history.pop()  # Remove current
             previous = self.search_history[-1]  # Get previous without popping it
             
-            # Look up the previous item
-            self.setdf(previous)  # Using setdf directly instead of lookup_name to avoid modifying history
-            
-            # If we have a trigger, call it to ensure allergen highlighting is applied
+            # If we have a trigger, it looks the item up and applies allergen highlighting
             if self.trigger:
                 self.trigger(previous)
             else:
-                # Update the display
+                # Look up the previous item
+                self.setdf(previous)  # Using setdf directly instead of lookup_name to avoid modifying history
                 self.update_display()
     
-    def lookup_name(self, lookup):
+    def lookup_name(self, lookup, frame=None):
         """Look up an ingredient or recipe by name"""
         # Set the DataFrame
-        self.setdf(lookup)
+        self.setdf(lookup, frame)
         
         # Update search history
         if not self.search_history or lookup != self.search_history[-1]:
@@ -522,11 +459,8 @@ class MenuDisplayWidget:
         
         # For each ingredient, check if it contains any of the selected allergens
         for ing in ingredients:
-            # Get allergens for this ingredient
-            ingredient_allergens = self.cc.findNset_allergens(ing)
-            
-            # Convert to lowercase for case-insensitive comparison
-            ingredient_allergens_lower = [a.strip().lower() for a in ingredient_allergens]
+            # Get allergens for this ingredient (lowercase for case-insensitive comparison)
+            ingredient_allergens_lower = {a.strip().lower() for a in self.catalog.get(ing).allergens.split(',')}
             
             # If any selected allergen is in this ingredient's allergens, add to set
             if any(a.lower() in ingredient_allergens_lower for a in selected_allergens):
@@ -536,46 +470,9 @@ class MenuDisplayWidget:
     
     def get_all_allergens_for_ingredient(self, ingredient_name):
         """Collect all allergens for an ingredient across all entries in the guide"""
-        all_allergens = set()
-        
-        if self.cc and hasattr(self.cc, 'uni_g'):
-            # Get all rows for this ingredient
-            ingdf = self.cc.uni_g[self.cc.uni_g['nickname'] == ingredient_name]
-            
-            if not ingdf.empty and 'allergen' in ingdf.columns:
-                # Get all non-null allergen values
-                allergens = ingdf['allergen'].dropna().unique()
-                
-                # Process each allergen string
-                for allergen in allergens:
-                    if isinstance(allergen, str):
-                        # Split, clean and add each allergen
-                        for a in allergen.replace(' ', '').split(','):
-                            if a:  # Only add non-empty values
-                                all_allergens.add(a)
-                                
-        # Return as a comma-separated string
-        return ", ".join(sorted(all_allergens)) if all_allergens else ""
+        # Returned as a comma-separated string
+        return self.catalog.get(ingredient_name).guide_allergens
     
     def get_ingredient_description(self, ingredient):
         """Get the most recent description for an ingredient from the unified guide"""
-        if not self.cc or 'nickname' not in self.cc.uni_g.columns:
-            return ""
-        
-        # Get all rows where nickname matches the ingredient
-        matching_rows = self.cc.uni_g[self.cc.uni_g['nickname'] == ingredient]
-        
-        if matching_rows.empty:
-            return ""
-        
-        # Sort by date (most recent first) if date column exists
-        if 'date' in matching_rows.columns:
-            try:
-                matching_rows = matching_rows.sort_values(by='date', ascending=False)
-            except:
-                pass  # If sorting fails, continue with unsorted rows
-        
-        # Get the most recent description
-        description = matching_rows.iloc[0].get('description', "")
-        
-        return str(description) if description else ""
\ No newline at end of file
+        return self.catalog.get(ingredient).description
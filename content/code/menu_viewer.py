@@ -4,9 +4,13 @@ from IPython.display import display, clear_output, HTML
 import os
 import io
 from costcalulator import CostCalculator
-from utils import get_xlsx_files
+from utils import get_xlsx_files, run_later
 from menu_styles_components import *
 from menu_display_widget import MenuDisplayWidget
+from search_index import PrefixIndex
+from background import LatestRunner
+from menu_catalog import MenuCatalog
+from highlight_state import HighlightState
 
 class MenuViewer:
     """
@@ -14,18 +18,26 @@ class MenuViewer:
     the existing data structures from data_frame_explorer.py and data_frame_widget.py
     """
     
-    def __init__(self, cc=None):
+    def __init__(self, cc=None, render_mode='widgets'):
         # Initialize with a CostCalculator if provided, otherwise create a new one
         self.cc = cc if cc is not None else CostCalculator()
         self.allvals = set()
         self.excel_filename = 'amc_menu_database.xlsx'
         self.hide_columns = ['cost', 'note', 'conversion', 'saved cost', 'equ quant']
+        # 'html' shows each lookup as one HTML table instead of a widget per row
+        self.render_mode = render_mode
         
-        # Track selected allergens
-        self.selected_allergens = []
+        # Selected allergens, highlighted ingredients and the rows they flag
+        self.highlights = HighlightState()
         
-        # Track highlighted ingredients
-        self.highlighted_ingredients = []
+        # Display data of every item, compiled in update_all_values after loading
+        self.catalog = MenuCatalog()
+        
+        # Word-prefix index of simple ingredients, rebuilt in update_all_values
+        self.ingredient_index = PrefixIndex()
+        self.max_matches = 10
+        self.search_delay = 0.15  # seconds to wait for typing to pause
+        self.search_timer = None
         
         # Set up file selection UI with upload functionality
         self.setup_file_selector_with_upload()
@@ -197,14 +209,21 @@ class MenuViewer:
         
         # Create main display area
         self.dfdisplay = widgets.Output(layout=LAYOUTS['output_display'])
-        self.df_widget = MenuDisplayWidget(pd.DataFrame(), cc=self.cc, output=self.dfdisplay, trigger=self.trigger_update, viewer=self)
+        self.df_widget = MenuDisplayWidget(pd.DataFrame(), cc=self.cc, output=self.dfdisplay, trigger=self.trigger_update, viewer=self,
+                                           catalog=self.catalog, render_mode=self.render_mode,
+                                           highlights=self.highlights)
         
         # Get references to back button and ingredient accordion
         self.backbutton = self.df_widget.backbutton
         
+        # Lookups are built on a worker thread, only the latest one is shown
+        self.progress = widgets.IntProgress(value=0, min=0, max=1, description='loading:',
+                                            bar_style='info', layout=widgets.Layout(visibility='hidden'))
+        self.runner = LatestRunner(on_busy=self.show_busy, on_progress=self.show_progress)
+        
         # Create top display area
         self.top_display = widgets.VBox([
-            widgets.HBox([self.backbutton, self.searchinput]),
+            widgets.HBox([self.backbutton, self.searchinput, self.progress]),
             self.dfdisplay
         ], layout=LAYOUTS['top_display'])
         
@@ -365,9 +384,22 @@ class MenuViewer:
         ], layout=LAYOUTS['highlighting_container'])
         
     def on_ingredient_input_change(self, change):
-        """Handle changes to the ingredient input field and create matching buttons"""
+        """Handle changes to the ingredient input field, debounced while typing"""
+        # Cancel the pending search, only the last keystroke in a burst is searched
+        if self.search_timer is not None:
+            self.search_timer.cancel()
+        self.search_timer = run_later(self.search_delay, self.show_matching_ingredients, change['new'])
+    
+    def show_matching_ingredients(self, text):
+        """Create buttons for the ingredients matching text"""
+        self.search_timer = None
+        
+        # Ignore results for text that is no longer in the input
+        if text.strip().lower() != self.ingredient_input.value.strip().lower():
+            return
+        
         # Get the current input text
-        input_text = change['new'].strip().lower()
+        input_text = text.strip().lower()
         
         # Clear the matching ingredients container
         self.matching_ingredients_container.children = []
@@ -376,31 +408,17 @@ class MenuViewer:
         if not input_text or len(input_text) < 2:
             return
         
-        # # Get valid ingredients that match the input text
-        # matching_ingredients = [ing for ing in self.df_widget.simple_ingredients
-        #                     if input_text in ing.lower() and ing not in self.highlighted_ingredients]
-        # Get valid ingredients that match the input text at word boundaries
-        matching_ingredients = []
-        for ing in self.df_widget.simple_ingredients:
-            ing_lower = ing.lower()
-            # Check if the input matches the beginning of the ingredient name
-            if ing_lower.startswith(input_text):
-                matching_ingredients.append(ing)
-            else:
-                # Check if the input matches the beginning of any word in the ingredient name
-                words = ing_lower.split()
-                if any(word.startswith(input_text) for word in words):
-                    matching_ingredients.append(ing)
+        # Get the top valid ingredients that match the input text at word boundaries
+        matching_ingredients = self.ingredient_index.search(
+            input_text, limit=self.max_matches, exclude=self.highlights.highlighted_ingredients)
                     
-        # Only create buttons if there are between 1 and 10 matches (inclusive)
-        if 1 <= len(matching_ingredients) <= 10:
+        if matching_ingredients:
             matching_buttons = []
             if len(matching_ingredients) == 1 and input_text == matching_ingredients[0]:
                 #self.add_highlighted_ingredient(matching_ingredients[0])
                 self.on_add_ingredient()
                 return
             else:
-                matching_ingredients.sort()
                 for ing in matching_ingredients:
                     # Create matching ingredient button with dynamic handler
                     def get_handler(ingredient):
@@ -424,8 +442,8 @@ class MenuViewer:
         
         # Validate ingredient exists in the dataset
         if ingredient and ingredient in self.get_valid_ingredients():
-            if ingredient not in self.highlighted_ingredients:
-                self.highlighted_ingredients.append(ingredient)
+            if ingredient not in self.highlights.highlighted_ingredients:
+                self.highlights.highlighted_ingredients.append(ingredient)
                 self.update_ingredient_chips()
                 self.apply_ingredient_highlighting()
                 self.ingredient_input.value = ""  # Clear input
@@ -436,18 +454,16 @@ class MenuViewer:
             self.ingredient_input.style = WIDGET_STYLES['warning_text']
             
             # Reset after 2 seconds
-            import threading
             def reset_description():
                 self.ingredient_input.description = original_description
                 self.ingredient_input.style = {}
             
-            timer = threading.Timer(2.0, reset_description)
-            timer.start()
+            run_later(2.0, reset_description)
     
     def update_ingredient_chips(self):
         """Update the ingredient chips display"""
         chips = []
-        for ing in self.highlighted_ingredients:
+        for ing in self.highlights.highlighted_ingredients:
             # Create remove handler for this ingredient
             def get_remove_handler(ingredient):
                 return lambda b: self.remove_highlighted_ingredient(ingredient)
@@ -460,8 +476,8 @@ class MenuViewer:
         
     def remove_highlighted_ingredient(self, ingredient):
         """Remove an ingredient from the highlighted ingredients list"""
-        if ingredient in self.highlighted_ingredients:
-            self.highlighted_ingredients.remove(ingredient)
+        if ingredient in self.highlights.highlighted_ingredients:
+            self.highlights.highlighted_ingredients.remove(ingredient)
             self.update_ingredient_chips()
             
             # Check if this ingredient should be added back to the matching ingredients 
@@ -469,15 +485,15 @@ class MenuViewer:
             input_text = self.ingredient_input.value.strip().lower()
             if input_text and len(input_text) >= 2 and input_text in ingredient.lower():
                 # Update the matching ingredients display to include this ingredient
-                self.on_ingredient_input_change({'new': input_text})
+                self.show_matching_ingredients(self.ingredient_input.value)
             
             self.apply_ingredient_highlighting()
         
     def add_highlighted_ingredient(self, ingredient):
         """Add an ingredient to the highlighted ingredients list"""
-        if ingredient not in self.highlighted_ingredients:
+        if ingredient not in self.highlights.highlighted_ingredients:
             # Add to highlighted ingredients list
-            self.highlighted_ingredients.append(ingredient)
+            self.highlights.highlighted_ingredients.append(ingredient)
             self.update_ingredient_chips()
             self.apply_ingredient_highlighting()
             
@@ -492,13 +508,13 @@ class MenuViewer:
         for cb in self.allergen_checkboxes:
             cb.value = False
         # Apply the filtering
-        self.highlighted_ingredients = []
+        self.highlights.highlighted_ingredients = []
         self.update_ingredient_chips()
         # Check if there's a current search text to refresh matching ingredients
         input_text = self.ingredient_input.value.strip().lower()
         if input_text and len(input_text) >= 2:
             # This will refresh the matching ingredients display
-            self.on_ingredient_input_change({'new': input_text})
+            self.show_matching_ingredients(self.ingredient_input.value)
         self.apply_ingredient_highlighting()
         #self.ingredient_input.value = ""
     
@@ -550,168 +566,91 @@ class MenuViewer:
             
             # Update ingredient input options
             self.ingredient_input.options = tuple(sorted(nicks.intersection(ingrs)))
+            self.ingredient_index.rebuild(self.df_widget.simple_ingredients)
+            
+            # Resolve everything the display needs once, navigation only reads it
+            self.catalog.compile(self.cc)
     
     def update_search(self, change):
         """Handle search input changes"""
         if change['new'] in self.allvals:
             change['owner'].style = WIDGET_STYLES['normal_text']  # Reset color if valid
             iname = change['new']
-            self.df_widget.lookup_name(iname)
-            
-            # Apply allergen and ingredient highlighting to the new search result
-            self.apply_allergen_highlighting()
-            self.apply_ingredient_highlighting()
-            
-            self.df_widget.update_display()
+            self.show_lookup(iname)
         else:
             change['owner'].style = WIDGET_STYLES['warning_text']  # Show red if invalid
     
+    def show_lookup(self, iname):
+        """Fetch the frame for iname in the background, then show it"""
+        catalog = self.catalog
+        generation = catalog.generation
+        
+        def work(job):
+            frame = catalog.frame(iname)
+            # resolve the rows' entries too, in case they were not compiled
+            ingredients = list(frame['ingredient']) if 'ingredient' in frame.columns else []
+            for i, ing in enumerate(ingredients):
+                if job.cancelled:
+                    return None
+                catalog.get(ing)
+                job.report(i + 1, len(ingredients))
+            return frame
+        
+        def apply(frame):
+            # runs on the runner's thread, under the lock edits take
+            with self.cc.journal.lock:
+                # a different file was loaded meanwhile, fetch it again
+                if frame is None or catalog.generation != generation:
+                    frame = None
+                self.df_widget.lookup_name(iname, frame)
+                
+                # Apply allergen and ingredient highlighting to the new search result
+                self.apply_allergen_highlighting(restyle=False)
+                self.apply_ingredient_highlighting(restyle=False)
+                
+                self.df_widget.update_display()
+        
+        self.runner.submit(work, apply)
+    
+    def show_busy(self, busy):
+        self.progress.value = 0
+        self.progress.layout.visibility = 'visible' if busy else 'hidden'
+    
+    def show_progress(self, done, total):
+        self.progress.max = max(total, 1)
+        self.progress.value = done
+    
     def trigger_update(self, iname):
         """Handle updates triggered from the widget"""
-        self.searchinput.value = iname
+        if self.searchinput.value == iname:
+            # no change event, show it directly
+            self.show_lookup(iname)
+        else:
+            self.searchinput.value = iname
     
     def on_allergen_toggle(self, change):
         """Handle allergen checkbox toggles"""
         # Update selected allergens list
-        self.selected_allergens = [cb.description for cb in self.allergen_checkboxes if cb.value]
+        self.highlights.selected_allergens = [cb.description for cb in self.allergen_checkboxes if cb.value]
         
-        # Apply the filtering
+        # Only the highlighting changes, the shown rows are restyled
         self.apply_allergen_highlighting()
     
-    def apply_ingredient_highlighting(self):
-        """Apply highlighting for selected ingredients"""
-        # Skip if no ingredients to highlight
-        if not self.highlighted_ingredients:
-            # If there are no highlighted ingredients, we need to ensure any existing
-            # highlighting is cleared but allergen highlighting remains
-            if self.df_widget.df_type == 'recipe' and self.df_widget.last_lookup:
-                filtered_df = self.df_widget.df.copy()
-                filtered_df['highlight'] = False
-                self.df_widget.df = filtered_df
-                self.df_widget.update_display()
-            return
-
-        # If we have a recipe displayed, update with highlighted ingredients
-        if self.df_widget.df_type == 'recipe' and self.df_widget.last_lookup:
-            recipe_name = self.df_widget.last_lookup
-            
-            # Make a copy of the current DataFrame and add a highlighting flag
-            # But preserve existing allergen highlighting
-            filtered_df = self.df_widget.df.copy()
-            
-            # Initialize ingredient highlighting to false
-            filtered_df['highlight'] = False
-            
-            # Check each ingredient in the recipe for direct matches
-            for i, row in filtered_df.iloc[1:].iterrows():
-                ingredient = row.get('ingredient', '')
-                
-                # Check if this ingredient should be highlighted directly
-                if ingredient in self.highlighted_ingredients:
-                    filtered_df.at[i, 'highlight'] = True
-                
-                # Also check for sub-ingredients in recipes
-                if not self.cc.is_ingredient(ingredient) and len(self.cc.get_children(ingredient)) > 0:
-                    # Get flattened ingredients
-                    ing_list = []
-                    try:
-                        if isinstance(row.get('ingredient list'), str):
-                            ing_list = row['ingredient list'].split(',')
-                        else:
-                            flat_ingredients = self.cc.flatten_recipe(ingredient, row['quantity'])
-                            ing_list = flat_ingredients['ingredient'].tolist()
-                        
-                        # Check if any highlighted ingredients are in the flattened list
-                        if any(ing in self.highlighted_ingredients for ing in ing_list):
-                            filtered_df.at[i, 'highlight'] = True
-                    except:
-                        pass
-            
-            # Update the display widget with the highlighted DataFrame
-            self.df_widget.df = filtered_df
-            self.df_widget.update_display()
+    def apply_ingredient_highlighting(self, restyle=True):
+        """Flag the rows of the shown recipe that use a highlighted ingredient"""
+        dw = self.df_widget
+        if dw.df_type == 'recipe' and dw.last_lookup:
+            self.highlights.update_ingredient_rows(dw.df, self.catalog)
+        if restyle:
+            dw.restyle()
     
-    def apply_allergen_highlighting(self):
-        """Apply allergen highlighting based on selected allergens"""
-        # If we have a recipe displayed, update with highlighted ingredients
-        if self.df_widget.df_type == 'recipe' and self.df_widget.last_lookup:
-            # Store current recipe name
-            recipe_name = self.df_widget.last_lookup
-            
-            # We need to carefully preserve any existing ingredient highlighting
-            # Get the current DataFrame with any existing ingredient highlighting
-            current_df = self.df_widget.df.copy()
-            
-            # Reload the recipe to get a clean copy with allergens
-            self.df_widget.lookup_name(recipe_name)
-            
-            # Make a copy of the clean DataFrame
-            highlighted_df = self.df_widget.df.copy()
-            
-            # Restore any existing ingredient highlighting
-            if 'highlight' in current_df.columns:
-                highlighted_df['highlight'] = current_df['highlight']
-            else:
-                highlighted_df['highlight'] = False
-            
-            # Add highlighting flag for allergens and initialize as False
-            highlighted_df['allergen_highlight'] = False
-            
-            # Initialize empty allergen ingredients set
-            allergen_ingredients = set()
-            
-            # Only process allergen highlighting if there are selected allergens
-            if self.selected_allergens:
-                # Check each ingredient in the recipe
-                for i, row in highlighted_df.iloc[1:].iterrows():
-                    ingredient = row.get('ingredient', '')
-                    ingredient_allergens = set()
-                    
-                    # Get allergens for this ingredient
-                    if 'allergen' in row and isinstance(row['allergen'], str):
-                        ingredient_allergens = {a.strip().lower() for a in row['allergen'].split(',')}
-                    
-                    # If any selected allergen is in this ingredient's allergens, mark for highlighting
-                    # We want unified highlighting between allergens and ingredients
-                    if any(a.lower() in ingredient_allergens for a in self.selected_allergens):
-                        highlighted_df.at[i, 'allergen_highlight'] = True
-                        allergen_ingredients.add(ingredient)
-                        
-                        # Store specific matching allergens for bold highlighting
-                        matching_allergens = [a for a in self.selected_allergens if a.lower() in ingredient_allergens]
-                        if 'highlighted_allergens' not in highlighted_df.columns:
-                            highlighted_df['highlighted_allergens'] = None
-                        highlighted_df.at[i, 'highlighted_allergens'] = ','.join(matching_allergens)
-                    
-                    # Also check for sub-ingredients with allergens
-                    if not self.cc.is_ingredient(ingredient) and len(self.cc.get_children(ingredient)) > 0:
-                        # Get flattened ingredients
-                        ing_list = []
-                        try:
-                            if isinstance(row.get('ingredient list'), str):
-                                ing_list = row['ingredient list'].split(',')
-                            else:
-                                flat_ingredients = self.cc.flatten_recipe(ingredient, row['quantity'])
-                                ing_list = flat_ingredients['ingredient'].tolist()
-                            
-                            # Get ingredients with allergens
-                            sub_allergen_ingredients = self.df_widget.get_allergen_ingredients(
-                                ing_list, self.selected_allergens)
-                            
-                            # If any sub-ingredients have allergens, highlight this row
-                            if sub_allergen_ingredients:
-                                highlighted_df.at[i, 'allergen_highlight'] = True
-                                allergen_ingredients.update(sub_allergen_ingredients)
-                        except:
-                            pass
-            
-            # Store allergen ingredients for ingredient list highlighting
-            # Even when empty, we need to set this to ensure previous highlighting is cleared
-            highlighted_df['allergen_ingredients'] = str(allergen_ingredients)
-            
-            # Update the display widget with the highlighted DataFrame
-            self.df_widget.df = highlighted_df
-            self.df_widget.update_display()
+    def apply_allergen_highlighting(self, restyle=True):
+        """Flag the rows of the shown recipe, and the ingredients, that contain a selected allergen"""
+        dw = self.df_widget
+        if dw.df_type == 'recipe' and dw.last_lookup:
+            self.highlights.update_allergen_rows(dw.df, self.catalog)
+        if restyle:
+            dw.restyle()
     
     def try_load_default_database(self):
         """Try to load the default database file"""
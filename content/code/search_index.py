@@ -0,0 +1,66 @@
+from bisect import bisect_left
+
+
+class PrefixIndex:
+    """
+    Sorted word-prefix index over a set of names
+
+    Every name is indexed under its full lowercase form and under each of its
+    words, so 'ma' finds both 'maple syrup' and 'soy marinade'.  Lookups are a
+    bisect into the sorted token array followed by a short scan, which keeps
+    queries fast regardless of how many names are indexed.
+    """
+
+    def __init__(self, names=()):
+        self.tokens = []
+        self.entries = []
+        self.size = 0
+        self.rebuild(names)
+
+    def rebuild(self, names):
+        """Rebuild the index from an iterable of names"""
+        pairs = set()
+        count = 0
+        for name in names:
+            if not isinstance(name, str) or not name:
+                continue
+            count += 1
+            name_lower = name.lower()
+            # rank 0: the whole name starts with the prefix
+            pairs.add((name_lower, 0, name))
+            # rank 1: a later word of the name starts with the prefix
+            for word in name_lower.split()[1:]:
+                pairs.add((word, 1, name))
+
+        pairs = sorted(pairs)
+        self.tokens = [p[0] for p in pairs]
+        self.entries = [(p[1], p[2]) for p in pairs]
+        self.size = count
+
+    def __len__(self):
+        return self.size
+
+    def search(self, prefix, limit=None, exclude=()):
+        """
+        Return names with a word starting with prefix
+
+        Names whose full text starts with the prefix come first, then names
+        matching on a later word, each group sorted alphabetically.
+        Returns at most limit names (all matches if limit is None).
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        best = {}
+        i = bisect_left(self.tokens, prefix)
+        while i < len(self.tokens) and self.tokens[i].startswith(prefix):
+            rank, name = self.entries[i]
+            if name not in exclude and rank < best.get(name, 2):
+                best[name] = rank
+            i += 1
+
+        matches = sorted(best, key=lambda name: (best[name], name))
+        if limit is not None:
+            matches = matches[:limit]
+        return matches
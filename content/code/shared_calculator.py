@@ -0,0 +1,87 @@
+import threading
+from contextlib import contextmanager
+
+
+class SharedCalculator:
+    """
+    One loaded CostCalculator shared by several sessions and worker threads
+
+    Costing writes its results into costdf, so queries never run on the
+    shared calculator itself.  Each edit ends by publishing a copy of it
+    (a snapshot, the only copy an edit makes) which is never changed after,
+    with the version number the edit bumped.  query() hands out the calling
+    thread's private view of the published snapshot: it is copied from it
+    the first time the thread queries that version and reused until the
+    next edit, so a query takes no lock and mostly copies nothing, and any
+    number run in parallel.  edit() waits for other edits and merges only.
+    Costs computed by a view are merged back with merge() if no edit came
+    since its version, and the views of the next version start from them.
+    """
+
+    def __init__(self, cc):
+        self.cc = cc
+        self.lock = threading.RLock()  # held by edits and merges
+        self.version = 0  # bumped by each edit
+        self.local = threading.local()  # the view of each thread
+        self.publish()
+
+    def publish(self):
+        published = self.cc.snapshot()
+        published.version = self.version
+        self.published = published
+
+    @contextmanager
+    def query(self):
+        ''' a private view of the current version, for any reading or costing
+        '''
+        published = self.published
+        view = getattr(self.local, 'view', None)
+        if view is None or view.version != published.version:
+            # views read the published guide, which is never edited
+            view = published.snapshot(share_guide=True)
+            view.version = published.version
+            self.local.view = view
+        yield view
+
+    @contextmanager
+    def edit(self):
+        ''' exclusive access to the calculator itself, for edits
+            (e.g. through cc.journal)
+        '''
+        with self.lock:
+            try:
+                yield self.cc
+            finally:
+                self.version += 1
+                self.publish()
+
+    def merge(self, view):
+        ''' keep the costs computed by 'view', if its version is still current
+        '''
+        with self.lock:
+            if view.version != self.version:
+                return False
+            return self.cc.merge_results(view, check=False)
+
+    def cost(self, name):
+        ''' cost recipe 'name', returns its frame
+        '''
+        with self.query() as view:
+            if not view.get_recipe_entry(name).empty:
+                view.recipe_cost(name)
+            frame = view.findframe(name)
+        self.merge(view)
+        return frame
+
+    def flatten(self, name):
+        ''' flattened simple ingredients of recipe 'name'
+        '''
+        with self.query() as view:
+            quant = view.get_recipe_entry(name)['quantity'].squeeze()
+            return view.flatten_recipe(name, quant)
+
+    def allergens(self, name):
+        ''' allergens of 'name'
+        '''
+        with self.query() as view:
+            return view.findNset_allergens(name)
@@ -0,0 +1,193 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from costcalulator import CostCalculator
+from menu_catalog import MENUS
+
+# pack sizes of the guide and recipe quantities for each kind of unit,
+# with the pack size in lb, gal or ct
+SIZES = {
+    'weight': [('50 lb', 50), ('25 lb', 25), ('10 lb', 10), ('6/5 lb', 30), ('12/16 oz', 12), ('5 kg', 11.0231)],
+    'volume': [('1 gal', 1), ('4/1 gal', 4), ('6/64 floz', 3), ('12/32 floz', 3), ('2 lt', 0.528344)],
+    'count': [('15 dz', 180), ('144 ct', 144), ('250 ct', 250), ('4/6 ct', 24)],
+}
+QUANTITIES = {
+    'weight': ['4 oz', '1 lb', '100 g', '0.5 lb', '2 oz'],
+    'volume': ['2 floz', '1 cup', '1 tbsp', '0.5 gal', '1 pt'],
+    'count': ['1 ct', '2 ct', '6 ct', '0.5 ct'],
+}
+# recipe yields, a parent uses a sub-recipe in the same kind of unit
+YIELDS = {'weight': '5 lb', 'volume': '1 gal', 'count': '12 ct'}
+# conversions of an item to the kind it can also be measured in
+CONVERSIONS = {'weight': ('volume', '1 cup per {} g'),
+               'volume': ('weight', '1 cup per {} g'),
+               'count': ('weight', '1 ct per {} g')}
+# per lb, gal or ct
+UNIT_PRICES = {'weight': 2.0, 'volume': 6.0, 'count': 0.4}
+
+NOUNS = ['flour', 'milk', 'egg', 'butter', 'sugar', 'salt', 'syrup', 'bacon', 'soy', 'rice',
+         'onion', 'garlic', 'tomato', 'cheese', 'cream', 'oil', 'vinegar', 'pepper', 'basil', 'lemon']
+ADJECTIVES = ['red', 'green', 'smoked', 'fresh', 'dried', 'sweet', 'spicy', 'golden', 'wild', 'roasted']
+DISHES = ['sauce', 'batter', 'glaze', 'dough', 'stock', 'dressing', 'plate', 'bowl', 'salad', 'stew']
+ALLERGENS = ['gluten', 'dairy', 'egg', 'soy', 'nuts', 'fish', 'shellfish', 'sesame']
+
+
+def make_menu_tables(guide_rows=None, nicknames=50, suppliers=3, dates_per_nickname=2,
+                     recipes=40, depth=3, fanout=5, conversion_density=0.5,
+                     unit_mix=(('weight', 0.5), ('volume', 0.3), ('count', 0.2)), seed=0):
+    ''' synthetic (uni_g, costdf) in the layout of the workbook sheets
+
+        the guide has guide_rows rows (nicknames * suppliers * dates_per_nickname
+        if None), each nickname listed by every supplier on each of its dates.
+        recipes are stacked 'depth' levels deep under the menus, each listing
+        about 'fanout' ingredients, the first a recipe of the level below;
+        conversion_density of the nicknames can be measured in a second kind
+        of unit, unit_mix weighs the kinds of unit ('weight', 'volume', 'count').
+        the same arguments always give the same tables
+    '''
+    rng = np.random.default_rng(seed)
+    kinds = [kind for kind, weight in unit_mix]
+    weights = np.array([weight for kind, weight in unit_mix], dtype=float)
+    weights /= weights.sum()
+    if guide_rows is None:
+        guide_rows = nicknames * suppliers * dates_per_nickname
+    nicknames = max(min(nicknames, guide_rows), 1)
+
+    # nicknames
+    names = np.array([nickname_name(i) for i in range(nicknames)], dtype=object)
+    nick_kind = rng.choice(len(kinds), size=nicknames, p=weights)
+    has_conv = rng.random(nicknames) < conversion_density
+    grams = rng.integers(20, 300, size=nicknames)
+    conversions = np.array([CONVERSIONS[kinds[k]][1].format(g) if c else ''
+                            for k, c, g in zip(nick_kind, has_conv, grams)], dtype=object)
+    nick_price = np.array([UNIT_PRICES[kinds[k]] for k in nick_kind]) * rng.lognormal(0, 0.6, nicknames)
+    allergen = np.where(rng.random(nicknames) < 0.3, rng.choice(ALLERGENS, size=nicknames), '')
+
+    # guide rows, grouped by nickname, cycling through suppliers and dates
+    nick = np.arange(guide_rows) * nicknames // guide_rows
+    first = np.searchsorted(nick, np.arange(nicknames))
+    place = np.arange(guide_rows) - first[nick]
+    supplier = place % suppliers
+    when = (place // suppliers) % dates_per_nickname
+    days_back = rng.integers(0, 30, size=nicknames)[nick] + 45 * when
+    dates = np.array([(date(2024, 6, 1) - timedelta(days=int(d))).isoformat() for d in days_back], dtype=object)
+
+    row_kind = nick_kind[nick]
+    size_pick = rng.integers(0, 1 << 30, size=guide_rows)
+    size_text = np.empty(guide_rows, dtype=object)
+    size_amount = np.empty(guide_rows)
+    for k, kind in enumerate(kinds):
+        rows = np.flatnonzero(row_kind == k)
+        options = SIZES[kind]
+        pick = size_pick[rows] % len(options)
+        size_text[rows] = np.array([s for s, a in options], dtype=object)[pick]
+        size_amount[rows] = np.array([a for s, a in options])[pick]
+    price = np.round(nick_price[nick] * size_amount * rng.uniform(0.85, 1.15, guide_rows), 2)
+    supplier_names = np.array([f'supplier {s + 1}' for s in range(suppliers)], dtype=object)
+
+    uni_g = pd.DataFrame({
+        'supplier': supplier_names[supplier],
+        'description': [f'{n} #{i}' for n, i in zip(names[nick], place)],
+        'number': np.arange(100000, 100000 + guide_rows),
+        'price': price,
+        'unit': np.where(np.char.find(size_text.astype(str), '/') >= 0, 'cs', 'ea'),
+        'size': size_text,
+        'brand': rng.choice(['house', 'packer', 'select'], size=guide_rows),
+        'order': rng.integers(0, 4, size=guide_rows),
+        'nickname': names[nick],
+        'note': '',
+        'allergen': allergen[nick],
+        'conversion': conversions[nick],
+        'date': dates,
+    })
+
+    # what each nickname can be measured in
+    nick_units = [[kinds[k]] + ([CONVERSIONS[kinds[k]][0]] if c else []) for k, c in zip(nick_kind, has_conv)]
+
+    # recipes by level, the top level is sold on the menus by the count
+    depth = max(depth, 1)
+    recipes = max(recipes, depth)
+    level_of = np.sort(np.arange(recipes) % depth)
+    recipe_names = [dish_name(i) for i in range(recipes)]
+    recipe_kind = [kinds[k] for k in rng.choice(len(kinds), size=recipes, p=weights)]
+    for r in range(recipes):
+        if level_of[r] == depth - 1:
+            recipe_kind[r] = 'count'
+    levels = [np.flatnonzero(level_of == level) for level in range(depth)]
+
+    rows = [['recipe', 'fullmenu', '1 ct', np.nan, '', '', np.nan]]
+    rows += [['fullmenu', menu, '1 ct', np.nan, '', '', np.nan] for menu in MENUS]
+    for m, menu in enumerate(MENUS):
+        rows.append(['recipe', menu, '1 ct', np.nan, '', '', np.nan])
+        for r in levels[-1][m::len(MENUS)]:
+            rows.append([menu, recipe_names[r], '1 ct', np.nan, '', '', round(float(rng.uniform(6, 30)), 2)])
+
+    for r in range(recipes):
+        kind = recipe_kind[r]
+        rows.append(['recipe', recipe_names[r], '1 ct' if level_of[r] == depth - 1 else YIELDS[kind],
+                     np.nan, '', '', np.nan])
+        used = set()
+        count = int(rng.integers(max(fanout // 2, 1), fanout + 1))
+        for c in range(count):
+            below = level_of[r] - 1
+            if below >= 0 and (c == 0 or rng.random() < 0.3):
+                # a recipe of a lower level
+                sub = int(rng.choice(levels[int(rng.integers(0, below + 1))] if c else levels[below]))
+                name, quantity = recipe_names[sub], rng.choice(QUANTITIES[recipe_kind[sub]])
+            else:
+                n = int(rng.integers(0, nicknames))
+                name, quantity = names[n], rng.choice(QUANTITIES[rng.choice(nick_units[n])])
+            if name in used:
+                continue
+            used.add(name)
+            rows.append([recipe_names[r], name, str(quantity), np.nan, '', '', np.nan])
+
+    costdf = pd.DataFrame(rows, columns=CostCalculator().cost_columns)
+    return uni_g, costdf
+
+
+def write_menu_workbook(filename, **params):
+    ''' write a synthetic workbook (see make_menu_tables for the parameters)
+        that read_from_xlsx loads like the real one, returns filename
+    '''
+    cc = CostCalculator()
+    uni_g, costdf = make_menu_tables(**params)
+    with pd.ExcelWriter(filename) as writer:
+        uni_g.to_excel(writer, sheet_name=cc.guide_sheet_name, index=False)
+        costdf.to_excel(writer, sheet_name=cc.cost_sheet_name, index=False)
+    return filename
+
+
+def nickname_name(i):
+    name = f'{ADJECTIVES[(i // len(NOUNS)) % len(ADJECTIVES)]} {NOUNS[i % len(NOUNS)]}'
+    if i >= len(NOUNS) * len(ADJECTIVES):
+        name += f' {i // (len(NOUNS) * len(ADJECTIVES)) + 1}'
+    return name
+
+
+def dish_name(i):
+    name = f'{NOUNS[i % len(NOUNS)]} {DISHES[(i // len(NOUNS)) % len(DISHES)]}'
+    if i >= len(NOUNS) * len(DISHES):
+        name += f' {i // (len(NOUNS) * len(DISHES)) + 1}'
+    return name
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='write a synthetic menu workbook')
+    parser.add_argument('filename')
+    parser.add_argument('--guide-rows', type=int, default=None)
+    parser.add_argument('--nicknames', type=int, default=50)
+    parser.add_argument('--suppliers', type=int, default=3)
+    parser.add_argument('--dates-per-nickname', type=int, default=2)
+    parser.add_argument('--recipes', type=int, default=40)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fanout', type=int, default=5)
+    parser.add_argument('--conversion-density', type=float, default=0.5)
+    parser.add_argument('--unit-mix', default='weight=0.5,volume=0.3,count=0.2',
+                        help='weights of the kinds of unit, e.g. weight=1,count=1')
+    parser.add_argument('--seed', type=int, default=0)
+    args = vars(parser.parse_args())
+    args['unit_mix'] = [(kind, float(weight)) for kind, weight in
+                        (part.split('=') for part in args['unit_mix'].split(','))]
+    write_menu_workbook(**args)
@@ -1,8 +1,85 @@
 import os
-from pint import UnitRegistry
+import threading
+from itertools import chain
+from fast_units import UnitTable, Unsupported
 
-ureg = UnitRegistry()
-Q_ = ureg.Quantity
+# all of pint's definitions by default (recipes may use any unit, e.g.
+# cc or pinch), set False before the first quantity to read only the
+# units of menu_units.txt, which starts faster
+full_units = True
+UNITS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'menu_units.txt')
+
+
+def make_registry(full=True):
+    ''' a pint UnitRegistry of all pint's units (of the units in UNITS_FILE
+        with full=False, where other units are undefined), pint keeps the
+        parsed definitions in its disk cache when it has one
+    '''
+    from pint import UnitRegistry
+    # '' is pint's default_en.txt
+    filename = UNITS_FILE if not full and os.path.exists(UNITS_FILE) else ''
+    try:
+        registry = UnitRegistry(filename, cache_folder=':auto:')
+    except Exception:
+        # no cache folder to write to
+        registry = UnitRegistry(filename)
+    registry.Quantity.format_babel = my_format_babel
+    return registry
+
+
+class LazyRegistry:
+    """
+    The pint UnitRegistry of the project, made on first use
+
+    Importing pint and building a registry is most of the import time of
+    these modules (in pyodide above all), so it waits until a quantity is
+    needed: ureg.count, ureg('1 lb') and Q_('1 lb') make it.
+    unit_table() is the UnitTable (fast_units) of the registry, for the
+    common units.
+    """
+
+    def __init__(self):
+        self.registry = None
+        self.table = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.registry is None:
+            with self.lock:
+                if self.registry is None:
+                    self.registry = make_registry(full_units)
+        return self.registry
+
+    def unit_table(self):
+        if self.table is None:
+            registry = self.get()
+            with self.lock:
+                if self.table is None:
+                    self.table = UnitTable(registry)
+        return self.table
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
+
+
+ureg = LazyRegistry()
+
+def Q_(*args, **kwargs):
+    return ureg.get().Quantity(*args, **kwargs)
+
+def table_quantity(quant):
+    ''' Q_(quant) of a string, read by the unit table (see fast_units)
+        when it is a number and one of the common units
+    '''
+    q = ureg.unit_table().parse(quant)
+    if q is None:
+        return Q_(quant)
+    return q
 
 printon = False
 
@@ -20,6 +97,23 @@ def parse_quantity(quant):
 def get_xlsx_files():
     return [f for f in os.listdir('.') if f.endswith('.xlsx')]
 
+def run_later(delay, func, *args):
+    ''' call func(*args) after delay seconds on a timer thread
+        returns the started timer so the call can be cancelled,
+        or None if func was run immediately (delay <= 0, or threads are
+        unavailable as in pyodide)
+    '''
+    if delay <= 0:
+        func(*args)
+        return None
+    timer = threading.Timer(delay, func, args)
+    try:
+        timer.start()
+    except RuntimeError:
+        func(*args)
+        return None
+    return timer
+
 # Add other utility functions as needed
 def find_ratio(iquant, recipe_entry):
     ''' find the ratio of a quantity iquant to a given recipe
@@ -133,12 +227,13 @@ def parse_quant(myquant):
         float: The numeric value of the quantity.
     """
     if isinstance(myquant, str) and len(myquant) > 0:
-        q = Q_(myquant.replace('ct', 'count'))
-        if q.dimensionless:
-            q = q.m*ureg.count
+        table = ureg.unit_table()
+        q = table_quantity(myquant.replace('ct', 'count'))
+        if table.is_dimensionless(q):
+            q = table.counts(q.m)
         return q
     elif isinstance(myquant, (int, float)):
-        return Q_(f'{myquant} count')
+        return table_quantity(f'{myquant} count')
     else:
         return Q_(0)
         
@@ -171,9 +266,12 @@ def parse_size(sizestr):
         
     for r in rmap:
         sizestr = sizestr.replace(*r)
-    sizestr = sizestr.replace('**', '*')
+    sizestr = sizestr.replace('**', '*').replace('ct', 'count')
+    size = ureg.unit_table().parse(sizestr)
+    if size is not None:
+        return size
     try:
-        size = Q_(sizestr.replace('ct', 'count'))
+        size = Q_(sizestr)
         if size.units == ureg.cs:
             print(f'bad size: {sizestr} {size}')
         return size
@@ -208,8 +306,32 @@ def quantity_cost_and_conv(cpq, myq, conversion):
         cpq: (cost per quantity from order guide)
         if necessary use conversion to get compatible units
         example conversion: <1 cup>/<120 g>
+        returns the cost and the conversion used (1 for none)
+    '''
+    table = ureg.unit_table()
+    tried = []
+    try:
+        cost = table.reduced(table.mul(table.split(cpq), table.split(myq)))
+        if table.dimensionless(cost[1]):
+            return cost[0], 1
+        for testconv in conversion:
+            tried.append(testconv)
+            conv = table.split(testconv)
+            value = table.div(cost, conv)
+            if table.dimensionless(value[1]):
+                return table.reduced(value)[0], table.inverse(testconv)
+            value = table.mul(cost, conv)
+            if table.dimensionless(value[1]):
+                return table.reduced(value)[0], testconv
+    except Unsupported:
+        # with pint, from the conversions already read
+        return pint_cost_and_conv(cpq, myq, chain(tried, conversion))
+    # pint says what can't be converted
+    return pint_cost_and_conv(cpq, myq, tried)
+
+def pint_cost_and_conv(cpq, myq, conversion):
+    ''' quantity_cost_and_conv with pint's arithmetic
     '''
-        
     cost = (cpq*myq).to_reduced_units()
     # cost should be dimensionless if compatible units were used
     if not cost.dimensionless:
@@ -259,9 +381,9 @@ def parse_unit_conversion(conv_str):
         for oneconv in conv_str.split(';'):
             if 'per' in oneconv:
                 v,m = oneconv.split('per')
-                v = Q_(v)
-                m = Q_(m)
-                yield v/m
+                v = table_quantity(v)
+                m = table_quantity(m)
+                yield ureg.unit_table().divide(v, m)
             else:
                 maybeprint(f'!!! no conversion found, {conv_str=}')
                 yield 1
@@ -394,5 +516,4 @@ def calculate_weighted_cost(cost_df):
     else:
         # If all weights are zero, fall back to simple average
         return cost_df['mycost'].mean()
-    
-ureg.Quantity.format_babel = my_format_babel
\ No newline at end of file
+
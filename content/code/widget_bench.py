@@ -0,0 +1,297 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import ipywidgets as widgets
+import pandas as pd
+from costcalulator import CostCalculator
+from utils import parse_quant
+
+# widget modules whose run_later and display calls are taken over while driving
+WIDGET_MODULES = ('menu_viewer', 'menu_display_widget', 'data_frame_widget', 'data_frame_explorer')
+
+# methods timed inside each interaction, by the attribute holding their object
+WATCHED = {
+    'viewer': ('show_lookup', 'apply_allergen_highlighting', 'apply_ingredient_highlighting',
+               'show_matching_ingredients', 'update_ingredient_chips'),
+    'viewer.df_widget': ('update_display', 'restyle', 'setdf', 'lookup_name'),
+    'explorer': ('show_costed', 'update_mentions'),
+    'explorer.df_widget': ('on_text_change', 'update_display', 'flush_edits', 'setdf'),
+    'explorer.mdf_widget': ('update_display',),
+}
+
+
+class PendingCall:
+    """ a run_later call held by the driver until it settles """
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class HeadlessDriver:
+    """
+    Drive MenuViewer and DataFrameExplorer without a frontend and measure
+    each interaction
+
+    Inside headless(), widgets run without a kernel: display() of a widget
+    is counted instead of printed, and run_later calls (debounced searches
+    and edits) are held and run when the interaction settles rather than
+    after their delay.  interaction(name, action) calls action (e.g. a
+    button click or a value change), then settles: runs the held calls and
+    waits for the widgets' background runners until nothing is left.  It
+    records the time taken, the widgets created and closed, the comm
+    messages sent (state updates), the outputs displayed and, per watched
+    method, the calls and time.  report() and breakdown() return them.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.method_records = []
+        self.pending = []
+        self.runners = []
+        self.counts = {'created': 0, 'closed': 0, 'messages': 0, 'displays': 0}
+        self.method_counts = {}
+
+    @contextlib.contextmanager
+    def headless(self):
+        ''' take over display, run_later and the widget comms for the block
+        '''
+        counts = self.counts
+        original_send = widgets.Widget._send
+        original_close = widgets.Widget.close
+        original_callback = widgets.Widget._widget_construction_callback
+
+        def send(widget, msg, buffers=None):
+            counts['messages'] += 1
+            return original_send(widget, msg, buffers)
+
+        def close(widget):
+            if widget.comm is not None:
+                counts['closed'] += 1
+            return original_close(widget)
+
+        def constructed(widget):
+            counts['created'] += 1
+
+        def display(*objs, **kwargs):
+            counts['displays'] += len(objs)
+
+        def run_later(delay, func, *args):
+            call = PendingCall(func, args)
+            self.pending.append(call)
+            return call
+
+        replaced = []
+        for name in WIDGET_MODULES:
+            module = sys.modules.get(name)
+            if module is None:
+                module = __import__(name)
+            for attribute, value in (('display', display), ('run_later', run_later)):
+                if hasattr(module, attribute):
+                    replaced.append((module, attribute, getattr(module, attribute)))
+                    setattr(module, attribute, value)
+        widgets.Widget._send = send
+        widgets.Widget.close = close
+        widgets.Widget._widget_construction_callback = constructed
+        try:
+            yield self
+        finally:
+            widgets.Widget._send = original_send
+            widgets.Widget.close = original_close
+            widgets.Widget._widget_construction_callback = original_callback
+            for module, attribute, value in reversed(replaced):
+                setattr(module, attribute, value)
+
+    def watch(self, label, obj, runner=None):
+        ''' time the WATCHED methods of 'obj' (a viewer, explorer or their
+            df_widget) and wait for 'runner' when settling
+        '''
+        for name in WATCHED.get(label, ()):
+            setattr(obj, name, self._timed(f'{label.split(".")[-1]}.{name}', getattr(obj, name)))
+        if runner is not None:
+            self.runners.append(runner)
+
+    def _timed(self, name, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                calls, seconds = self.method_counts.get(name, (0, 0.0))
+                self.method_counts[name] = (calls + 1, seconds + time.perf_counter() - start)
+        return timed
+
+    def settle(self, timeout=60):
+        ''' run the held run_later calls and wait for the runners until idle
+        '''
+        while True:
+            for runner in self.runners:
+                runner.wait(timeout)
+            if not self.pending:
+                return
+            pending, self.pending = self.pending, []
+            for call in pending:
+                if not call.cancelled:
+                    call.func(*call.args)
+
+    def interaction(self, name, action):
+        ''' run action() and settle, recording what it took
+        '''
+        self.settle()
+        before = dict(self.counts)
+        self.method_counts = {}
+        # costing prints what it can't convert, widgets print without a kernel
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            action()
+            self.settle()
+            seconds = time.perf_counter() - start
+        record = {'interaction': name, 'seconds': seconds}
+        record.update({key: self.counts[key] - before[key] for key in self.counts})
+        self.records.append(record)
+        for method, (calls, method_seconds) in self.method_counts.items():
+            self.method_records.append({'interaction': name, 'method': method,
+                                        'calls': calls, 'seconds': method_seconds})
+        return record
+
+    def report(self):
+        ''' one row per interaction
+        '''
+        return pd.DataFrame(self.records, columns=['interaction', 'seconds', 'created', 'closed',
+                                                   'messages', 'displays'])
+
+    def breakdown(self):
+        ''' the watched methods called in each interaction
+        '''
+        return pd.DataFrame(self.method_records, columns=['interaction', 'method', 'calls', 'seconds'])
+
+
+def find_widget(root, kind, description):
+    ''' the first 'kind' widget below root with this description
+    '''
+    if isinstance(root, kind) and getattr(root, 'description', None) == description:
+        return root
+    for child in getattr(root, 'children', ()):
+        found = find_widget(child, kind, description)
+        if found is not None:
+            return found
+    return None
+
+
+def load(workbook):
+    cc = CostCalculator()
+    # nothing the benchmark edits is logged next to the workbook
+    cc.log_edits = False
+    with contextlib.redirect_stdout(io.StringIO()):
+        cc.read_from_xlsx(workbook)
+    return cc
+
+
+def menu_items(cc):
+    return [item for menu in cc.get_children('fullmenu') for item in cc.get_children(menu)]
+
+
+def bench_menu_viewer(driver, workbook, render_mode='widgets'):
+    ''' the viewer's interactions: menus, recipes, allergens, ingredient search
+    '''
+    from menu_viewer import MenuViewer
+    cc = load(workbook)
+    viewer = None
+
+    def create():
+        nonlocal viewer
+        viewer = MenuViewer(cc=cc, render_mode=render_mode)
+        viewer.read_file(workbook)
+    driver.interaction('viewer: create', create)
+    driver.watch('viewer', viewer, viewer.runner)
+    driver.watch('viewer.df_widget', viewer.df_widget)
+
+    menus = cc.get_children('fullmenu')
+    items = menu_items(cc)
+    allergen_boxes = viewer.allergen_checkboxes
+    ingredient = sorted(viewer.df_widget.simple_ingredients)[0]
+
+    button = find_widget(viewer.vbox, widgets.Button, menus[0].capitalize())
+    driver.interaction('viewer: click menu', button.click)
+    driver.interaction('viewer: open recipe', lambda: setattr(viewer.searchinput, 'value', items[0]))
+    driver.interaction('viewer: allergen on', lambda: setattr(allergen_boxes[0], 'value', True))
+    driver.interaction('viewer: allergen off', lambda: setattr(allergen_boxes[0], 'value', False))
+    driver.interaction('viewer: type ingredient', lambda: setattr(viewer.ingredient_input, 'value', ingredient[:2]))
+    driver.interaction('viewer: highlight ingredient', lambda: viewer.add_highlighted_ingredient(ingredient))
+    driver.interaction('viewer: open next recipe', lambda: setattr(viewer.searchinput, 'value', items[-1]))
+    driver.interaction('viewer: back', viewer.backbutton.click)
+    return viewer
+
+
+def bench_explorer(driver, workbook, render_mode='widgets'):
+    ''' the explorer's interactions: lookups, a quantity edit and its undo
+    '''
+    from data_frame_explorer import DataFrameExplorer
+    cc = load(workbook)
+    explorer = None
+
+    def create():
+        nonlocal explorer
+        explorer = DataFrameExplorer(cc=cc, render_mode=render_mode)
+    driver.interaction('explorer: create', create)
+    driver.watch('explorer', explorer, explorer.runner)
+    driver.watch('explorer.df_widget', explorer.df_widget)
+    driver.watch('explorer.mdf_widget', explorer.mdf_widget)
+
+    menus = cc.get_children('fullmenu')
+    items = menu_items(cc)
+    recipe = cc.get_children(items[0])
+    nickname = cc.uni_g['nickname'].dropna().iloc[0]
+
+    driver.interaction('explorer: open recipe', lambda: setattr(explorer.searchinput, 'value', items[0]))
+
+    def edit_quantity():
+        cell = explorer.df_widget.cells[(1, 'quantity')]
+        quant = parse_quant(cell.value)
+        cell.value = f'{quant.m * 2:g} {quant.u:~}'
+    driver.interaction('explorer: edit quantity', edit_quantity)
+    driver.interaction('explorer: undo', explorer.undo)
+    button = find_widget(explorer.vbox, widgets.Button, menus[-1].capitalize())
+    driver.interaction('explorer: click menu', button.click)
+    driver.interaction('explorer: open ingredient', lambda: setattr(explorer.searchinput, 'value', nickname))
+    if recipe:
+        driver.interaction('explorer: open sub-recipe', lambda: setattr(explorer.searchinput, 'value', recipe[0]))
+    return explorer
+
+
+def run(workbook, render_mode='widgets'):
+    ''' drive both widgets on 'workbook', returns (report, breakdown) frames
+    '''
+    driver = HeadlessDriver()
+    with driver.headless():
+        bench_menu_viewer(driver, workbook, render_mode)
+        bench_explorer(driver, workbook, render_mode)
+    return driver.report(), driver.breakdown()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='headless widget interaction benchmark')
+    parser.add_argument('workbook', nargs='?', default=None,
+                        help='workbook to load (default: the synthetic one of --tier)')
+    parser.add_argument('--tier', default='small', help='synthetic workbook tier, see benchmarks.TIERS')
+    parser.add_argument('--render-mode', default='widgets', choices=['widgets', 'html'])
+    parser.add_argument('--breakdown', action='store_true', help='also show the watched methods')
+    args = parser.parse_args()
+    workbook = args.workbook
+    if workbook is None:
+        from benchmarks import workbook_for
+        workbook = workbook_for(args.tier, os.path.join(tempfile.gettempdir(), 'menuview-bench'))
+    report, breakdown = run(workbook, args.render_mode)
+    with pd.option_context('display.float_format', '{:.4f}'.format, 'display.width', 200):
+        print(report.to_string(index=False))
+        if args.breakdown:
+            print()
+            print(breakdown.to_string(index=False))
@@ -0,0 +1,34 @@
+import os
+import sys
+import pandas as pd
+import pytest
+
+# the modules are imported by their bare names, as in the notebooks
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'content', 'code')
+sys.path.insert(0, os.path.abspath(CODE_DIR))
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    ''' path of a small workbook: flour and butter in the guide, recipes
+        bread and toast (made of bread), in the order write_cc writes them
+    '''
+    from costcalulator import CostCalculator
+    cc = CostCalculator()
+    guide = pd.DataFrame([
+        ['acme', 'flour', 1, 20.0, 'cs', '50 lb', '', 1, 'flour', '', 'gluten', '1 cup per 120 g', '2024-01-01'],
+        ['acme', 'butter', 2, 30.0, 'cs', '36 lb', '', 1, 'butter', '', 'milk', '', '2024-01-01'],
+    ], columns=cc.guide_columns)
+    costdf = pd.DataFrame([
+        ['recipe', 'bread', '1 ct', None, '', '', None],
+        ['bread', 'butter', '20 g', None, '', '', None],
+        ['bread', 'flour', '500 g', None, '', '', None],
+        ['recipe', 'toast', '1 ct', None, '', '', None],
+        ['toast', 'bread', '1 ct', None, '', '', None],
+        ['toast', 'butter', '10 g', None, '', '', None],
+    ], columns=cc.cost_columns)
+    filename = str(tmp_path / 'menu.xlsx')
+    with pd.ExcelWriter(filename) as writer:
+        guide.to_excel(writer, sheet_name=cc.guide_sheet_name, index=False)
+        costdf.to_excel(writer, sheet_name=cc.cost_sheet_name, index=False)
+    return filename
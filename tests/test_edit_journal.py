@@ -0,0 +1,112 @@
+import pytest
+from costcalulator import CostCalculator
+from edit_journal import Delta, Step
+
+
+def lines(cc):
+    return cc.costdf[['item', 'ingredient', 'quantity']].astype(str).values.tolist()
+
+
+def add_line(cc, item, ingredient, quantity):
+    row = cc.item_list(item).iloc[[0]].copy()
+    row['ingredient'], row['quantity'] = ingredient, quantity
+    cc.journal.append('costdf', row)
+
+
+def load(workbook, log_edits=False):
+    cc = CostCalculator()
+    cc.log_edits = log_edits
+    cc.read_from_xlsx(workbook)
+    return cc
+
+
+def test_undo_redo(workbook):
+    cc = load(workbook)
+    before = lines(cc)
+    add_line(cc, 'bread', 'salt', '5 g')
+    cc.journal.drop('costdf', cc.costdf['ingredient'] == 'butter', reset_index=True)
+    after = lines(cc)
+    assert cc.journal.undo() is not None
+    assert cc.journal.undo() is not None
+    assert lines(cc) == before
+    cc.journal.redo()
+    cc.journal.redo()
+    assert lines(cc) == after
+
+
+def test_failed_step_is_rolled_back(workbook):
+    cc = load(workbook)
+    before = lines(cc)
+    row = cc.costdf.iloc[1].copy()
+    step = Step([Delta('costdf', 1, 'quantity', '20 g', '30 g'),
+                 Delta('costdf', 0, None, None, row),
+                 Delta('costdf', 100, 'quantity', '1 g', '2 g')],  # no such row
+                (6, 2), (7, 2))
+    with pytest.raises(IndexError):
+        cc.journal.apply_step(step)
+    assert lines(cc) == before
+    assert cc.journal.edit_count == 0
+
+
+def test_undo_history_follows_the_rows_written(workbook):
+    cc = load(workbook, log_edits=True)
+    journal = cc.journal
+    original = lines(cc)
+    # appended last, written with the other lines of bread
+    add_line(cc, 'bread', 'salt', '5 g')
+    journal.set('costdf', cc.costdf['ingredient'] == 'flour', 'quantity', '400 g')
+    journal.drop('costdf', (cc.costdf['item'] == 'toast') & (cc.costdf['ingredient'] == 'butter'),
+                 reset_index=True)
+    add_line(cc, 'toast', 'jam', '10 g')
+    journal.undo()
+    edited = lines(cc)
+    cc.write_cc(workbook)
+    assert lines(cc) != edited and sorted(lines(cc)) == sorted(edited)
+    assert len(journal.undo_stack) == 3 and len(journal.redo_stack) == 1
+    while journal.can_undo():
+        journal.undo()
+    assert lines(cc) == original
+    while journal.can_redo():
+        journal.redo()
+    assert ['toast', 'jam', '10 g'] in lines(cc)
+    journal.undo()
+    assert sorted(lines(cc)) == sorted(edited)
+    # the undo and redo were logged against the workbook as written
+    assert lines(CostCalculator(workbook)) == lines(cc)
+
+
+def test_lines_of_no_recipe_are_kept_when_written(workbook):
+    cc = load(workbook, log_edits=True)
+    journal = cc.journal
+    original = lines(cc)
+    # the toast lines are left without their recipe entry
+    journal.set('costdf', cc.costdf['ingredient'] == 'toast', 'ingredient', 'rye toast')
+    add_line(cc, 'bread', 'salt', '5 g')
+    edited = lines(cc)
+    cc.write_cc(workbook)
+    assert sorted(lines(cc)) == sorted(edited)
+    assert lines(cc)[-2:] == [['toast', 'bread', '1 ct'], ['toast', 'butter', '10 g']]
+    assert len(journal.undo_stack) == 2
+    journal.undo()
+    journal.undo()
+    assert sorted(lines(cc)) == sorted(original)
+    assert lines(CostCalculator(workbook)) == lines(cc)
+
+
+def test_rows_of_a_step_are_moved_together(workbook):
+    cc = load(workbook)
+    before = lines(cc)
+    cc.journal.drop('costdf', cc.costdf['item'] != 'recipe', reset_index=True)
+    dropped = lines(cc)
+    assert dropped == [['recipe', 'bread', '1 ct'], ['recipe', 'toast', '1 ct']]
+    cc.journal.undo()
+    assert lines(cc) == before
+    cc.journal.redo()
+    assert lines(cc) == dropped
+    # a row put back past the end of the table fails the whole step
+    row = cc.costdf.iloc[0].copy()
+    step = Step([Delta('costdf', 0, None, None, row), Delta('costdf', 5, None, None, row)],
+                (2, 2), (4, 2))
+    with pytest.raises(IndexError):
+        cc.journal.apply_step(step)
+    assert lines(cc) == dropped
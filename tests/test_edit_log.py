@@ -0,0 +1,74 @@
+import os
+from costcalulator import CostCalculator
+
+
+def lines(cc):
+    return cc.costdf[['item', 'ingredient', 'quantity']].astype(str).values.tolist()
+
+
+def add_line(cc, item, ingredient, quantity):
+    row = cc.item_list(item).iloc[[0]].copy()
+    row['ingredient'], row['quantity'] = ingredient, quantity
+    cc.journal.append('costdf', row)
+
+
+def set_quantity(cc, item, ingredient, quantity):
+    mask = (cc.costdf['item'] == item) & (cc.costdf['ingredient'] == ingredient)
+    cc.journal.set('costdf', mask, 'quantity', quantity)
+
+
+def test_replay_and_compact(workbook):
+    cc = CostCalculator(workbook)
+    add_line(cc, 'bread', 'salt', '5 g')
+    set_quantity(cc, 'toast', 'butter', '15 g')
+    assert len(cc.edit_log) == 2
+    # the kernel died, the edits are replayed on loading
+    assert lines(CostCalculator(workbook)) == lines(cc)
+    cc.write_cc(workbook)
+    assert not os.path.exists(cc.edit_log.path)
+    assert lines(CostCalculator(workbook)) == lines(cc)
+
+
+def test_torn_last_line_keeps_the_edits_before_it(workbook):
+    cc = CostCalculator(workbook)
+    add_line(cc, 'bread', 'salt', '5 g')
+    set_quantity(cc, 'toast', 'butter', '15 g')
+    with open(cc.edit_log.path) as f:
+        text = f.read()
+    with open(cc.edit_log.path, 'w') as f:
+        f.write(text[:-20])  # the crash came while the last line was written
+    recovered = CostCalculator(workbook)
+    assert ['bread', 'salt', '5 g'] in lines(recovered)
+    assert ['toast', 'butter', '10 g'] in lines(recovered)
+    add_line(recovered, 'toast', 'jam', '10 g')
+    reloaded = CostCalculator(workbook)
+    assert lines(reloaded) == lines(recovered)
+    assert ['bread', 'salt', '5 g'] in lines(reloaded)
+    assert ['toast', 'jam', '10 g'] in lines(reloaded)
+    assert not os.path.exists(cc.edit_log.path + '.bad')
+
+
+def test_log_that_cant_be_replayed_is_kept_and_cut(workbook):
+    cc = CostCalculator(workbook)
+    add_line(cc, 'bread', 'salt', '5 g')
+    add_line(cc, 'bread', 'sugar', '5 g')
+    set_quantity(cc, 'toast', 'butter', '15 g')
+    path = cc.edit_log.path
+    with open(path) as f:
+        logged = f.readlines()
+    # the second step no longer fits the tables
+    logged[2] = logged[2].replace('"before": [7', '"before": [70')
+    with open(path, 'w') as f:
+        f.writelines(logged)
+    with open(path + '.bad', 'w') as f:
+        f.write('an older log put aside\n')
+    recovered = CostCalculator(workbook)
+    assert ['bread', 'salt', '5 g'] in lines(recovered)
+    assert ['bread', 'sugar', '5 g'] not in lines(recovered)
+    with open(path + '.bad') as f:
+        assert f.read() == 'an older log put aside\n'
+    with open(path + '.bad.1') as f:
+        assert f.readlines() == logged
+    # the log holds the step replayed, edits made next follow it
+    add_line(recovered, 'toast', 'jam', '10 g')
+    assert lines(CostCalculator(workbook)) == lines(recovered)
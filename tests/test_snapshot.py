@@ -0,0 +1,38 @@
+from costcalulator import CostCalculator
+
+
+def load(workbook):
+    cc = CostCalculator()
+    cc.log_edits = False
+    cc.read_from_xlsx(workbook)
+    return cc
+
+
+def recipe_cost(cc, name):
+    return cc.get_recipe_entry(name).squeeze()['cost']
+
+
+def test_merge_results(workbook):
+    cc = load(workbook)
+    snap = cc.snapshot()
+    snap.recipe_cost('toast')
+    assert cc.findframe('toast').iloc[0]['cost'] == 0
+    assert cc.merge_results(snap)
+    assert recipe_cost(cc, 'toast') == recipe_cost(snap, 'toast') > 0
+    # merged costs show in the frames cached before
+    assert cc.findframe('toast').iloc[0]['cost'] == recipe_cost(snap, 'toast')
+
+
+def test_merge_results_refuses_a_stale_snapshot(workbook):
+    cc = load(workbook)
+    snap = cc.snapshot()
+    cc.journal.set('costdf', cc.costdf['ingredient'] == 'flour', 'quantity', '400 g')
+    snap.recipe_cost('toast')
+    assert not cc.merge_results(snap)
+    assert recipe_cost(cc, 'toast') == 0
+    # a guide edit makes it stale too
+    snap = cc.snapshot()
+    cc.journal.set('uni_g', cc.uni_g['nickname'] == 'flour', 'price', 25.0)
+    snap.recipe_cost('toast')
+    assert not cc.merge_results(snap)
+    assert recipe_cost(cc, 'toast') == 0
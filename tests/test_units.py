@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+from costcalulator import CostCalculator
+from utils import parse_quant, parse_size, ureg
+
+
+def write_workbook(filename, quantity):
+    ''' a guide with flour (50 lb, 1 cup per 120 g) and a bread recipe
+        using 'quantity' of it
+    '''
+    cc = CostCalculator()
+    guide = pd.DataFrame([['acme', 'flour', 1, 20.0, 'cs', '50 lb', '', 1, 'flour', '', 'gluten',
+                           '1 cup per 120 g', '2024-01-01']], columns=cc.guide_columns)
+    rows = [['recipe', 'bread', '1 ct', None, '', '', None],
+            ['bread', 'flour', quantity, None, '', '', None]]
+    costdf = pd.DataFrame(rows, columns=cc.cost_columns)
+    with pd.ExcelWriter(filename) as writer:
+        guide.to_excel(writer, sheet_name=cc.guide_sheet_name, index=False)
+        costdf.to_excel(writer, sheet_name=cc.cost_sheet_name, index=False)
+    return filename
+
+
+def test_quantities_outside_menu_units():
+    # cc isn't in menu_units.txt
+    assert parse_quant('1 cc').dimensionality == parse_quant('1 ml').dimensionality
+    assert parse_quant('1 cc').to('ml').m == pytest.approx(1)
+    assert parse_size('1 cc').dimensionality == parse_quant('1 ml').dimensionality
+
+
+def test_cost_recipe_with_unit_outside_menu_units(tmp_path):
+    cc = CostCalculator()
+    cc.log_edits = False
+    cc.read_from_xlsx(write_workbook(str(tmp_path / 'menu.xlsx'), '240 cc'))
+    cc.recipe_cost('bread')
+    # flour is 20 dollars for 50 lb and 120 g a cup
+    cups = 240 / ureg('1 cup').to('cc').m
+    expected = cups * 120 * 20 / (50 * 453.59237)
+    assert cc.item_list('bread')['cost'].iloc[0] == pytest.approx(expected)
+    assert cc.get_recipe_entry('bread').squeeze()['cost'] == pytest.approx(expected)